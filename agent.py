@@ -1,9 +1,14 @@
-from graph import generate_graph
+import uuid
+from typing import AsyncIterator, Iterator
 from langchain_core.messages import AIMessage, HumanMessage
+from nodes.human_in_the_loop_selection import ENCABEZADO_RANKING
+from streaming import astream_graph, stream_graph
+
+PALABRAS_SALIDA = ["salir", "exit", "quit"]
 
 
 class RepuestosAgent:
-    
+
     ESTADO_INICIAL =  {
         "messages": [],
         "validation_result": None,
@@ -24,86 +29,191 @@ class RepuestosAgent:
         "codigos_para_externos": None,
         "recomendaciones_llm": None
     }
-    
-    def __init__(self):
-        self.graph = generate_graph()
-        self.first_message = True
-        self.state = self.ESTADO_INICIAL.copy()
-        self.config = {"configurable": {"thread_id": "1"}}
-        self.result = None
 
-    def get_next_message(self, message):
-        if self.first_message:
-            self.first_message = False
-            self.state["messages"].append(HumanMessage(message))
-            self.result = self.graph.invoke(self.state, self.config)
-        else:
-            snapshot = self.graph.get_state(self.config)
-            proximos_nodos = snapshot.next if hasattr(snapshot, 'next') else []
-            if self.result.get("info_completa") == False:
-                if message.lower() in ["salir", "exit", "quit"]:
-                    self.reset_agent()
-                    return "\n👋 Conversación terminada"
-                
-                self.result = self.graph.invoke({
-                    "messages": [HumanMessage(content=message)]
-                }, self.config)
-            
-            elif proximos_nodos and "process_selection" in proximos_nodos:
-                if message.lower() in ["salir", "exit", "quit"]:
-                    self.reset_agent()
-                    return "\n👋 Conversación terminada"
-                
-                self.graph.update_state(self.config, {
-                    "messages": [HumanMessage(content=message)]
-                })
-                
-                self.result = self.graph.invoke(None, self.config)
-            
-            elif proximos_nodos and "handle_no_stock_response" in proximos_nodos and self.result.get("tiene_stock_disponible") == False:
-                if message.lower() in ["salir", "exit", "quit"]:
-                    self.reset_agent()
-                    return "\n👋 Conversación terminada"
-                
-                self.graph.update_state(self.config, {
-                    "messages": [HumanMessage(content=message)]
-                })
-                
-                self.result = self.graph.invoke(None, self.config)
-            
-            elif self.result.get("reiniciar_busqueda", False) and 
-        
+    def __init__(self, graph=None):
+        """
+        graph: grafo compilado compartido (p. ej. entre las sesiones del servicio); si no se indica se genera uno.
+        """
+        if graph is None:
+            from graph import generate_graph
+            graph = generate_graph()
+        self.graph = graph
+        self.reset_agent()
+
+    @property
+    def thread_id(self) -> str:
+        return self.config["configurable"]["thread_id"]
+
+    def get_next_message(self, message) -> str:
+        """
+        Procesa un mensaje del usuario y retorna la respuesta completa del agente.
+        """
+        return "".join(self.stream_next_message(message))
+
+    def stream_next_message(self, message) -> Iterator[str]:
+        """
+        Procesa un mensaje del usuario y emite la respuesta por fragmentos: el ranking token a token
+        a medida que lo genera el LLM, el resto de los mensajes completos.
+        """
+        if message.strip().lower() in PALABRAS_SALIDA and not self.first_message:
+            self.reset_agent()
+            yield "\n👋 Conversación terminada"
+            return
+
+        entrada = self._preparar_entrada(message)
+
+        transmitido = False
+        for tipo, valor in stream_graph(self.graph, entrada, self.config):
+            if tipo == "token":
+                if not transmitido:
+                    transmitido = True
+                    yield ENCABEZADO_RANKING
+                yield valor
+            else:
+                self.result = valor
+
+        for fragmento in self._cierre_turno(transmitido):
+            yield fragmento
+
+    async def astream_next_message(self, message) -> AsyncIterator[str]:
+        """
+        Versión async de stream_next_message (graph.astream): permite atender varias sesiones en un mismo event loop.
+        """
+        if message.strip().lower() in PALABRAS_SALIDA and not self.first_message:
+            self.reset_agent()
+            yield "\n👋 Conversación terminada"
+            return
+
+        entrada = await self._apreparar_entrada(message)
+
+        transmitido = False
+        async for tipo, valor in astream_graph(self.graph, entrada, self.config):
+            if tipo == "token":
+                if not transmitido:
+                    transmitido = True
+                    yield ENCABEZADO_RANKING
+                yield valor
+            else:
+                self.result = valor
+
+        for fragmento in self._cierre_turno(transmitido):
+            yield fragmento
+
+    def _cierre_turno(self, transmitido: bool) -> Iterator[str]:
+        """
+        Fragmentos finales del turno: el último mensaje del agente (si no se transmitió) y el cierre del pedido.
+        """
+        # Si el turno no transmitió tokens, mostrar el último mensaje del agente completo
+        if not transmitido:
+            ultimo_mensaje_agente = self._ultimo_mensaje_agente(self.result)
+            if ultimo_mensaje_agente:
+                yield ultimo_mensaje_agente
+
         complete, completion_message = self.is_conversation_complete(self.result)
         if complete:
             self.reset_agent()
-            return completion_message
-        
+            yield completion_message
+
+    def _preparar_entrada(self, message):
+        """
+        Retorna la entrada del próximo turno del grafo (None = continuar desde el interrupt).
+        """
+        if self.first_message:
+            self.first_message = False
+            return {**self.ESTADO_INICIAL, "messages": [HumanMessage(message)]}
+
+        accion = self._accion_siguiente(self.graph.get_state(self.config))
+
+        if accion == "continuar":
+            self.graph.update_state(self.config, {
+                "messages": [HumanMessage(content=message)]
+            })
+            return None
+
+        if accion == "nuevo_turno":
+            return {"messages": [HumanMessage(content=message)]}
+
+        # El flujo anterior terminó (p. ej. sin stock y el usuario no quiso reintentar): nueva conversación
+        self.reset_agent()
+        return self._preparar_entrada(message)
+
+    async def _apreparar_entrada(self, message):
+        """
+        Versión async de _preparar_entrada (aget_state/aupdate_state no bloquean el event loop).
+        """
+        if self.first_message:
+            self.first_message = False
+            return {**self.ESTADO_INICIAL, "messages": [HumanMessage(message)]}
+
+        accion = self._accion_siguiente(await self.graph.aget_state(self.config))
+
+        if accion == "continuar":
+            await self.graph.aupdate_state(self.config, {
+                "messages": [HumanMessage(content=message)]
+            })
+            return None
+
+        if accion == "nuevo_turno":
+            return {"messages": [HumanMessage(content=message)]}
+
+        self.reset_agent()
+        return await self._apreparar_entrada(message)
+
+    def _accion_siguiente(self, snapshot) -> str:
+        """
+        Decide cómo incorporar el próximo mensaje: 'continuar' (reanudar el interrupt),
+        'nuevo_turno' (faltan detalles de productos) o 'reiniciar' (el flujo anterior terminó).
+        """
+        proximos_nodos = snapshot.next if hasattr(snapshot, 'next') else []
+
+        # Pausado tras el ranking, sin stock o esperando nuevos productos: agregar el mensaje y continuar
+        if proximos_nodos and (
+            "process_selection" in proximos_nodos
+            or "extract_products_info" in proximos_nodos
+            or ("handle_no_stock_response" in proximos_nodos and self.result.get("tiene_stock_disponible") == False)
+        ):
+            return "continuar"
+
+        # Faltan detalles de los productos: nuevo turno con el mensaje
+        if self.result.get("info_completa") == False:
+            return "nuevo_turno"
+
+        return "reiniciar"
+
+    @staticmethod
+    def _ultimo_mensaje_agente(result):
+        """Contenido del último AIMessage del estado (o None)."""
+        for msg in reversed((result or {}).get("messages", [])):
+            if isinstance(msg, AIMessage):
+                return msg.content
+        return None
+
     def is_conversation_complete(self, result):
         selecciones = result.get("selecciones_usuario")
         if selecciones is not None:
             if len(selecciones) > 0:
-                message = f"\n{'='*60}"
-                message += "✅ Pedido procesado exitosamente"
-                message += f"   Productos seleccionados: {len(selecciones)}"
-                
+                message = f"\n{'='*60}\n"
+                message += "✅ Pedido procesado exitosamente\n"
+                message += f"   Productos seleccionados: {len(selecciones)}\n"
+
                 # Mostrar resumen
                 internos = [s for s in selecciones if s['tipo'] == 'INTERNO']
                 externos = [s for s in selecciones if s['tipo'] == 'EXTERNO']
-                
+
                 if internos:
-                    message += f"   • Internos: {len(internos)}"
+                    message += f"   • Internos: {len(internos)}\n"
                 if externos:
-                    message += f"   • Externos: {len(externos)}"
-                
+                    message += f"   • Externos: {len(externos)}\n"
+
                 message += f"{'='*60}\n"
             else:
-                message += "\n❌ Pedido cancelado por el usuario\n"
+                message = "\n❌ Pedido cancelado por el usuario\n"
             return True, message
         return False, None
-            
-    
+
+
     def reset_agent(self):
-        self.agent.reset_state()
+        # Nuevo thread: el checkpointer conserva el estado de la conversación anterior bajo su propio id
+        self.config = {"configurable": {"thread_id": str(uuid.uuid4())}}
         self.result = None
         self.first_message = True
-        self.state = self.ESTADO_INICIAL.copy()
\ No newline at end of file
@@ -0,0 +1,160 @@
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+from dotenv import load_dotenv
+
+# Referencia para las métricas de arranque (bootstrap es lo primero que importan main.py y server.py)
+PROCESS_START = time.perf_counter()
+
+# Imprime tiempo hasta el prompt, hasta la primera respuesta y la duración de cada tarea de warm-up
+STARTUP_METRICS = os.getenv("STARTUP_METRICS", "true").lower() == "true"
+
+_lock = threading.Lock()
+_warmup: Dict[str, Future] = {}
+_tiempos: Dict[str, float] = {}
+_fin: Dict[str, float] = {}
+_reportadas = set()
+_marcas: Dict[str, float] = {}
+
+
+def crear_llm():
+    """
+    Crea el LLM de Groq a partir de GROQ_API_KEY.
+    """
+    from langchain_groq import ChatGroq
+
+    api_key = os.getenv("GROQ_API_KEY")
+    if not api_key:
+        raise ValueError("GROQ_API_KEY no encontrada en .env")
+
+    return ChatGroq(
+        model="openai/gpt-oss-120b",
+        temperature=0.1,
+        api_key=api_key
+    )
+
+
+def _warmup_chains():
+    from chains.chain_administrator import ChainAdministrator
+    ChainAdministrator().generate(crear_llm())
+
+
+def _warmup_busqueda():
+    # SEARCH_BACKEND=atlas|numpy; 'atlas' abre la conexión y hace ping a MongoDB
+    from search.backend_manager import SearchBackendManager
+    SearchBackendManager().initialize()
+
+
+def _warmup_embeddings():
+    from embeddings.model_manager import EmbeddingModelManager
+    EmbeddingModelManager().initialize()
+
+
+def _warmup_reglas():
+    from verification.rule_classifier import ProductRuleClassifier
+    ProductRuleClassifier().initialize()
+
+
+def _warmup_grafo():
+    # Importa langgraph y todos los nodos y compila el grafo con su checkpointer
+    from graph import generate_graph
+    return generate_graph()
+
+
+TAREAS_WARMUP: Dict[str, Callable] = {
+    "chains": _warmup_chains,
+    "busqueda": _warmup_busqueda,
+    "embeddings": _warmup_embeddings,
+    "reglas": _warmup_reglas,
+    "grafo": _warmup_grafo,
+}
+
+
+def _medir(nombre: str, tarea: Callable) -> Callable:
+    def ejecutar():
+        inicio = time.perf_counter()
+        try:
+            return tarea()
+        finally:
+            fin = time.perf_counter()
+            _tiempos[nombre] = fin - inicio
+            _fin[nombre] = fin - PROCESS_START
+    return ejecutar
+
+
+def iniciar_warmup():
+    """
+    Lanza en segundo plano y en paralelo los imports pesados y la inicialización de chains, backend de búsqueda,
+    modelo de embeddings, clasificador por reglas y grafo. Retorna de inmediato; solo la primera llamada tiene efecto.
+    """
+    with _lock:
+        if _warmup:
+            return
+
+        load_dotenv()
+        executor = ThreadPoolExecutor(max_workers=len(TAREAS_WARMUP), thread_name_prefix="warmup")
+        for nombre, tarea in TAREAS_WARMUP.items():
+            _warmup[nombre] = executor.submit(_medir(nombre, tarea))
+        # Los hilos terminan solos al completar sus tareas
+        executor.shutdown(wait=False)
+
+
+def inicializar_componentes():
+    """
+    Espera el warm-up (lanzándolo si hace falta) y retorna el grafo compilado.
+    Es thread-safe: llamadas concurrentes comparten la misma inicialización. Propaga el error de la primera tarea que falle.
+    """
+    iniciar_warmup()
+
+    for futuro in _warmup.values():
+        futuro.result()
+
+    if "warmup" not in _marcas:
+        _marcas["warmup"] = max(_fin.values())
+        if STARTUP_METRICS:
+            detalle = ", ".join(f"{nombre} {segundos:.2f}s" for nombre, segundos in _tiempos.items())
+            print(f"⏱️  Warm-up completo a los {_marcas['warmup']:.2f}s ({detalle})")
+
+    return _warmup["grafo"].result()
+
+
+def precargar_modelos():
+    """
+    Descarga/carga los pesos del modelo de embeddings en la carpeta local (EMBEDDING_MODEL_CACHE_DIR)
+    para que el contenedor arranque sin red. No requiere GROQ_API_KEY ni MongoDB.
+    """
+    load_dotenv()
+    from embeddings.model_manager import MODEL_CACHE_DIR, EmbeddingModelManager
+
+    EmbeddingModelManager().initialize()
+    print(f"✅ Pesos del modelo de embeddings disponibles en {MODEL_CACHE_DIR or 'el cache de Hugging Face'}")
+
+
+def marcar(nombre: str) -> float:
+    """
+    Registra (solo la primera vez) los segundos transcurridos desde el inicio del proceso hasta el evento `nombre`.
+    """
+    if nombre not in _marcas:
+        _marcas[nombre] = time.perf_counter() - PROCESS_START
+    return _marcas[nombre]
+
+
+def reportar(nombre: str, desde: Optional[str] = None):
+    """
+    Imprime una vez una marca registrada (y el tiempo desde la marca `desde`, si existe) cuando STARTUP_METRICS está activo.
+    """
+    if not STARTUP_METRICS or nombre not in _marcas or nombre in _reportadas:
+        return
+    _reportadas.add(nombre)
+    detalle = f" ({_marcas[nombre] - _marcas[desde]:.2f}s desde {desde})" if desde in _marcas else ""
+    print(f"⏱️  {nombre}: {_marcas[nombre]:.2f}s desde el inicio{detalle}")
+
+
+def get_startup_stats() -> Dict:
+    """
+    Retorna las marcas de arranque registradas y la duración de cada tarea de warm-up.
+    """
+    return {"marcas": dict(_marcas), "warmup": dict(_tiempos)}
@@ -0,0 +1,119 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+from caches.ttl_lru_cache import TTLLRUCache
+
+
+class ResponseCache:
+    """
+    Cache de respuestas por clave de contenido: tier LRU + TTL en memoria y tier opcional en SQLite.
+    Los valores son strings (JSON ya serializado por el llamador).
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        ttl_seconds: Optional[float] = 3600,
+        sqlite_path: Optional[str] = None,
+        max_disk_entries: int = 5000
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_disk_entries = max_disk_entries
+        self._memory = TTLLRUCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+        self._db: Optional[sqlite3.Connection] = None
+        if sqlite_path:
+            directorio = os.path.dirname(sqlite_path)
+            if directorio:
+                os.makedirs(directorio, exist_ok=True)
+            # Una conexión compartida entre hilos, serializada con el lock de la instancia
+            self._db = sqlite3.connect(sqlite_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Retorna el valor cacheado (memoria y luego SQLite) o None si no existe o expiró.
+        """
+        valor = self._memory.get(key)
+        if valor is not None:
+            with self._lock:
+                self._stats["memory_hits"] += 1
+            return valor
+
+        if self._db is not None:
+            ahora = time.time()
+            with self._lock:
+                fila = self._db.execute(
+                    "SELECT value, created_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if fila is not None:
+                    valor, creado = fila
+                    if self.ttl_seconds is not None and ahora - creado > self.ttl_seconds:
+                        self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                        self._db.commit()
+                    else:
+                        self._db.execute("UPDATE responses SET last_access = ? WHERE key = ?", (ahora, key))
+                        self._db.commit()
+                        self._stats["disk_hits"] += 1
+                        self._memory.set(key, valor)
+                        return valor
+
+        with self._lock:
+            self._stats["misses"] += 1
+        return None
+
+    def set(self, key: str, value: str):
+        """
+        Guarda el valor en ambos tiers; el tier SQLite se recorta al tope por último acceso.
+        """
+        self._memory.set(key, value)
+
+        if self._db is not None:
+            ahora = time.time()
+            with self._lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, created_at, last_access) VALUES (?, ?, ?, ?)",
+                    (key, value, ahora, ahora)
+                )
+                self._db.execute(
+                    "DELETE FROM responses WHERE key IN ("
+                    "SELECT key FROM responses ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                    (self.max_disk_entries,)
+                )
+                self._db.commit()
+
+    def clear(self):
+        """Vacía ambos tiers."""
+        self._memory.clear()
+        if self._db is not None:
+            with self._lock:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def get_stats(self) -> Dict:
+        """
+        Retorna hits por tier, misses, hit rate y tamaño de cada tier.
+        """
+        with self._lock:
+            hits = self._stats["memory_hits"] + self._stats["disk_hits"]
+            total = hits + self._stats["misses"]
+            disk_entries = (
+                self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0] if self._db is not None else 0
+            )
+            return {
+                **self._stats,
+                "memory_entries": len(self._memory),
+                "disk_entries": disk_entries,
+                "hit_rate": hits / total if total else 0.0
+            }
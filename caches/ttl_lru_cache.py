@@ -0,0 +1,77 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+
+class TTLLRUCache:
+    """
+    Cache en memoria thread-safe con tope de entradas (desalojo LRU) y expiración por TTL.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()  # clave -> (valor, expira_en)
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Retorna el valor si existe y no expiró (y lo marca como recién usado); si no, `default`.
+        """
+        with self._lock:
+            entrada = self._data.get(key)
+            if entrada is None:
+                self._stats["misses"] += 1
+                return default
+
+            valor, expira_en = entrada
+            if expira_en is not None and expira_en <= time.monotonic():
+                del self._data[key]
+                self._stats["expirations"] += 1
+                self._stats["misses"] += 1
+                return default
+
+            self._data.move_to_end(key)
+            self._stats["hits"] += 1
+            return valor
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None):
+        """
+        Guarda el valor (TTL propio o el del cache) desalojando el menos usado si se supera el tope.
+        """
+        ttl = ttl_seconds if ttl_seconds is not None else self.ttl_seconds
+        expira_en = time.monotonic() + ttl if ttl is not None else None
+
+        with self._lock:
+            self._data[key] = (value, expira_en)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def delete(self, key: Hashable):
+        """Elimina la clave si existe."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        """Vacía el cache (los contadores se conservan)."""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get_stats(self) -> Dict:
+        """
+        Retorna hits/misses/desalojos/expiraciones, tamaño actual y hit rate.
+        """
+        with self._lock:
+            total = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "entries": len(self._data),
+                "hit_rate": self._stats["hits"] / total if total else 0.0
+            }
@@ -0,0 +1,91 @@
+import hashlib
+import json
+from typing import Any, Callable, Optional
+
+from langchain_core.load import dumpd
+from langchain_core.messages import message_to_dict, messages_from_dict
+from langchain_core.runnables import Runnable, RunnableConfig
+
+from caches.response_cache import ResponseCache
+
+
+def _hash(valor: Any) -> str:
+    """SHA-256 de un valor serializado a JSON canónico."""
+    texto = json.dumps(valor, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+
+def model_identifier(llm) -> str:
+    """Identificador del modelo (clase + nombre + temperatura) para la clave del cache."""
+    nombre = getattr(llm, "model_name", None) or getattr(llm, "model", None) or ""
+    return f"{type(llm).__name__}:{nombre}:{getattr(llm, 'temperature', '')}"
+
+
+def prompt_hash(chain) -> str:
+    """Hash del prompt de una chain `prompt | llm` (el primer paso de la secuencia)."""
+    prompt = getattr(chain, "first", chain)
+    try:
+        return _hash(dumpd(prompt))
+    except Exception:
+        return _hash(repr(prompt))
+
+
+class CachedChain(Runnable):
+    """
+    Envuelve una chain `prompt | llm` con un cache por contenido: clave = chain + modelo + hash del prompt +
+    versión del catálogo + hash del input. Un hit retorna el mensaje cacheado sin llamar al LLM.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        chain: Runnable,
+        cache: ResponseCache,
+        model_id: str,
+        version_provider: Optional[Callable[[], Optional[str]]] = None
+    ):
+        self.name = name
+        self.chain = chain
+        self.cache = cache
+        self.model_id = model_id
+        self.prompt_hash = prompt_hash(chain)
+        self.version_provider = version_provider
+
+    def _key(self, input: Any) -> str:
+        """Clave del cache para el input (incluye la versión del catálogo vigente)."""
+        version = self.version_provider() if self.version_provider else None
+        return _hash([self.name, self.model_id, self.prompt_hash, version, _hash(input)])
+
+    def _lookup(self, key: str):
+        """Mensaje cacheado para la clave o None."""
+        valor = self.cache.get(key)
+        if valor is None:
+            return None
+        return messages_from_dict([json.loads(valor)])[0]
+
+    def _store(self, key: str, respuesta):
+        """Guarda la respuesta si es un mensaje serializable (las respuestas con error no llegan acá)."""
+        try:
+            self.cache.set(key, json.dumps(message_to_dict(respuesta), ensure_ascii=False))
+        except Exception as e:
+            print(f"No se pudo cachear la respuesta de '{self.name}': {e}")
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs) -> Any:
+        key = self._key(input)
+        respuesta = self._lookup(key)
+        if respuesta is not None:
+            return respuesta
+
+        respuesta = self.chain.invoke(input, config, **kwargs)
+        self._store(key, respuesta)
+        return respuesta
+
+    async def ainvoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs) -> Any:
+        key = self._key(input)
+        respuesta = self._lookup(key)
+        if respuesta is not None:
+            return respuesta
+
+        respuesta = await self.chain.ainvoke(input, config, **kwargs)
+        self._store(key, respuesta)
+        return respuesta
@@ -1,13 +1,32 @@
+import os
+import threading
 from typing import Dict, Any, Optional
 
+from caches.response_cache import ResponseCache
+from chains.cached_chain import CachedChain, model_identifier
+from chains.chain_generator.history_summary_chain import generate_history_summary_chain
 from chains.chain_generator.identify_product_chain import generate_identify_product_chain
 from chains.chain_generator.ranking_chain import generate_ranking_chain
+from chains.chain_generator.ranking_commentary_chain import generate_ranking_commentary_chain
 from chains.chain_generator.validation_chain import generate_validation_chain
 from chains.chain_generator.verify_product_chain import generate_verify_product_chain
 from chains.chain_generator.selection_interpretation_chain import generate_selection_interpretation_chain
 from chains.chain_generator.no_stock_chain import generate_no_stock_chain
 from chains.chain_generator.interpret_no_stock_response_chain import generate_interpret_no_stock_response_chain
 
+# Cache de respuestas para chains deterministas respecto de su input (RESPONSE_CACHE_SQLITE vacío = solo memoria)
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "256"))
+RESPONSE_CACHE_TTL_S = float(os.getenv("RESPONSE_CACHE_TTL_S", "3600"))
+RESPONSE_CACHE_SQLITE = os.getenv("RESPONSE_CACHE_SQLITE", ".cache/responses.sqlite")
+CACHED_CHAINS = ("ranking_chain", "no_stock_chain")
+
+
+def _catalog_version() -> Optional[str]:
+    """Versión del catálogo del backend de búsqueda activo (parte de la clave del cache)."""
+    from search.backend_manager import SearchBackendManager
+    return SearchBackendManager().get_catalog_version()
+
 
 class ChainAdministrator:
     """
@@ -15,32 +34,57 @@ class ChainAdministrator:
     """
     _instance = None
     _chains: Dict[str, Any] = {}
+    _response_cache: Optional[ResponseCache] = None
+    _lock = threading.Lock()
 
     def __new__(cls, *args, **kwargs):
         """Asegura que solo se cree una instancia de la clase."""
         if cls._instance is None:
-            cls._instance = super(ChainAdministrator, cls).__new__(cls)
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super(ChainAdministrator, cls).__new__(cls)
         return cls._instance
 
     def generate(self, llm):
         """
-        Inicializa todas las chains con el LLM proporcionado si aún no fueron generadas.
+        Inicializa todas las chains con el LLM proporcionado si aún no fueron generadas (thread-safe).
         """
-        if self._chains:
-            print("Las cadenas ya fueron generadas. Usando la instancia existente.")
-            return
+        with self._lock:
+            if self._chains:
+                print("Las cadenas ya fueron generadas. Usando la instancia existente.")
+                return
+            self._generate(llm)
 
+    def _generate(self, llm):
+        """Genera las chains (se llama con el lock tomado)."""
         print("Generando las cadenas...")
+        chains: Dict[str, Any] = {}
 
-        self._chains['extraction_chain'] = generate_identify_product_chain(llm)
-        self._chains['validation_chain'] = generate_validation_chain(llm)
-        self._chains['ranking_chain'] = generate_ranking_chain(llm)
-        self._chains['verify_product_chain'] = generate_verify_product_chain(llm)
-        self._chains['selection_interpretation_chain'] = generate_selection_interpretation_chain(llm)
-        self._chains['no_stock_chain'] = generate_no_stock_chain(llm)
-        self._chains['interpret_no_stock_response_chain'] = generate_interpret_no_stock_response_chain(llm)
+        chains['extraction_chain'] = generate_identify_product_chain(llm)
+        chains['validation_chain'] = generate_validation_chain(llm)
+        chains['ranking_chain'] = generate_ranking_chain(llm)
+        chains['ranking_commentary_chain'] = generate_ranking_commentary_chain(llm)
+        chains['verify_product_chain'] = generate_verify_product_chain(llm)
+        chains['selection_interpretation_chain'] = generate_selection_interpretation_chain(llm)
+        chains['no_stock_chain'] = generate_no_stock_chain(llm)
+        chains['interpret_no_stock_response_chain'] = generate_interpret_no_stock_response_chain(llm)
+        chains['history_summary_chain'] = generate_history_summary_chain(llm)
         
-                        
+        if RESPONSE_CACHE_ENABLED:
+            self._response_cache = ResponseCache(
+                max_entries=RESPONSE_CACHE_SIZE,
+                ttl_seconds=RESPONSE_CACHE_TTL_S,
+                sqlite_path=RESPONSE_CACHE_SQLITE or None
+            )
+            for key in CACHED_CHAINS:
+                chains[key] = CachedChain(
+                    key, chains[key], self._response_cache,
+                    model_id=model_identifier(llm),
+                    version_provider=_catalog_version
+                )
+
+        # Se publican todas juntas: otro hilo nunca ve un diccionario a medio generar
+        ChainAdministrator._chains = chains
         print("Generación de cadenas completada.")
         
     def get(self, key: Optional[str] = None) -> Any:
@@ -58,4 +102,10 @@ class ChainAdministrator:
         if key not in self._chains:
             raise KeyError(f"La clave de cadena '{key}' no existe. Claves disponibles: {list(self._chains.keys())}")
             
-        return self._chains[key]
\ No newline at end of file
+        return self._chains[key]
+
+    def get_cache_stats(self) -> Dict:
+        """
+        Retorna las estadísticas del cache de respuestas (vacío si está deshabilitado).
+        """
+        return self._response_cache.get_stats() if self._response_cache is not None else {}
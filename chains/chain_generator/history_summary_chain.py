@@ -0,0 +1,16 @@
+from langchain_core.prompts import ChatPromptTemplate
+
+
+def generate_history_summary_chain(llm):
+    """
+    Crea chain que extiende el resumen de la conversación con los turnos que salen de la ventana de historial.
+    """
+    with open('system_prompts/history_summary_prompt.txt', 'r', encoding='utf-8') as f:
+        HISTORY_SUMMARY_PROMPT = f.read()
+
+    summary_prompt_template = ChatPromptTemplate.from_messages([
+        ("system", HISTORY_SUMMARY_PROMPT),
+        ("user", "Resumen previo:\n{resumen_previo}\n\nNuevos mensajes:\n{historial}")
+    ])
+
+    return summary_prompt_template | llm
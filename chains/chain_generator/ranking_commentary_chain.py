@@ -0,0 +1,16 @@
+from langchain_core.prompts import ChatPromptTemplate
+
+
+def generate_ranking_commentary_chain(llm):
+    """
+    Crea chain que agrega un comentario breve sobre un ranking ya ordenado por el motor de reglas.
+    """
+    with open('system_prompts/ranking_commentary_prompt.txt', 'r', encoding='utf-8') as f:
+        COMMENTARY_PROMPT = f.read()
+
+    commentary_prompt_template = ChatPromptTemplate.from_messages([
+        ("system", COMMENTARY_PROMPT),
+        ("user", "Ranking:\n\n{ranking_texto}")
+    ])
+
+    return commentary_prompt_template | llm
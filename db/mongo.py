@@ -1,29 +1,144 @@
+import asyncio
 import os
-from pymongo import MongoClient
+import threading
+import time
+from pymongo import ASCENDING, AsyncMongoClient, MongoClient, ReturnDocument
+from pymongo.asynchronous.collection import AsyncCollection
 from pymongo.collection import Collection
-from typing import Optional
+from pymongo.errors import DuplicateKeyError
+from typing import Dict, Optional
+
+# Documento con la versión del catálogo (la incrementa cada carga; invalida caches derivados del catálogo)
+# y el puntero a la collection activa (la cambia la reconstrucción en staging)
+CATALOG_META_COLLECTION = "catalog_meta"
+CATALOG_META_ID = "repuestos"
+# Collection del catálogo cuando el puntero aún no existe (cargas previas a la reconstrucción en staging)
+CATALOG_COLLECTION = "repuestos"
+# Cada cuántos segundos se vuelve a leer el puntero a la collection activa
+CATALOG_POINTER_CHECK_S = float(os.getenv("CATALOG_POINTER_CHECK_S", "10"))
+
+
+def parts_collection_name(offers_name: str) -> str:
+    """
+    Collection de partes (un vector por hash de contenido) asociada a una collection de ofertas del catálogo.
+    """
+    return f"{offers_name}_parts"
+
+
+def bump_catalog_version(db) -> int:
+    """
+    Incrementa la versión del catálogo en la base indicada y retorna la nueva versión.
+    """
+    meta = db[CATALOG_META_COLLECTION].find_one_and_update(
+        {"_id": CATALOG_META_ID},
+        {"$inc": {"version": 1}, "$currentDate": {"updated_at": True}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    return int(meta["version"])
+
+
+def ensure_offer_indexes(collection: Collection):
+    """
+    Índices de la collection de ofertas que usan las búsquedas: (id_repuesto, proveedor_tipo) para la búsqueda
+    por código y (embedding_hash, proveedor_tipo) para unir cada parte con sus ofertas.
+    """
+    collection.create_index(
+        [("id_repuesto", ASCENDING), ("proveedor_tipo", ASCENDING)], name="id_repuesto_proveedor_tipo"
+    )
+    collection.create_index(
+        [("embedding_hash", ASCENDING), ("proveedor_tipo", ASCENDING)], name="embedding_hash_proveedor_tipo"
+    )
+
+
+def _catalog_pointer(meta: Optional[Dict]) -> Dict:
+    """Puntero del catálogo a partir del documento de catalog_meta (None si aún no existe)."""
+    meta = meta or {}
+    return {
+        "version": int(meta.get("version", 0)),
+        "active_collection": meta.get("active_collection", CATALOG_COLLECTION),
+        "previous_collection": meta.get("previous_collection")
+    }
+
+
+def get_catalog_pointer(db) -> Dict:
+    """
+    Retorna {version, active_collection, previous_collection} del catálogo en la base indicada.
+    """
+    return _catalog_pointer(db[CATALOG_META_COLLECTION].find_one({"_id": CATALOG_META_ID}))
+
+
+async def aget_catalog_pointer(db) -> Dict:
+    """
+    Versión async de get_catalog_pointer sobre una base de un AsyncMongoClient.
+    """
+    return _catalog_pointer(await db[CATALOG_META_COLLECTION].find_one({"_id": CATALOG_META_ID}))
+
+
+def switch_catalog_collection(db, nueva: str, activa_esperada: str) -> int:
+    """
+    Apunta el catálogo a la collection `nueva` en una sola escritura (la anterior queda como previous_collection
+    para rollback) e incrementa la versión. Falla si otro proceso cambió el puntero desde que se leyó `activa_esperada`.
+    """
+    filtro = {"_id": CATALOG_META_ID, "active_collection": activa_esperada}
+    if activa_esperada == CATALOG_COLLECTION:
+        # Documento sin puntero (cargas anteriores): equivale a la collection por defecto
+        filtro["active_collection"] = {"$in": [None, CATALOG_COLLECTION]}
+
+    try:
+        meta = db[CATALOG_META_COLLECTION].find_one_and_update(
+            filtro,
+            {
+                "$set": {"active_collection": nueva, "previous_collection": activa_esperada},
+                "$inc": {"version": 1},
+                "$currentDate": {"updated_at": True}
+            },
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        raise RuntimeError(
+            f"El puntero del catálogo ya no apunta a '{activa_esperada}': otro proceso lo cambió"
+        ) from None
+    return int(meta["version"])
+
 
 class MongoCollectionManager:
     """
-    Singleton que gestiona conexión a MongoDB y retorna la collection 'repuestos' de forma única.
+    Singleton que gestiona conexión a MongoDB y retorna la collection activa del catálogo de forma única.
+    La collection activa la indica el puntero de catalog_meta ('repuestos' si aún no existe).
     """
     _instance = None
     _collection: Optional[Collection] = None
+    _async_client: Optional[AsyncMongoClient] = None
+    _async_loop: Optional[asyncio.AbstractEventLoop] = None
+    # Reentrante: get_collection() puede llamar a initialize() con el lock tomado
+    _lock = threading.RLock()
+    # Puntero a la collection activa y versión del catálogo (releídos cada CATALOG_POINTER_CHECK_S)
+    _active_name: str = CATALOG_COLLECTION
+    _catalog_version: int = 0
+    _pointer_checked_at: float = 0.0
 
     def __new__(cls, *args, **kwargs):
         """Asegura que solo se cree una instancia de la clase."""
         if cls._instance is None:
-            cls._instance = super(MongoCollectionManager, cls).__new__(cls)
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super(MongoCollectionManager, cls).__new__(cls)
         return cls._instance
 
     def initialize(self):
         """
-        Establece conexión con MongoDB y asigna collection; solo se ejecuta en la primera llamada.
+        Establece conexión con MongoDB y asigna collection; solo se ejecuta en la primera llamada (thread-safe).
         """
-        if self._collection is not None:
-            print("Conexión a MongoDB ya inicializada. Usando la collection existente.")
-            return
+        with self._lock:
+            if self._collection is not None:
+                print("Conexión a MongoDB ya inicializada. Usando la collection existente.")
+                return
+            self._connect()
 
+    def _connect(self):
+        """Crea el cliente, asigna la collection y asegura los índices (se llama con el lock tomado)."""
         print("Inicializando conexión a MongoDB...")
         
         # 1. Obtener URI
@@ -39,26 +154,152 @@ class MongoCollectionManager:
             
             # 3. Acceder a DB y Collection
             db = client["repuestos_db"]
-            self._collection = db.repuestos
             
             # Opcional: Probar la conexión (ping)
             client.admin.command('ping')
-            print("Conexión exitosa a MongoDB y collection 'repuestos' establecida.")
+            # Se publica recién con la conexión verificada (get_collection lee sin lock)
+            self._refrescar_puntero(db)
+            print(f"Conexión exitosa a MongoDB y collection '{self._active_name}' establecida.")
             
         except Exception as e:
             print(f"Error al conectar con MongoDB: {e}")
             self._collection = None
             raise
 
+        self.ensure_indexes()
+
+    def _refrescar_puntero(self, db):
+        """
+        Lee el puntero del catálogo y publica la collection activa y la versión. Si la lectura falla
+        (y ya hay una collection publicada) se conserva la última conocida hasta el siguiente intento.
+        """
+        try:
+            puntero = get_catalog_pointer(db)
+        except Exception as e:
+            if self._collection is None:
+                raise
+            print(f"No se pudo leer el puntero del catálogo: {e}")
+        else:
+            self._publicar_puntero(puntero, db)
+        self._pointer_checked_at = time.monotonic()
+
+    async def _arefrescar_puntero(self, async_db):
+        """
+        Versión async de _refrescar_puntero: lee el puntero con el cliente async para no bloquear el event loop.
+        Requiere una collection ya publicada (la base sync se toma de ella).
+        """
+        try:
+            puntero = await aget_catalog_pointer(async_db)
+        except Exception as e:
+            print(f"No se pudo leer el puntero del catálogo: {e}")
+        else:
+            self._publicar_puntero(puntero, self._collection.database)
+        self._pointer_checked_at = time.monotonic()
+
+    def _publicar_puntero(self, puntero: Dict, db):
+        """Publica la collection activa (sobre la base sync `db`) y la versión del catálogo."""
+        if puntero["active_collection"] != self._active_name:
+            print(f"Catálogo activo: '{puntero['active_collection']}' (versión {puntero['version']})")
+        self._active_name = puntero["active_collection"]
+        self._catalog_version = puntero["version"]
+        self._collection = db[self._active_name]
+
+    def _puntero_vencido(self) -> bool:
+        return time.monotonic() - self._pointer_checked_at > CATALOG_POINTER_CHECK_S
+
+    def ensure_indexes(self):
+        """
+        Asegura los índices de ofertas (por código y por parte) usados por las búsquedas; es idempotente.
+        """
+        try:
+            ensure_offer_indexes(self._collection)
+        except Exception as e:
+            # Sin los índices las búsquedas siguen funcionando (con collection scan)
+            print(f"No se pudieron asegurar los índices de ofertas: {e}")
+
     def get_collection(self) -> Collection:
         """
-        Retorna instancia de collection 'repuestos'; inicializa conexión si aún no existe.
+        Retorna la collection activa del catálogo; inicializa conexión si aún no existe.
         """
         if self._collection is None:
             # Si no se ha inicializado, intenta hacerlo (puede levantar un ValueError)
-            self.initialize()
+            with self._lock:
+                if self._collection is None:
+                    self._connect()
         
         if self._collection is None:
              raise RuntimeError("La collection no pudo ser obtenida. Revisa la inicialización.")
 
-        return self._collection
\ No newline at end of file
+        # Tras una reconstrucción el puntero cambia: las búsquedas pasan a la nueva collection sin reiniciar
+        if self._puntero_vencido():
+            self._refrescar_puntero(self._collection.database)
+
+        return self._collection
+
+    def get_catalog_version(self) -> int:
+        """
+        Retorna la versión actual del catálogo (0 si nunca se registró una carga); relee el puntero.
+        """
+        self._refrescar_puntero(self.get_collection().database)
+        return self._catalog_version
+
+    def get_active_collection_name(self) -> str:
+        """
+        Retorna el nombre de la collection activa del catálogo.
+        """
+        self.get_collection()
+        return self._active_name
+
+    def get_parts_collection(self) -> Collection:
+        """
+        Retorna la collection de partes (vectores únicos por contenido) de la versión activa del catálogo.
+        """
+        collection = self.get_collection()
+        return collection.database[parts_collection_name(collection.name)]
+
+    async def get_async_collection(self) -> AsyncCollection:
+        """
+        Retorna la collection activa del catálogo sobre el AsyncMongoClient del event loop en curso (nodos async).
+        Hay un solo cliente async: si cambia el loop se crea uno nuevo y se cierra el reemplazado.
+        """
+        loop = asyncio.get_running_loop()
+
+        # La primera conexión (ping e índices) es sync: corre en un thread para no bloquear el loop
+        if self._collection is None:
+            await asyncio.to_thread(self.get_collection)
+
+        # El cliente async queda atado al loop que lo creó: se recrea si cambia el loop
+        reemplazado = None
+        with self._lock:
+            if self._async_client is None or self._async_loop is not loop:
+                MONGO_URI = os.getenv("MONGO_URI")
+                if not MONGO_URI:
+                    raise ValueError("MONGO_URI no encontrada en las variables de entorno.")
+
+                reemplazado, loop_reemplazado = self._async_client, self._async_loop
+                self._async_client = AsyncMongoClient(MONGO_URI)
+                self._async_loop = loop
+            client = self._async_client
+
+        if reemplazado is not None:
+            await self._cerrar_cliente_async(reemplazado, loop_reemplazado)
+
+        async_db = client["repuestos_db"]
+        # Tras una reconstrucción el puntero cambia: se relee con el cliente async
+        if self._puntero_vencido():
+            await self._arefrescar_puntero(async_db)
+
+        return async_db[self._active_name]
+
+    @staticmethod
+    async def _cerrar_cliente_async(client: AsyncMongoClient, loop: Optional[asyncio.AbstractEventLoop]):
+        """
+        Cierra un cliente async reemplazado: en su propio loop si sigue corriendo, si no en el loop en curso.
+        """
+        try:
+            if loop is not None and loop.is_running() and not loop.is_closed():
+                await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(client.close(), loop))
+            else:
+                await client.close()
+        except Exception as e:
+            print(f"No se pudo cerrar el cliente async anterior de MongoDB: {e}")
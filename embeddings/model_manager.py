@@ -0,0 +1,155 @@
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+import psutil
+
+from embeddings.query_cache import QueryEmbeddingCache
+from utils import normalize_text
+
+if TYPE_CHECKING:
+    # sentence_transformers (y torch) se importan recién al cargar el modelo
+    from sentence_transformers import SentenceTransformer
+
+DEFAULT_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "sentence-transformers/all-MiniLM-L6-v2")
+ENCODE_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+# Carpeta local de pesos del modelo (vacío = cache por defecto de Hugging Face); ver main.py --warmup-only
+MODEL_CACHE_DIR = os.getenv("EMBEDDING_MODEL_CACHE_DIR") or None
+
+# Cache de embeddings de queries (EMBEDDING_CACHE_DIR vacío desactiva el tier en disco)
+CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", ".cache/query_embeddings")
+CACHE_MEMORY_SIZE = int(os.getenv("EMBEDDING_CACHE_MEMORY_SIZE", "2048"))
+CACHE_DISK_SIZE = int(os.getenv("EMBEDDING_CACHE_DISK_SIZE", "20000"))
+
+# Normalización de queries para deduplicar y cachear (el modelo es uncased, el vector no cambia)
+normalize_query = normalize_text
+
+
+class EmbeddingModelManager:
+    """
+    Singleton thread-safe que carga cada modelo de embeddings una única vez por proceso y lo comparte.
+    """
+    _instance = None
+    _models: Dict[str, "SentenceTransformer"] = {}
+    _stats: Dict[str, Dict[str, float]] = {}
+    _caches: Dict[str, QueryEmbeddingCache] = {}
+    _lock = threading.Lock()
+
+    def __new__(cls, *args, **kwargs):
+        """Asegura que solo se cree una instancia de la clase."""
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super(EmbeddingModelManager, cls).__new__(cls)
+        return cls._instance
+
+    def initialize(self, model_name: str = DEFAULT_MODEL_NAME):
+        """
+        Precarga (warm-up) el modelo al inicio del proceso para que la primera búsqueda no pague la carga.
+        """
+        if model_name in self._models:
+            print(f"Modelo de embeddings '{model_name}' ya cargado. Usando la instancia existente.")
+            return
+
+        self.get_model(model_name)
+        stats = self._stats[model_name]
+        print(
+            f"Modelo de embeddings '{model_name}' cargado en {stats['load_time_s']:.2f}s "
+            f"(+{stats['rss_delta_mb']:.1f} MB, RSS {stats['rss_mb']:.1f} MB)."
+        )
+
+    def get_model(self, model_name: str = DEFAULT_MODEL_NAME) -> "SentenceTransformer":
+        """
+        Retorna el modelo compartido; lo carga bajo lock solo la primera vez que se solicita.
+        """
+        model = self._models.get(model_name)
+        if model is not None:
+            return model
+
+        with self._lock:
+            # Double-checked locking: otro hilo pudo cargarlo mientras esperábamos
+            model = self._models.get(model_name)
+            if model is not None:
+                return model
+
+            process = psutil.Process(os.getpid())
+            rss_antes = process.memory_info().rss
+            inicio = time.perf_counter()
+
+            from sentence_transformers import SentenceTransformer
+            model = SentenceTransformer(model_name, cache_folder=MODEL_CACHE_DIR)
+
+            load_time = time.perf_counter() - inicio
+            rss_despues = process.memory_info().rss
+
+            self._stats[model_name] = {
+                "load_time_s": load_time,
+                "rss_mb": rss_despues / (1024 * 1024),
+                "rss_delta_mb": (rss_despues - rss_antes) / (1024 * 1024)
+            }
+            self._models[model_name] = model
+
+        return model
+
+    def get_cache(self, model_name: str = DEFAULT_MODEL_NAME) -> QueryEmbeddingCache:
+        """
+        Retorna el cache de embeddings de queries del modelo; lo crea (y abre el tier en disco) la primera vez.
+        """
+        cache = self._caches.get(model_name)
+        if cache is not None:
+            return cache
+
+        with self._lock:
+            if model_name not in self._caches:
+                self._caches[model_name] = QueryEmbeddingCache(
+                    model_name,
+                    cache_dir=CACHE_DIR or None,
+                    max_memory_entries=CACHE_MEMORY_SIZE,
+                    max_disk_entries=CACHE_DISK_SIZE
+                )
+            return self._caches[model_name]
+
+    def encode_queries(self, queries: List[str], model_name: str = DEFAULT_MODEL_NAME) -> Dict[str, List[float]]:
+        """
+        Normaliza y deduplica las queries del turno; resuelve las cacheadas y codifica el resto en un único batch.
+        Retorna {query_normalizada: vector}.
+        """
+        queries_unicas = list(dict.fromkeys(
+            normalize_query(q) for q in queries if q and str(q).strip()
+        ))
+
+        if not queries_unicas:
+            return {}
+
+        cache = self.get_cache(model_name)
+        embeddings = cache.get_many(queries_unicas)
+
+        # Solo las queries no cacheadas llegan al modelo
+        faltantes = [q for q in queries_unicas if q not in embeddings]
+        if faltantes:
+            vectores = self.get_model(model_name).encode(
+                faltantes,
+                batch_size=ENCODE_BATCH_SIZE,
+                convert_to_numpy=True
+            )
+            nuevos = {query: vector.tolist() for query, vector in zip(faltantes, vectores)}
+            cache.put_many(nuevos)
+            embeddings.update(nuevos)
+
+        return embeddings
+
+    def get_stats(self, model_name: Optional[str] = None) -> Dict:
+        """
+        Retorna tiempo de carga y memoria residente por modelo (o de uno específico) más el RSS actual.
+        """
+        rss_actual = psutil.Process(os.getpid()).memory_info().rss / (1024 * 1024)
+
+        if model_name is not None:
+            return {**self._stats.get(model_name, {}), "rss_actual_mb": rss_actual}
+
+        return {
+            "modelos": dict(self._stats),
+            "query_cache": {nombre: cache.get_stats() for nombre, cache in self._caches.items()},
+            "rss_actual_mb": rss_actual
+        }
@@ -0,0 +1,175 @@
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+class QueryEmbeddingCache:
+    """
+    Cache de embeddings de queries por modelo: tier LRU en memoria + tier en disco (memmap float32 + índice JSON).
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        cache_dir: Optional[str] = None,
+        max_memory_entries: int = 2048,
+        max_disk_entries: int = 20000
+    ):
+        self.model_name = model_name
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self._lock = threading.Lock()
+
+        # Tier 1: LRU en memoria {texto_normalizado: vector}
+        self._memory: "OrderedDict[str, List[float]]" = OrderedDict()
+
+        # Tier 2: disco {texto_normalizado: slot} en orden LRU + matriz memmap (slots x dim)
+        self._disk_index: "OrderedDict[str, int]" = OrderedDict()
+        self._matrix: Optional[np.memmap] = None
+        self._dim: Optional[int] = None
+
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+
+        self._index_path = None
+        self._matrix_path = None
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name)
+            self._index_path = os.path.join(cache_dir, f"{slug}.index.json")
+            self._matrix_path = os.path.join(cache_dir, f"{slug}.f32")
+            self._load_disk_tier()
+
+    # ───────────────────────────── API pública ─────────────────────────────
+
+    def get_many(self, textos: List[str]) -> Dict[str, List[float]]:
+        """
+        Retorna los vectores cacheados para los textos (ya normalizados); los ausentes se cuentan como miss.
+        """
+        encontrados = {}
+
+        with self._lock:
+            for texto in textos:
+                vector = self._memory.get(texto)
+                if vector is not None:
+                    self._memory.move_to_end(texto)
+                    self._stats["memory_hits"] += 1
+                    encontrados[texto] = vector
+                    continue
+
+                slot = self._disk_index.get(texto)
+                if slot is not None and self._matrix is not None:
+                    self._disk_index.move_to_end(texto)
+                    vector = self._matrix[slot].tolist()
+                    self._remember(texto, vector)
+                    self._stats["disk_hits"] += 1
+                    encontrados[texto] = vector
+                    continue
+
+                self._stats["misses"] += 1
+
+        return encontrados
+
+    def put_many(self, vectores: Dict[str, List[float]]):
+        """
+        Guarda vectores recién calculados en ambos tiers y persiste el índice en disco.
+        """
+        if not vectores:
+            return
+
+        with self._lock:
+            for texto, vector in vectores.items():
+                self._remember(texto, vector)
+                if self._index_path is not None:
+                    self._write_to_disk(texto, vector)
+
+            if self._index_path is not None and self._matrix is not None:
+                self._matrix.flush()
+                self._save_index()
+
+    def get_stats(self) -> Dict:
+        """
+        Retorna contadores de hits/misses, tamaño de cada tier y hit rate.
+        """
+        with self._lock:
+            hits = self._stats["memory_hits"] + self._stats["disk_hits"]
+            total = hits + self._stats["misses"]
+            return {
+                **self._stats,
+                "memory_entries": len(self._memory),
+                "disk_entries": len(self._disk_index),
+                "hit_rate": hits / total if total else 0.0
+            }
+
+    # ─────────────────────────── Helpers internos ───────────────────────────
+
+    def _remember(self, texto: str, vector: List[float]):
+        """Inserta en el tier de memoria desalojando el menos usado si se supera el tope."""
+        self._memory[texto] = vector
+        self._memory.move_to_end(texto)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def _write_to_disk(self, texto: str, vector: List[float]):
+        """Escribe el vector en su slot del memmap (reusa el slot del menos usado si está lleno)."""
+        if self._matrix is None:
+            self._dim = len(vector)
+            self._matrix = np.memmap(
+                self._matrix_path, dtype=np.float32, mode="w+",
+                shape=(self.max_disk_entries, self._dim)
+            )
+
+        slot = self._disk_index.get(texto)
+        if slot is None:
+            if len(self._disk_index) < self.max_disk_entries:
+                slot = len(self._disk_index)
+            else:
+                _, slot = self._disk_index.popitem(last=False)
+                self._stats["evictions"] += 1
+
+        self._matrix[slot] = np.asarray(vector, dtype=np.float32)
+        self._disk_index[texto] = slot
+        self._disk_index.move_to_end(texto)
+
+    def _load_disk_tier(self):
+        """Abre el memmap y el índice persistidos; los descarta si el tope o el modelo cambiaron."""
+        if not (os.path.exists(self._index_path) and os.path.exists(self._matrix_path)):
+            return
+
+        try:
+            with open(self._index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+
+            if index.get("model_name") != self.model_name or index.get("capacity") != self.max_disk_entries:
+                print("Cache de embeddings en disco incompatible (modelo o tamaño distinto). Se recrea.")
+                return
+
+            self._dim = int(index["dim"])
+            self._matrix = np.memmap(
+                self._matrix_path, dtype=np.float32, mode="r+",
+                shape=(self.max_disk_entries, self._dim)
+            )
+            self._disk_index = OrderedDict((texto, int(slot)) for texto, slot in index["entries"])
+
+        except Exception as e:
+            print(f"Error al leer cache de embeddings en disco: {e}. Se recrea.")
+            self._matrix = None
+            self._dim = None
+            self._disk_index = OrderedDict()
+
+    def _save_index(self):
+        """Persiste el índice de forma atómica (archivo temporal + replace)."""
+        tmp_path = f"{self._index_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "model_name": self.model_name,
+                "dim": self._dim,
+                "capacity": self.max_disk_entries,
+                "entries": list(self._disk_index.items())
+            }, f, ensure_ascii=False)
+        os.replace(tmp_path, self._index_path)
@@ -1,8 +1,13 @@
 from langgraph.graph import StateGraph, START, END
-from langgraph.checkpoint.memory import MemorySaver
+from langchain_core.runnables import RunnableLambda
 from nodes.extract_products_info import extract_products_info
-from nodes.check_product_info_completeness import check_product_info_completeness
-from nodes.semantic_search import semantic_search_internal, semantic_search_external
+from nodes.check_product_info_completeness import check_product_info_completeness, acheck_product_info_completeness
+from nodes.semantic_search import (
+    semantic_search_internal,
+    semantic_search_external,
+    asemantic_search_internal,
+    asemantic_search_external
+)
 from nodes.generate_ranking import generate_ranking
 from nodes.validation import classify_request, set_val_message
 from nodes.human_in_the_loop_selection import human_in_the_loop_selection
@@ -24,6 +29,8 @@ from routes.routes import (
     route_after_stock_check,
     route_after_no_stock_response
 )
+from persistence.checkpointer import create_checkpointer
+from streaming import RANKING_NODE, STREAMED_NODES
 from schemas.state import AgentState
 
 
@@ -31,7 +38,8 @@ def generate_graph():
     """
     Construye y retorna el grafo LangGraph con todos los nodos, edges y checkpointing configurados.
     """
-    memory = MemorySaver()
+    # SQLite con retención acotada (por defecto) o MemorySaver según CHECKPOINT_BACKEND
+    memory = create_checkpointer()
 
     # Definimos el grafo
     graph_builder = StateGraph(AgentState)
@@ -41,12 +49,21 @@ def generate_graph():
     graph_builder.add_node("set_val_message", set_val_message)
     # Nodos para extracción y verificación
     graph_builder.add_node("extract_products_info", extract_products_info) 
-    graph_builder.add_node("check_product_info_completeness", check_product_info_completeness) 
-    # Nodos de búsqueda semántica
-    graph_builder.add_node("semantic_search_internal", semantic_search_internal)
-    graph_builder.add_node("semantic_search_external", semantic_search_external)
+    graph_builder.add_node(
+        "check_product_info_completeness",
+        RunnableLambda(check_product_info_completeness, afunc=acheck_product_info_completeness, name="check_product_info_completeness")
+    )
+    # Nodos de búsqueda semántica (versión sync para invoke/stream y async para ainvoke/astream)
+    graph_builder.add_node(
+        "semantic_search_internal",
+        RunnableLambda(semantic_search_internal, afunc=asemantic_search_internal, name="semantic_search_internal")
+    )
+    graph_builder.add_node(
+        "semantic_search_external",
+        RunnableLambda(semantic_search_external, afunc=asemantic_search_external, name="semantic_search_external")
+    )
     # Nodo de ranking
-    graph_builder.add_node("reranking", generate_ranking)
+    graph_builder.add_node(RANKING_NODE, generate_ranking)
 
     # Conecto los nodos
     graph_builder.add_edge(START, "validation")
@@ -94,7 +111,7 @@ def generate_graph():
         "check_stock_availability",
         route_after_stock_check,
         {
-            "continue_ranking": "reranking",
+            "continue_ranking": RANKING_NODE,
             "no_stock": "handle_no_stock_response"
         }
     )
@@ -127,7 +144,7 @@ def generate_graph():
     graph_builder.add_node("request_new_products", request_new_products)
 
     # Conexiones actualizadas
-    graph_builder.add_edge("reranking", "human_in_the_loop")
+    graph_builder.add_edge(RANKING_NODE, "human_in_the_loop")
 
     # Aquí usamos interrupt_before para detener la ejecución y esperar input del usuario
     # El grafo se detendrá ANTES de process_selection para que el usuario responda
@@ -162,6 +179,11 @@ def generate_graph():
     # Después de agendar, terminar
     graph_builder.add_edge("schedule_delivery", END)
 
+    # Los tokens se filtran por nombre de nodo: un nombre que no existe en el grafo no transmitiría nada
+    sin_nodo = STREAMED_NODES - set(graph_builder.nodes)
+    if sin_nodo:
+        raise ValueError(f"STREAMED_NODES contiene nodos que no están en el grafo: {sorted(sin_nodo)}")
+
     # Compilar el grafo
     graph = graph_builder.compile(
         checkpointer=memory,
@@ -0,0 +1,121 @@
+import hashlib
+import os
+from typing import Dict, List, Optional
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+
+from caches.ttl_lru_cache import TTLLRUCache
+
+# Turnos humanos que se envían completos a extraction_chain y validation_chain (con las respuestas intermedias)
+HISTORY_KEEP_HUMAN_TURNS = int(os.getenv("HISTORY_KEEP_HUMAN_TURNS", "4"))
+# Mensajes del agente más largos que esto (rankings, resúmenes de orden) se reemplazan por su comienzo
+HISTORY_MAX_AI_CHARS = int(os.getenv("HISTORY_MAX_AI_CHARS", "600"))
+HISTORY_AI_STUB_CHARS = int(os.getenv("HISTORY_AI_STUB_CHARS", "200"))
+# Largo máximo de los turnos humanos fuera de la ventana (los que van al resumen)
+HISTORY_MAX_HUMAN_CHARS = int(os.getenv("HISTORY_MAX_HUMAN_CHARS", "2000"))
+# Tope (más holgado) de cada turno humano dentro de la ventana: acota lo que el usuario pegue en un mensaje
+HISTORY_MAX_WINDOW_HUMAN_CHARS = int(os.getenv("HISTORY_MAX_WINDOW_HUMAN_CHARS", "8000"))
+# Resumen acumulativo (LLM) de los turnos que quedan fuera de la ventana; false = se descartan
+HISTORY_SUMMARY = os.getenv("HISTORY_SUMMARY", "false").lower() == "true"
+HISTORY_SUMMARY_MAX_CHARS = int(os.getenv("HISTORY_SUMMARY_MAX_CHARS", "800"))
+
+# Resúmenes por hash del prefijo de conversación resumido (permite extenderlos turno a turno)
+_resumenes_cache = TTLLRUCache(max_entries=512, ttl_seconds=6 * 3600)
+
+
+def window_messages(messages: List[BaseMessage]) -> List[BaseMessage]:
+    """
+    Aplica la política de historial antes de extraction_chain y validation_chain: últimos K turnos humanos
+    (hasta HISTORY_MAX_WINDOW_HUMAN_CHARS cada uno), mensajes largos del agente abreviados y, opcionalmente,
+    un resumen de los turnos anteriores. El tamaño del resultado tiene un máximo fijo.
+    """
+    humanos = [i for i, m in enumerate(messages) if isinstance(m, HumanMessage)]
+    if HISTORY_KEEP_HUMAN_TURNS <= 0:
+        # Sin turnos en la ventana (humanos[-0] sería el primero): todo queda fuera
+        inicio = len(messages)
+    elif len(humanos) > HISTORY_KEEP_HUMAN_TURNS:
+        inicio = humanos[-HISTORY_KEEP_HUMAN_TURNS]
+    else:
+        inicio = 0
+
+    ventana = [_abreviar(m) for m in messages[inicio:]]
+
+    if inicio and HISTORY_SUMMARY:
+        resumen = _resumen_rodante(messages[:inicio])
+        if resumen:
+            ventana.insert(0, SystemMessage(content=f"Resumen de la conversación anterior:\n{resumen}"))
+
+    return ventana
+
+
+def _abreviar(mensaje: BaseMessage, recortar_humanos: bool = False) -> BaseMessage:
+    """
+    Recorta mensajes largos: las tablas del agente quedan como su primera parte y los mensajes del usuario se
+    limitan a HISTORY_MAX_WINDOW_HUMAN_CHARS, o a HISTORY_MAX_HUMAN_CHARS con recortar_humanos (fuera de la ventana).
+    """
+    contenido = mensaje.content if isinstance(mensaje.content, str) else str(mensaje.content)
+
+    if isinstance(mensaje, AIMessage) and len(contenido) > HISTORY_MAX_AI_CHARS:
+        omitidos = len(contenido) - HISTORY_AI_STUB_CHARS
+        return AIMessage(content=f"{contenido[:HISTORY_AI_STUB_CHARS]}\n[… {omitidos} caracteres omitidos]")
+
+    if isinstance(mensaje, HumanMessage):
+        limite = HISTORY_MAX_HUMAN_CHARS if recortar_humanos else HISTORY_MAX_WINDOW_HUMAN_CHARS
+        if len(contenido) > limite:
+            return HumanMessage(content=contenido[:limite])
+
+    return mensaje
+
+
+def _hashes_prefijos(messages: List[BaseMessage]) -> List[str]:
+    """Hash encadenado de cada prefijo de la conversación (tipo + contenido de cada mensaje)."""
+    hashes, acumulado = [], ""
+    for mensaje in messages:
+        acumulado = hashlib.sha1(f"{acumulado}|{mensaje.type}|{mensaje.content}".encode("utf-8")).hexdigest()
+        hashes.append(acumulado)
+    return hashes
+
+
+def _resumen_rodante(antiguos: List[BaseMessage]) -> Optional[str]:
+    """
+    Resumen de los mensajes fuera de la ventana. Parte del resumen cacheado del prefijo más largo
+    y solo envía al LLM los mensajes nuevos; si el LLM falla retorna el último resumen disponible.
+    """
+    from chains.chain_administrator import ChainAdministrator
+
+    hashes = _hashes_prefijos(antiguos)
+    resumen_previo, desde = None, 0
+    for i in range(len(hashes) - 1, -1, -1):
+        cacheado = _resumenes_cache.get(hashes[i])
+        if cacheado is not None:
+            resumen_previo, desde = cacheado, i + 1
+            break
+
+    if desde == len(antiguos):
+        return resumen_previo
+
+    historial = "\n".join(
+        f"{'Usuario' if isinstance(m, HumanMessage) else 'Agente'}: {_abreviar(m, recortar_humanos=True).content}"
+        for m in antiguos[desde:]
+        if isinstance(m, (HumanMessage, AIMessage))
+    )
+
+    try:
+        respuesta = ChainAdministrator().get("history_summary_chain").invoke({
+            "resumen_previo": resumen_previo or "(sin resumen previo)",
+            "historial": historial
+        })
+        resumen = respuesta.content.strip()[:HISTORY_SUMMARY_MAX_CHARS]
+        _resumenes_cache.set(hashes[-1], resumen)
+        return resumen
+
+    except Exception as e:
+        print(f"No se pudo resumir el historial: {e}")
+        return resumen_previo
+
+
+def get_history_stats() -> Dict:
+    """
+    Retorna las estadísticas del cache de resúmenes.
+    """
+    return _resumenes_cache.get_stats()
@@ -0,0 +1,175 @@
+import hashlib
+import json
+import os
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pymongo import ASCENDING, DeleteMany, UpdateOne
+from pymongo.collection import Collection
+
+from db.mongo import parts_collection_name
+from ingestion.parts import FuentesVectores, part_upsert, plan_parts, refresh_parts
+from utils import build_embedding_text
+
+# Filas por operación bulk (bulk_write ordered=False) y textos por batch de encode
+INGEST_BULK_SIZE = int(os.getenv("INGEST_BULK_SIZE", "1000"))
+INGEST_ENCODE_BATCH = int(os.getenv("INGEST_ENCODE_BATCH", "256"))
+
+# Clave natural de una oferta del catálogo
+CLAVE_OFERTA = ("id_repuesto", "proveedor_id")
+
+
+def embedding_hash(texto: str, model_name: str) -> str:
+    """
+    Hash del texto a embeber y del modelo: si no cambia, el vector guardado sigue siendo válido.
+    """
+    return hashlib.sha1(f"{model_name}|{texto}".encode("utf-8")).hexdigest()
+
+
+def row_hash(documento: Dict) -> str:
+    """
+    Hash de todos los campos de la fila (sin hashes ni vector): si no cambia, la fila no se reescribe.
+    """
+    datos = {k: v for k, v in documento.items() if k not in ("embedding_vector", "embedding_hash", "row_hash")}
+    return hashlib.sha1(json.dumps(datos, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def ensure_key_index(collection: Collection):
+    """
+    Índice único por (id_repuesto, proveedor_id): cada upsert resuelve su documento por índice.
+    """
+    collection.create_index(
+        [(campo, ASCENDING) for campo in CLAVE_OFERTA], name="id_repuesto_proveedor_id", unique=True
+    )
+
+
+def load_existing_state(collection: Collection) -> Dict[Tuple, Dict]:
+    """
+    Retorna {(id_repuesto, proveedor_id): {_id, embedding_hash, row_hash}} del catálogo actual (sin vectores).
+    """
+    proyeccion = {campo: 1 for campo in CLAVE_OFERTA}
+    proyeccion.update({"embedding_hash": 1, "row_hash": 1})
+    return {
+        tuple(doc.get(campo) for campo in CLAVE_OFERTA): {
+            "_id": doc["_id"], "embedding_hash": doc.get("embedding_hash"), "row_hash": doc.get("row_hash")
+        }
+        for doc in collection.find({}, proyeccion)
+    }
+
+
+def _en_chunks(items: List, tamano: int) -> Iterable[List]:
+    for i in range(0, len(items), tamano):
+        yield items[i:i + tamano]
+
+
+def sync_catalog(
+    collection: Collection,
+    documentos: List[Dict],
+    model,
+    model_name: str,
+    parts: Optional[Collection] = None,
+    vector_sources: Optional[FuentesVectores] = None,
+    bulk_size: int = INGEST_BULK_SIZE,
+    encode_batch: int = INGEST_ENCODE_BATCH,
+    delete_missing: bool = True
+) -> Dict:
+    """
+    Sincroniza el catálogo sin vaciarlo. Las ofertas van a `collection` (sin vector) y los vectores a `parts`,
+    uno por hash de contenido (embedding_hash) aunque lo compartan varias ofertas:
+    - filas idénticas (mismo row_hash) no se escriben
+    - solo se codifican (en batches) los contenidos que aún no tienen parte ni vector en `vector_sources`
+      (por defecto, las ofertas que traen embedding_vector de antes de la separación en partes)
+    - upserts por (id_repuesto, proveedor_id) en bulk_write de `bulk_size` operaciones con ordered=False
+    - las ofertas que ya no están en el catálogo se eliminan (delete_missing); al final solo se recuentan las
+      partes de los contenidos tocados y se eliminan las que quedaron sin ofertas
+    Retorna contadores y tiempos por etapa.
+    """
+    parts = parts if parts is not None else collection.database[parts_collection_name(collection.name)]
+    vector_sources = vector_sources if vector_sources is not None else ((collection, "embedding_hash"),)
+    stats = {
+        "rows": len(documentos), "unchanged": 0, "updated": 0, "encoded": 0, "reused": 0, "upserted": 0, "deleted": 0
+    }
+
+    inicio = time.perf_counter()
+    existentes = load_existing_state(collection)
+    stats["load_state_s"] = time.perf_counter() - inicio
+
+    vistos = set()
+    pendientes: List[Dict] = []
+    # embedding_hash cuyas partes hay que recontar al final (contenido nuevo y el que dejó la oferta)
+    tocados = set()
+
+    for documento in documentos:
+        clave = tuple(documento[campo] for campo in CLAVE_OFERTA)
+        vistos.add(clave)
+        previo = existentes.get(clave)
+
+        documento["row_hash"] = row_hash(documento)
+        documento["embedding_hash"] = embedding_hash(build_embedding_text(documento), model_name)
+
+        if previo and previo["row_hash"] == documento["row_hash"] and previo["embedding_hash"] == documento["embedding_hash"]:
+            stats["unchanged"] += 1
+            continue
+        pendientes.append(documento)
+        tocados.add(documento["embedding_hash"])
+        if previo and previo["embedding_hash"]:
+            tocados.add(previo["embedding_hash"])
+
+    # Partes: todos los contenidos del catálogo (también los de filas sin cambios, que pueden no tener parte aún)
+    inicio = time.perf_counter()
+    operaciones_partes: List[UpdateOne] = []
+    a_codificar: List[Dict] = []
+    for chunk in _en_chunks(documentos, bulk_size):
+        reutilizadas, faltantes, sin_parte = plan_parts(parts, chunk, vector_sources)
+        operaciones_partes.extend(reutilizadas)
+        a_codificar.extend(faltantes)
+        # Partes nuevas (también de filas sin cambios): aún no tienen códigos ni tipos de proveedor
+        tocados |= sin_parte
+    # Un mismo contenido puede aparecer en varios chunks
+    a_codificar = list({parte["_id"]: parte for parte in a_codificar}.values())
+    stats["reused"] = len(operaciones_partes)
+
+    # Embeddings solo de los contenidos nuevos, en batches
+    for batch in _en_chunks(a_codificar, encode_batch):
+        vectores = model.encode(
+            [build_embedding_text(parte) for parte in batch], batch_size=min(encode_batch, 64), convert_to_numpy=True
+        )
+        for parte, vector in zip(batch, vectores):
+            parte["embedding_vector"] = vector.tolist()
+            operaciones_partes.append(part_upsert(parte))
+    stats["encoded"] = len(a_codificar)
+    stats["encode_s"] = time.perf_counter() - inicio
+
+    # Partes antes que ofertas: una oferta nueva nunca queda sin vector que la encuentre
+    inicio = time.perf_counter()
+    for chunk in _en_chunks(operaciones_partes, bulk_size):
+        parts.bulk_write(chunk, ordered=False)
+
+    # Upserts de ofertas por clave (sin vector: vive en su parte)
+    for chunk in _en_chunks(pendientes, bulk_size):
+        operaciones = [
+            UpdateOne(
+                {campo: doc[campo] for campo in CLAVE_OFERTA},
+                {"$set": doc, "$unset": {"embedding_vector": ""}},
+                upsert=True
+            )
+            for doc in chunk
+        ]
+        resultado = collection.bulk_write(operaciones, ordered=False)
+        stats["upserted"] += resultado.upserted_count
+        stats["updated"] += resultado.modified_count
+    stats["write_s"] = time.perf_counter() - inicio
+
+    if delete_missing:
+        obsoletos = []
+        for clave, estado in existentes.items():
+            if clave not in vistos:
+                obsoletos.append(estado["_id"])
+                if estado["embedding_hash"]:
+                    tocados.add(estado["embedding_hash"])
+        for chunk in _en_chunks(obsoletos, bulk_size):
+            resultado = collection.bulk_write([DeleteMany({"_id": {"$in": chunk}})], ordered=False)
+            stats["deleted"] += resultado.deleted_count
+
+    stats.update(refresh_parts(parts, collection, bulk_size, tocados))
+    return stats
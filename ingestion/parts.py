@@ -0,0 +1,151 @@
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from pymongo import DeleteMany, UpdateOne
+from pymongo.collection import Collection
+
+# Campos de contenido de una parte (los que definen el texto a embeber); el resto son datos de la oferta
+CAMPOS_PARTE = ("repuesto_descripcion", "marca", "modelo", "categoria")
+
+# Fuentes de vectores ya calculados: (collection, campo con el hash de contenido)
+FuentesVectores = Sequence[Tuple[Collection, str]]
+
+
+def part_document(documento: Dict) -> Dict:
+    """
+    Parte de una oferta: su hash de contenido (embedding_hash) como _id y los campos que se embeben.
+    """
+    parte = {campo: documento[campo] for campo in CAMPOS_PARTE}
+    parte["_id"] = documento["embedding_hash"]
+    return parte
+
+
+def part_upsert(parte: Dict) -> UpdateOne:
+    """Upsert de una parte por su hash de contenido."""
+    return UpdateOne({"_id": parte["_id"]}, {"$set": {k: v for k, v in parte.items() if k != "_id"}}, upsert=True)
+
+
+def plan_parts(
+    parts: Collection,
+    documentos: Iterable[Dict],
+    fuentes: FuentesVectores = (),
+    planificadas: Optional[Set[str]] = None
+) -> Tuple[List[UpdateOne], List[Dict], Set[str]]:
+    """
+    Detecta los hashes de contenido de `documentos` (con embedding_hash ya calculado) que aún no tienen parte.
+    Retorna (upserts de partes cuyo vector se reutiliza de `fuentes`, partes que hay que codificar, hashes sin
+    parte): una sola entrada por hash aunque varias ofertas compartan el contenido. Los hashes de `planificadas`
+    (partes ya planificadas en esta corrida que quizá aún no se escribieron) se omiten.
+    """
+    nuevas: Dict[str, Dict] = {}
+    for documento in documentos:
+        if planificadas is None or documento["embedding_hash"] not in planificadas:
+            nuevas.setdefault(documento["embedding_hash"], documento)
+
+    existentes = {doc["_id"] for doc in parts.find({"_id": {"$in": list(nuevas)}}, {"_id": 1})}
+    faltantes = {h: part_document(doc) for h, doc in nuevas.items() if h not in existentes}
+    sin_parte = set(faltantes)
+
+    operaciones = []
+    for coleccion, campo in fuentes:
+        if not faltantes:
+            break
+        # Vectores del mismo contenido ya calculados (versión activa o catálogo anterior a la separación en partes)
+        for doc in coleccion.find(
+            {campo: {"$in": list(faltantes)}, "embedding_vector": {"$exists": True}}, {campo: 1, "embedding_vector": 1}
+        ):
+            parte = faltantes.pop(doc[campo], None)
+            if parte is not None:
+                parte["embedding_vector"] = doc["embedding_vector"]
+                operaciones.append(part_upsert(parte))
+
+    return operaciones, list(faltantes.values()), sin_parte
+
+
+def refresh_parts(
+    parts: Collection,
+    offers: Collection,
+    bulk_size: int,
+    hashes: Optional[Iterable[str]] = None
+) -> Dict:
+    """
+    Recalcula en las partes de `hashes` (los embedding_hash que la corrida tocó: ofertas nuevas, modificadas o
+    eliminadas, con su hash anterior, y partes recién creadas) los códigos y tipos de proveedor de sus ofertas
+    (proveedor_tipos es el pre-filtro del índice vectorial) y elimina las que quedaron sin ofertas; el resto
+    del catálogo no se lee ni se escribe. Con hashes=None recorre todas las partes (collection recién cargada).
+    También quita embedding_vector de las ofertas que lo traían de antes de la separación en partes.
+    """
+    stats = {"parts": 0, "orphans": 0, "offer_vectors_removed": 0}
+
+    if hashes is None:
+        _recontar(parts, offers, bulk_size, {}, stats)
+        huerfanas = _huerfanas(parts, offers)
+    else:
+        huerfanas = []
+        pendientes = sorted(set(hashes))
+        for i in range(0, len(pendientes), bulk_size):
+            chunk = pendientes[i:i + bulk_size]
+            contados = _recontar(parts, offers, bulk_size, {"embedding_hash": {"$in": chunk}}, stats)
+            # Hashes tocados que ya no tienen ninguna oferta (eliminadas o con contenido cambiado)
+            huerfanas.extend(h for h in chunk if h not in contados)
+
+    for i in range(0, len(huerfanas), bulk_size):
+        resultado = parts.bulk_write([DeleteMany({"_id": {"$in": huerfanas[i:i + bulk_size]}})], ordered=False)
+        stats["orphans"] += resultado.deleted_count
+
+    stats["offer_vectors_removed"] = offers.update_many(
+        {"embedding_vector": {"$exists": True}}, {"$unset": {"embedding_vector": ""}}
+    ).modified_count
+    return stats
+
+
+def _recontar(parts: Collection, offers: Collection, bulk_size: int, filtro: Dict, stats: Dict) -> Set[str]:
+    """Agrupa las ofertas de `filtro` por embedding_hash y actualiza sus partes; retorna los hashes con ofertas."""
+    agrupadas = offers.aggregate(
+        [
+            {"$match": filtro},
+            {
+                "$group": {
+                    "_id": "$embedding_hash",
+                    "id_repuestos": {"$addToSet": "$id_repuesto"},
+                    "proveedor_tipos": {"$addToSet": "$proveedor_tipo"}
+                }
+            }
+        ],
+        allowDiskUse=True
+    )
+
+    contados = set()
+    operaciones = []
+    for grupo in agrupadas:
+        contados.add(grupo["_id"])
+        operaciones.append(UpdateOne(
+            {"_id": grupo["_id"]},
+            {"$set": {"id_repuestos": sorted(grupo["id_repuestos"]), "proveedor_tipos": sorted(grupo["proveedor_tipos"])}}
+        ))
+        stats["parts"] += 1
+        if len(operaciones) >= bulk_size:
+            parts.bulk_write(operaciones, ordered=False)
+            operaciones = []
+    if operaciones:
+        parts.bulk_write(operaciones, ordered=False)
+    return contados
+
+
+def _huerfanas(parts: Collection, offers: Collection) -> List[str]:
+    """Partes sin ofertas: el $lookup usa el índice (embedding_hash, proveedor_tipo) de las ofertas."""
+    return [
+        doc["_id"] for doc in parts.aggregate([
+            {"$project": {"_id": 1}},
+            {
+                "$lookup": {
+                    "from": offers.name,
+                    "localField": "_id",
+                    "foreignField": "embedding_hash",
+                    "pipeline": [{"$limit": 1}, {"$project": {"_id": 1}}],
+                    "as": "_ofertas"
+                }
+            },
+            {"$match": {"_ofertas": {"$size": 0}}},
+            {"$project": {"_id": 1}}
+        ])
+    ]
@@ -0,0 +1,290 @@
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Set, Tuple
+
+import pandas as pd
+from pymongo import DeleteMany, UpdateOne
+from pymongo.collection import Collection
+
+from db.mongo import parts_collection_name
+from ingestion.incremental import CLAVE_OFERTA, INGEST_BULK_SIZE, embedding_hash, row_hash
+from ingestion.parts import FuentesVectores, part_upsert, plan_parts, refresh_parts
+from utils import build_embedding_text, csv_row_to_document
+
+# Filas por chunk leído del CSV (la memoria del pipeline queda acotada por este valor)
+INGEST_CHUNK_ROWS = int(os.getenv("INGEST_CHUNK_ROWS", "5000"))
+# Procesos de encoding (0 = núcleos disponibles) e hilos escritores a MongoDB
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "0")) or os.cpu_count() or 1
+INGEST_WRITERS = int(os.getenv("INGEST_WRITERS", "4"))
+# Chunks codificados esperando escritura (más allá de esto la lectura espera a los escritores)
+INGEST_QUEUE_CHUNKS = int(os.getenv("INGEST_QUEUE_CHUNKS", "4"))
+
+_FIN = object()
+
+# Modelo de cada proceso de encoding (se carga una vez por proceso en el initializer)
+_modelo_worker = None
+
+
+def _iniciar_worker(model_name: str):
+    global _modelo_worker
+    # Un hilo de torch por proceso: el paralelismo lo dan los procesos
+    try:
+        import torch
+        torch.set_num_threads(1)
+    except ImportError:
+        pass
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+    from embeddings.model_manager import EmbeddingModelManager
+    _modelo_worker = EmbeddingModelManager().get_model(model_name)
+
+
+def _codificar(textos: List[str]) -> Tuple[list, float]:
+    """Codifica un chunk en el proceso worker; retorna (vectores float32, segundos de CPU del encode)."""
+    inicio = time.perf_counter()
+    vectores = _modelo_worker.encode(textos, batch_size=64, convert_to_numpy=True).astype("float32")
+    return vectores, time.perf_counter() - inicio
+
+
+class _Etapas:
+    """
+    Filas y tiempo ocupado por etapa (lectura, encoding, escritura), thread-safe.
+    rows_per_s de cada etapa es su capacidad: filas por segundo ocupado por la cantidad de procesos/hilos de la etapa.
+    """
+
+    def __init__(self, paralelismo: Dict[str, int]):
+        self._lock = threading.Lock()
+        self.paralelismo = paralelismo
+        self.filas = {"read": 0, "encode": 0, "write": 0}
+        self.segundos = {"read": 0.0, "encode": 0.0, "write": 0.0}
+
+    def sumar(self, etapa: str, filas: int, segundos: float):
+        with self._lock:
+            self.filas[etapa] += filas
+            self.segundos[etapa] += segundos
+
+    def resumen(self) -> Dict:
+        with self._lock:
+            return {
+                etapa: {
+                    "rows": self.filas[etapa],
+                    "busy_s": self.segundos[etapa],
+                    "rows_per_s": (
+                        self.filas[etapa] * self.paralelismo[etapa] / self.segundos[etapa] if self.segundos[etapa] else 0.0
+                    )
+                }
+                for etapa in self.filas
+            }
+
+
+def _planificar_chunk(
+    collection: Collection,
+    parts: Collection,
+    documentos: List[Dict],
+    model_name: str,
+    fuentes: FuentesVectores,
+    planificadas: Set[str]
+):
+    """
+    Compara el chunk con lo guardado (una consulta de ofertas y una de partes por chunk) y retorna
+    (operaciones de ofertas, upserts de partes con vector reutilizado, partes a codificar, ofertas nuevas o
+    modificadas, embedding_hash a recontar en refresh_parts). Las ofertas sin cambios no generan escrituras;
+    se codifica una vez cada contenido nuevo: las partes de `planificadas` (de chunks anteriores, quizá aún en
+    encoding o en la cola de escritura) no se vuelven a planificar y las de este chunk se agregan al conjunto.
+    """
+    proyeccion = {campo: 1 for campo in CLAVE_OFERTA}
+    proyeccion.update({"embedding_hash": 1, "row_hash": 1})
+    existentes = {
+        tuple(doc.get(campo) for campo in CLAVE_OFERTA): doc
+        for doc in collection.find({"id_repuesto": {"$in": list({d["id_repuesto"] for d in documentos})}}, proyeccion)
+    }
+
+    operaciones, cambiadas, tocados = [], 0, set()
+    for documento in documentos:
+        clave = tuple(documento[campo] for campo in CLAVE_OFERTA)
+        previo = existentes.get(clave)
+        documento["row_hash"] = row_hash(documento)
+        documento["embedding_hash"] = embedding_hash(build_embedding_text(documento), model_name)
+
+        if previo and previo.get("embedding_hash") == documento["embedding_hash"] and previo.get("row_hash") == documento["row_hash"]:
+            continue
+
+        # Sin vector: vive en su parte
+        operaciones.append(UpdateOne(
+            {campo: documento[campo] for campo in CLAVE_OFERTA},
+            {"$set": documento, "$unset": {"embedding_vector": ""}},
+            upsert=True
+        ))
+        cambiadas += 1
+        tocados.add(documento["embedding_hash"])
+        if previo and previo.get("embedding_hash"):
+            tocados.add(previo["embedding_hash"])
+
+    reutilizadas, a_codificar, sin_parte = plan_parts(parts, documentos, fuentes, planificadas)
+    planificadas |= sin_parte
+    return operaciones, reutilizadas, a_codificar, cambiadas, tocados | sin_parte
+
+
+def _escritor(cola: queue.Queue, etapas: _Etapas, errores: List, bulk_size: int):
+    """
+    Hilo escritor: consume lotes (collection, operaciones) de la cola y los envía con bulk_write(ordered=False).
+    """
+    while True:
+        item = cola.get()
+        if item is _FIN:
+            return
+        collection, operaciones = item
+        inicio = time.perf_counter()
+        try:
+            for i in range(0, len(operaciones), bulk_size):
+                collection.bulk_write(operaciones[i:i + bulk_size], ordered=False)
+        except Exception as e:
+            errores.append(e)
+        etapas.sumar("write", len(operaciones), time.perf_counter() - inicio)
+
+
+def run_streaming_ingestion(
+    collection: Collection,
+    csv_path: str,
+    model_name: str,
+    parts: Optional[Collection] = None,
+    vector_sources: Optional[FuentesVectores] = None,
+    chunk_rows: int = INGEST_CHUNK_ROWS,
+    workers: int = INGEST_WORKERS,
+    writers: int = INGEST_WRITERS,
+    queue_chunks: int = INGEST_QUEUE_CHUNKS,
+    bulk_size: int = INGEST_BULK_SIZE,
+    delete_missing: bool = True,
+    progress_every: Optional[int] = 10
+) -> Dict:
+    """
+    Carga incremental en streaming para feeds grandes: lee el CSV por chunks, codifica los contenidos nuevos
+    (una parte por embedding_hash, ver sync_catalog) en un pool de `workers` procesos y escribe ofertas y partes
+    con `writers` hilos desde una cola acotada. Como máximo hay 2 x workers chunks codificándose y `queue_chunks`
+    esperando escritura: la memoria depende del tamaño de chunk y no del tamaño del feed, salvo el conjunto de claves
+    leídas (id_repuesto, proveedor_id) con el que se eliminan al final las ofertas ausentes. Las ofertas sin cambios no
+    se escriben. Retorna filas y filas/s por etapa.
+    """
+    parts = parts if parts is not None else collection.database[parts_collection_name(collection.name)]
+    vector_sources = vector_sources if vector_sources is not None else ((collection, "embedding_hash"),)
+    etapas = _Etapas({"read": 1, "encode": workers, "write": writers})
+    errores: List[Exception] = []
+    cola: queue.Queue = queue.Queue(maxsize=queue_chunks)
+    hilos = [
+        threading.Thread(target=_escritor, args=(cola, etapas, errores, bulk_size), daemon=True)
+        for _ in range(writers)
+    ]
+    for hilo in hilos:
+        hilo.start()
+
+    inicio_total = time.perf_counter()
+    en_vuelo: deque = deque()
+    chunks = 0
+    cambiadas = 0
+    reutilizadas = 0
+    tocados = set()
+    # Hashes con parte ya planificada en esta corrida (reutilizada o enviada a codificar)
+    planificadas = set()
+    # Claves leídas del feed: las guardadas que no aparecen se eliminan al final (sin marcar las que siguen)
+    vistos = set()
+
+    def entregar(futuro, a_codificar):
+        vectores, segundos = futuro.result()
+        for parte, vector in zip(a_codificar, vectores):
+            parte["embedding_vector"] = vector.tolist()
+        etapas.sumar("encode", len(a_codificar), segundos)
+        # Bloquea si los escritores van atrasados (backpressure hacia la lectura)
+        cola.put((parts, [part_upsert(parte) for parte in a_codificar]))
+
+    # spawn: los workers no heredan hilos ni el cliente de MongoDB del proceso principal
+    contexto = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=contexto, initializer=_iniciar_worker, initargs=(model_name,)) as pool:
+        lector = pd.read_csv(csv_path, chunksize=chunk_rows, on_bad_lines='warn', engine='python')
+        while True:
+            inicio = time.perf_counter()
+            try:
+                chunk = next(lector)
+            except StopIteration:
+                break
+            documentos = [csv_row_to_document(fila) for fila in chunk.to_dict("records")]
+            operaciones, partes, a_codificar, cambiadas_chunk, tocados_chunk = _planificar_chunk(
+                collection, parts, documentos, model_name, vector_sources, planificadas
+            )
+            vistos.update(tuple(documento[campo] for campo in CLAVE_OFERTA) for documento in documentos)
+            cambiadas += cambiadas_chunk
+            tocados |= tocados_chunk
+            reutilizadas += len(partes)
+            etapas.sumar("read", len(documentos), time.perf_counter() - inicio)
+
+            if operaciones:
+                cola.put((collection, operaciones))
+            if partes:
+                cola.put((parts, partes))
+            if a_codificar:
+                futuro = pool.submit(_codificar, [build_embedding_text(parte) for parte in a_codificar])
+                en_vuelo.append((futuro, a_codificar))
+
+            # Ventana acotada de chunks en encoding; se entregan en orden de lectura
+            while len(en_vuelo) >= 2 * workers or (en_vuelo and en_vuelo[0][0].done()):
+                entregar(*en_vuelo.popleft())
+
+            chunks += 1
+            if progress_every and chunks % progress_every == 0:
+                _imprimir_progreso(etapas, time.perf_counter() - inicio_total)
+
+        while en_vuelo:
+            entregar(*en_vuelo.popleft())
+
+    for _ in hilos:
+        cola.put(_FIN)
+    for hilo in hilos:
+        hilo.join()
+
+    if errores:
+        raise RuntimeError(f"Fallaron {len(errores)} lotes de escritura; el catálogo anterior no se depuró") from errores[0]
+
+    eliminados = 0
+    if delete_missing:
+        # Ofertas que no aparecieron en el feed: diferencia entre las claves guardadas y las leídas
+        proyeccion = {campo: 1 for campo in CLAVE_OFERTA}
+        proyeccion["embedding_hash"] = 1
+        obsoletos = []
+        for doc in collection.find({}, proyeccion):
+            if tuple(doc.get(campo) for campo in CLAVE_OFERTA) not in vistos:
+                obsoletos.append(doc["_id"])
+                # Sus partes se recuentan (pueden quedar huérfanas)
+                if doc.get("embedding_hash"):
+                    tocados.add(doc["embedding_hash"])
+        for i in range(0, len(obsoletos), bulk_size):
+            resultado = collection.bulk_write([DeleteMany({"_id": {"$in": obsoletos[i:i + bulk_size]}})], ordered=False)
+            eliminados += resultado.deleted_count
+    partes_stats = refresh_parts(parts, collection, bulk_size, tocados)
+
+    total_s = time.perf_counter() - inicio_total
+    resumen = etapas.resumen()
+    return {
+        "offers": len(vistos),
+        "chunks": chunks,
+        "rows": resumen["read"]["rows"],
+        "encoded": resumen["encode"]["rows"],
+        "reused": reutilizadas,
+        "changed": cambiadas,
+        "deleted": eliminados,
+        **partes_stats,
+        "total_s": total_s,
+        "rows_per_s": resumen["read"]["rows"] / total_s if total_s else 0.0,
+        "stages": resumen
+    }
+
+
+def _imprimir_progreso(etapas: _Etapas, transcurrido: float):
+    resumen = etapas.resumen()
+    print(
+        f"   ⏳ {transcurrido:.0f}s | leídas {resumen['read']['rows']} | codificadas {resumen['encode']['rows']} "
+        f"| escritas {resumen['write']['rows']}"
+    )
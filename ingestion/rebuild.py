@@ -0,0 +1,188 @@
+import os
+import re
+import time
+from typing import Dict, List
+
+import pandas as pd
+
+from db.mongo import (
+    CATALOG_COLLECTION,
+    ensure_offer_indexes,
+    get_catalog_pointer,
+    parts_collection_name,
+    switch_catalog_collection,
+)
+from ingestion.incremental import ensure_key_index, sync_catalog
+from ingestion.pipeline import INGEST_CHUNK_ROWS, INGEST_WORKERS, run_streaming_ingestion
+from search.atlas_backend import ensure_vector_index, wait_for_vector_index
+from utils import csv_row_to_document
+
+# Segundos máximos de espera a que el índice vectorial de la collection nueva quede consultable
+REBUILD_INDEX_TIMEOUT_S = float(os.getenv("REBUILD_INDEX_TIMEOUT_S", "600"))
+# La collection nueva debe tener al menos esta fracción de los documentos de la activa (protege de feeds truncados)
+REBUILD_MIN_RATIO = float(os.getenv("REBUILD_MIN_RATIO", "0.5"))
+# Versiones anteriores que se conservan además de la activa (la más reciente es la de rollback)
+REBUILD_KEEP_VERSIONS = int(os.getenv("REBUILD_KEEP_VERSIONS", "1"))
+
+_PATRON_VERSION = re.compile(rf"^{CATALOG_COLLECTION}_v(\d+)$")
+
+
+def staging_collection_name(version: int) -> str:
+    """Nombre de la collection versionada del catálogo."""
+    return f"{CATALOG_COLLECTION}_v{version}"
+
+
+def _version_de(nombre: str) -> int:
+    """Versión de una collection del catálogo ('repuestos' sin sufijo = 0)."""
+    coincidencia = _PATRON_VERSION.match(nombre)
+    return int(coincidencia.group(1)) if coincidencia else 0
+
+
+def verify_staging(staging, partes, activa, esperados: int, min_ratio: float = REBUILD_MIN_RATIO) -> Dict:
+    """
+    Verifica la collection nueva antes de activarla: tiene `esperados` ofertas, una parte con vector por cada
+    contenido distinto de las ofertas y no menos de min_ratio x las ofertas de la activa. Levanta RuntimeError si algo falla.
+    """
+    total = staging.count_documents({})
+    total_partes = partes.count_documents({})
+    sin_vector = partes.count_documents({"embedding_vector": {"$exists": False}})
+    contenidos = next(
+        iter(staging.aggregate([{"$group": {"_id": "$embedding_hash"}}, {"$count": "n"}], allowDiskUse=True)), {}
+    ).get("n", 0)
+    total_activa = activa.estimated_document_count()
+
+    if total == 0:
+        raise RuntimeError(f"'{staging.name}' quedó vacía")
+    if total != esperados:
+        raise RuntimeError(f"'{staging.name}' tiene {total} documentos; se esperaban {esperados}")
+    if sin_vector:
+        raise RuntimeError(f"'{partes.name}' tiene {sin_vector} partes sin embedding_vector")
+    if total_partes != contenidos:
+        raise RuntimeError(f"'{partes.name}' tiene {total_partes} partes para {contenidos} contenidos distintos de '{staging.name}'")
+    if total_activa and total < min_ratio * total_activa:
+        raise RuntimeError(
+            f"'{staging.name}' tiene {total} documentos frente a {total_activa} de '{activa.name}' "
+            f"(mínimo {min_ratio:.0%}); ¿feed incompleto?"
+        )
+    return {"documents": total, "parts": total_partes, "active_documents": total_activa}
+
+
+def prune_versions(db, activa: str, anterior: str, keep_versions: int = REBUILD_KEEP_VERSIONS) -> List[str]:
+    """
+    Elimina las collections del catálogo (ofertas y sus partes) más viejas que la activa salvo `keep_versions`:
+    la de rollback (`anterior`) y las más recientes hasta completar. Retorna los nombres de ofertas eliminados.
+    """
+    version_activa = _version_de(activa)
+    viejas = sorted(
+        (
+            nombre for nombre in db.list_collection_names()
+            if (nombre == CATALOG_COLLECTION or _PATRON_VERSION.match(nombre))
+            and nombre != activa and _version_de(nombre) < version_activa
+        ),
+        key=_version_de,
+        reverse=True
+    )
+    otras = [nombre for nombre in viejas if nombre != anterior]
+    conservar = {anterior} | set(otras[:max(keep_versions - 1, 0)])
+
+    eliminadas = [nombre for nombre in viejas if nombre not in conservar]
+    for nombre in eliminadas:
+        db.drop_collection(nombre)
+        db.drop_collection(parts_collection_name(nombre))
+    return eliminadas
+
+
+def rebuild_catalog(
+    db,
+    csv_path: str,
+    model_name: str,
+    stream: bool = False,
+    workers: int = INGEST_WORKERS,
+    chunk_rows: int = INGEST_CHUNK_ROWS,
+    check_vector_index: bool = True,
+    index_timeout_s: float = REBUILD_INDEX_TIMEOUT_S,
+    keep_versions: int = REBUILD_KEEP_VERSIONS
+) -> Dict:
+    """
+    Reconstrucción completa sin downtime: carga el CSV en una collection versionada nueva (repuestos_vN),
+    crea sus índices, verifica conteos y que el índice vectorial esté consultable, y recién entonces mueve
+    el puntero de catalog_meta en una sola escritura. Las partes van a su propia collection (repuestos_vN_parts) y
+    reutilizan los vectores de la versión activa para los contenidos que no cambiaron. La collection activa no se
+    toca durante la carga y queda como versión de rollback. Si algo falla antes del cambio, la activa sigue sirviendo y se levanta la excepción.
+    """
+    puntero = get_catalog_pointer(db)
+    activa = puntero["active_collection"]
+    nombre = staging_collection_name(max(puntero["version"], _version_de(activa)) + 1)
+    if nombre in (activa, puntero["previous_collection"]):
+        raise RuntimeError(f"'{nombre}' está en uso por el catálogo; no se puede usar como staging")
+
+    # Restos de un intento anterior que falló antes del cambio de puntero
+    db.drop_collection(nombre)
+    db.drop_collection(parts_collection_name(nombre))
+    staging = db[nombre]
+    partes = db[parts_collection_name(nombre)]
+    ensure_key_index(staging)
+    # Índices antes de la carga: la unión parte-ofertas (embedding_hash) se usa al depurar partes huérfanas
+    ensure_offer_indexes(staging)
+    # Vectores ya calculados: partes de la versión activa y, si es anterior a la separación, sus ofertas
+    fuentes = ((db[parts_collection_name(activa)], "_id"), (db[activa], "embedding_hash"))
+
+    inicio = time.perf_counter()
+    if stream:
+        carga = run_streaming_ingestion(
+            staging, csv_path, model_name, parts=partes, vector_sources=fuentes,
+            chunk_rows=chunk_rows, workers=workers, delete_missing=False
+        )
+        # Sobre una collection vacía cada clave distinta del feed se inserta una vez
+        esperados = carga["offers"]
+    else:
+        from embeddings.model_manager import EmbeddingModelManager
+
+        df = pd.read_csv(csv_path, on_bad_lines='warn', engine='python')
+        documentos = [csv_row_to_document(row) for _, row in df.iterrows()]
+        model = EmbeddingModelManager().get_model(model_name)
+        carga = sync_catalog(
+            staging, documentos, model, model_name, parts=partes, vector_sources=fuentes, delete_missing=False
+        )
+        esperados = carga["upserted"]
+    carga_s = time.perf_counter() - inicio
+
+    # El índice vectorial (sobre las partes) debe estar consultable antes de exponer la versión
+    inicio = time.perf_counter()
+    if check_vector_index:
+        ensure_vector_index(partes)
+        wait_for_vector_index(partes, index_timeout_s)
+    indice_s = time.perf_counter() - inicio
+
+    verificacion = verify_staging(staging, partes, db[activa], esperados)
+
+    version = switch_catalog_collection(db, nombre, activa)
+    eliminadas = prune_versions(db, nombre, activa, keep_versions)
+
+    return {
+        "collection": nombre,
+        "previous_collection": activa,
+        "version": version,
+        "load_s": carga_s,
+        "index_s": indice_s,
+        "dropped": eliminadas,
+        "load": carga,
+        **verificacion
+    }
+
+
+def rollback_catalog(db) -> Dict:
+    """
+    Vuelve a apuntar el catálogo a la versión anterior (la actual pasa a ser la de rollback).
+    La versión del catálogo se incrementa igual, para que los caches no mezclen respuestas de ambas.
+    """
+    puntero = get_catalog_pointer(db)
+    anterior = puntero["previous_collection"]
+    existentes = db.list_collection_names()
+    if not anterior or anterior not in existentes:
+        raise RuntimeError("No hay una versión anterior del catálogo para volver")
+    if parts_collection_name(anterior) not in existentes:
+        raise RuntimeError(f"'{anterior}' no tiene collection de partes (es anterior a la separación en partes)")
+
+    version = switch_catalog_collection(db, anterior, puntero["active_collection"])
+    return {"collection": anterior, "previous_collection": puntero["active_collection"], "version": version}
@@ -1,121 +1,195 @@
 """
 Script para cargar datos del CSV a MongoDB con embeddings vectoriales.
-Genera embeddings usando sentence-transformers y los almacena en MongoDB Atlas.
+Genera embeddings usando sentence-transformers y los almacena en MongoDB Atlas: las ofertas en 'repuestos'
+y un vector por contenido único (descripción, marca, modelo, categoría) en 'repuestos_parts'.
+La carga es incremental: solo se re-codifican y escriben las filas nuevas o modificadas.
+Con --rebuild se reconstruye en una collection versionada y se activa al final, sin downtime para las búsquedas.
 """
+import argparse
 import os
 import pandas as pd
 from dotenv import load_dotenv
 from pymongo import MongoClient
-from sentence_transformers import SentenceTransformer
+from db.mongo import bump_catalog_version, ensure_offer_indexes, get_catalog_pointer, parts_collection_name
+from embeddings.model_manager import EmbeddingModelManager
+from ingestion.incremental import ensure_key_index, sync_catalog
+from ingestion.pipeline import INGEST_CHUNK_ROWS, INGEST_WORKERS, run_streaming_ingestion
+from ingestion.rebuild import rebuild_catalog, rollback_catalog
+from search.atlas_backend import ensure_vector_index
+from utils import csv_row_to_document
 
 # Cargar variables de entorno
 load_dotenv()
 
-# Configuración
-MONGO_URI = os.getenv("MONGO_URI")
-CSV_FILE = "repuestos.csv"
-MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
-
-print("="*80)
-print("🔄 CARGA DE DATOS A MONGODB CON EMBEDDINGS")
-print("="*80)
-
-# 1. Conectar a MongoDB
-print("\n📡 Conectando a MongoDB...")
-client = MongoClient(MONGO_URI)
-db = client["repuestos_db"]
-collection = db["repuestos"]
-
-# 2. Limpiar colección existente
-print("🗑️  Limpiando colección existente...")
-result = collection.delete_many({})
-print(f"   ✅ Eliminados {result.deleted_count} documentos")
-
-# 3. Cargar CSV
-print(f"\n📂 Cargando datos desde {CSV_FILE}...")
-df = pd.read_csv(CSV_FILE, on_bad_lines='warn', engine='python')
-print(f"   ✅ Cargadas {len(df)} filas")
-
-# 4. Cargar modelo de embeddings
-print(f"\n🤖 Cargando modelo de embeddings: {MODEL_NAME}...")
-model = SentenceTransformer(MODEL_NAME)
-print("   ✅ Modelo cargado")
-
-# 5. Generar embeddings y preparar documentos
-print("\n🔢 Generando embeddings...")
-documentos = []
-
-for idx, row in df.iterrows():
-    # Crear texto para embedding (descripción + marca + modelo + categoría)
-    texto_embedding = f"{row['repuesto_descripcion']} {row['marca']} {row['modelo']} {row['categoria']}"
-    
-    # Generar embedding
-    embedding = model.encode(texto_embedding).tolist()
-    
-    # Crear documento
-    documento = {
-        "id_repuesto": row["id_repuesto"],
-        "repuesto_descripcion": row["repuesto_descripcion"],
-        "categoria": row["categoria"],
-        "marca": row["marca"],
-        "modelo": row["modelo"],
-        "proveedor_tipo": row["proveedor_tipo"],
-        "proveedor_id": row["proveedor_id"],
-        "proveedor_nombre": row["proveedor_nombre"],
-        "proveedor_rating": int(row["proveedor_rating"]),
-        "costo_unitario": float(row["costo_unitario"]),
-        "moneda": row["moneda"],
-        "stock_disponible": int(row["stock_disponible"]),
-        "lead_time_dias": int(row["lead_time_dias"]),
-        "ubicacion_stock": row["ubicacion_stock"],
-        "cantidad_minima_pedido": int(row["cantidad_minima_pedido"]),
-        "tiempo_vida_estimado_hrs": int(row["tiempo_vida_estimado_hrs"]),
-        "nota": row["nota"],
-        "embedding_vector": embedding
-    }
-    
-    documentos.append(documento)
-    
-    if (idx + 1) % 10 == 0:
-        print(f"   Procesados {idx + 1}/{len(df)} documentos...")
-
-print(f"   ✅ {len(documentos)} documentos preparados con embeddings")
-
-# 6. Insertar en MongoDB
-print("\n💾 Insertando documentos en MongoDB...")
-result = collection.insert_many(documentos)
-print(f"   ✅ Insertados {len(result.inserted_ids)} documentos")
-
-# 7. Verificar algunos documentos
-print("\n🔍 Verificando datos insertados...")
-total_docs = collection.count_documents({})
-print(f"   Total de documentos en la colección: {total_docs}")
-
-# Contar por tipo de proveedor
-internos = collection.count_documents({"proveedor_tipo": "INTERNAL"})
-externos = collection.count_documents({"proveedor_tipo": "EXTERNAL"})
-print(f"   • Productos INTERNOS: {internos}")
-print(f"   • Productos EXTERNOS: {externos}")
-
-# Mostrar algunos productos solo externos
-print("\n📦 Productos que solo existen externamente (nuevos):")
-productos_externos_unicos = [
-    "R-0101", "R-0102", "R-0103", "R-0104", "R-0105",
-    "R-0106", "R-0107", "R-0108", "R-0109", "R-0110"
-]
-
-for codigo in productos_externos_unicos[:5]:  # Mostrar solo los primeros 5
-    doc = collection.find_one({"id_repuesto": codigo})
-    if doc:
-        print(f"   ✅ {codigo}: {doc['repuesto_descripcion'][:60]}... (stock: {doc['stock_disponible']})")
-
-print("\n" + "="*80)
-print("✅ CARGA COMPLETADA EXITOSAMENTE")
-print("="*80)
-print("\n💡 Nota: Asegúrate de tener creado el índice vectorial en MongoDB Atlas:")
-print("   Nombre: vector_index_repuestos")
-print("   Campo: embedding_vector")
-print("   Dimensiones: 384")
-print("   Similitud: cosine")
-print("="*80)
-
+# Bajo __main__: los procesos de encoding (spawn) importan este módulo sin volver a ejecutar la carga
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Carga el catálogo de repuestos a MongoDB con embeddings")
+    parser.add_argument("--csv", default="repuestos.csv", help="CSV del catálogo o feed de proveedores")
+    parser.add_argument(
+        "--stream", action="store_true",
+        help="Pipeline en streaming para feeds grandes (chunks + pool de procesos + escritores concurrentes)"
+    )
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS, help="Procesos de encoding (--stream)")
+    parser.add_argument("--chunk-rows", type=int, default=INGEST_CHUNK_ROWS, help="Filas por chunk (--stream)")
+    parser.add_argument(
+        "--rebuild", action="store_true",
+        help="Reconstrucción completa en una collection versionada; se activa al verificarla (admite --stream)"
+    )
+    parser.add_argument(
+        "--skip-index-check", action="store_true",
+        help="No esperar el índice vectorial antes de activar (--rebuild sobre MongoDB sin Atlas Search)"
+    )
+    parser.add_argument("--rollback", action="store_true", help="Vuelve a la versión anterior del catálogo y termina")
+    args = parser.parse_args()
+
+    # Configuración
+    MONGO_URI = os.getenv("MONGO_URI")
+    CSV_FILE = args.csv
+    MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+    print("="*80)
+    print("🔄 CARGA DE DATOS A MONGODB CON EMBEDDINGS")
+    print("="*80)
+
+    # 1. Conectar a MongoDB
+    print("\n📡 Conectando a MongoDB...")
+    client = MongoClient(MONGO_URI)
+    db = client["repuestos_db"]
+
+    if args.rollback:
+        resultado = rollback_catalog(db)
+        print(f"\n⏪ Catálogo activo: '{resultado['collection']}' (antes '{resultado['previous_collection']}'), "
+              f"versión {resultado['version']}")
+        raise SystemExit(0)
+
+    # Las cargas incrementales escriben sobre la collection activa (la que indica catalog_meta)
+    collection = db[get_catalog_pointer(db)["active_collection"]]
+
+    # 2. Índice único por oferta (los upserts se resuelven por índice) e índices de búsqueda por código y por parte
+    ensure_key_index(collection)
+    ensure_offer_indexes(collection)
+
+    if args.rebuild:
+        # 3-6. La activa sigue sirviendo búsquedas mientras se carga, indexa y verifica la nueva
+        print(f"\n🏗️  Reconstruyendo el catálogo desde {CSV_FILE} en una collection nueva...")
+        resultado = rebuild_catalog(
+            db, CSV_FILE, MODEL_NAME, stream=args.stream, workers=args.workers, chunk_rows=args.chunk_rows,
+            check_vector_index=not args.skip_index_check
+        )
+        print(f"   ✅ '{resultado['collection']}': {resultado['documents']} documentos, {resultado['parts']} partes "
+              f"(activa anterior: {resultado['active_documents']}); carga {resultado['load_s']:.1f}s, "
+              f"índice vectorial {resultado['index_s']:.1f}s")
+        print(f"   🔀 Catálogo activo: '{resultado['collection']}'; rollback disponible a '{resultado['previous_collection']}'")
+        if resultado["dropped"]:
+            print(f"   🗑️  Versiones eliminadas: {', '.join(resultado['dropped'])}")
+
+        collection = db[resultado["collection"]]
+        # El cambio de puntero ya registró la versión nueva
+        hubo_cambios = False
+
+    elif args.stream:
+        # 3-5. Streaming: el CSV nunca se carga entero y el modelo se carga en cada proceso de encoding
+        print(f"\n🚚 Carga en streaming desde {CSV_FILE} ({args.workers} procesos, chunks de {args.chunk_rows} filas)...")
+        sync_stats = run_streaming_ingestion(
+            collection, CSV_FILE, MODEL_NAME, chunk_rows=args.chunk_rows, workers=args.workers
+        )
+
+        print(f"   ✅ {sync_stats['rows']} filas en {sync_stats['total_s']:.1f}s ({sync_stats['rows_per_s']:.0f} filas/s): "
+              f"{sync_stats['changed']} nuevas o modificadas, {sync_stats['deleted']} eliminadas")
+        print(f"   🔢 {sync_stats['encoded']} partes codificadas, {sync_stats['reused']} vectores reutilizados, "
+              f"{sync_stats['orphans']} partes sin ofertas eliminadas")
+        for etapa, datos in sync_stats["stages"].items():
+            print(f"   • {etapa}: {datos['rows']} filas, {datos['rows_per_s']:.0f} filas/s")
+
+        hubo_cambios = (
+            sync_stats["changed"] or sync_stats["deleted"] or sync_stats["encoded"]
+            or sync_stats["reused"] or sync_stats["orphans"]
+        )
+
+    else:
+        # 3. Cargar CSV
+        print(f"\n📂 Cargando datos desde {CSV_FILE}...")
+        df = pd.read_csv(CSV_FILE, on_bad_lines='warn', engine='python')
+        print(f"   ✅ Cargadas {len(df)} filas")
+
+        # 4. Cargar modelo de embeddings
+        print(f"\n🤖 Cargando modelo de embeddings: {MODEL_NAME}...")
+        model_manager = EmbeddingModelManager()
+        model = model_manager.get_model(MODEL_NAME)
+        stats = model_manager.get_stats(MODEL_NAME)
+        print(f"   ✅ Modelo cargado en {stats['load_time_s']:.2f}s (RSS: {stats['rss_mb']:.1f} MB)")
+
+        # 5. Sincronizar: un embedding por contenido nuevo (partes), upserts de ofertas por (id_repuesto, proveedor_id)
+        print("\n🔢 Sincronizando catálogo (embeddings por parte en batch + upserts)...")
+        documentos = [csv_row_to_document(row) for _, row in df.iterrows()]
+        sync_stats = sync_catalog(collection, documentos, model, MODEL_NAME)
+
+        print(f"   ✅ {sync_stats['rows']} filas: {sync_stats['unchanged']} sin cambios, "
+              f"{sync_stats['upserted']} nuevas, {sync_stats['updated']} actualizadas, {sync_stats['deleted']} eliminadas")
+        print(f"   🔢 Codificadas {sync_stats['encoded']} partes en {sync_stats['encode_s']:.2f}s "
+              f"({sync_stats['reused']} vectores reutilizados); escritura en {sync_stats['write_s']:.2f}s")
+
+        # 6. Sin cambios no hace falta invalidar los caches derivados del catálogo (paso 10)
+        hubo_cambios = (
+            sync_stats["upserted"] or sync_stats["updated"] or sync_stats["deleted"]
+            or sync_stats["encoded"] or sync_stats["reused"] or sync_stats["orphans"]
+        )
+
+    # 7. Verificar algunos documentos
+    print("\n🔍 Verificando datos insertados...")
+    partes = db[parts_collection_name(collection.name)]
+    total_docs = collection.count_documents({})
+    total_partes = partes.count_documents({})
+    print(f"   Total de documentos en la colección: {total_docs}")
+    if total_partes:
+        print(f"   Partes con embedding: {total_partes} ({total_docs / total_partes:.2f} ofertas por parte)")
+
+    # Contar por tipo de proveedor
+    internos = collection.count_documents({"proveedor_tipo": "INTERNAL"})
+    externos = collection.count_documents({"proveedor_tipo": "EXTERNAL"})
+    print(f"   • Productos INTERNOS: {internos}")
+    print(f"   • Productos EXTERNOS: {externos}")
+
+    # Mostrar algunos productos solo externos
+    print("\n📦 Productos que solo existen externamente (nuevos):")
+    productos_externos_unicos = [
+        "R-0101", "R-0102", "R-0103", "R-0104", "R-0105",
+        "R-0106", "R-0107", "R-0108", "R-0109", "R-0110"
+    ]
+
+    for codigo in productos_externos_unicos[:5]:  # Mostrar solo los primeros 5
+        doc = collection.find_one({"id_repuesto": codigo})
+        if doc:
+            print(f"   ✅ {codigo}: {doc['repuesto_descripcion'][:60]}... (stock: {doc['stock_disponible']})")
+
+    # 8. Asegurar índices compuestos para búsqueda por código y unión parte-ofertas
+    ensure_offer_indexes(collection)
+    print("\n🗂️  Índices (id_repuesto, proveedor_tipo) y (embedding_hash, proveedor_tipo) asegurados")
+
+    # 9. Asegurar índice vectorial (sobre las partes) con campos de filtro
+    print("\n🧭 Verificando índice vectorial...")
+    try:
+        ensure_vector_index(partes)
+        print("   ✅ Índice vectorial listo (puede tardar unos segundos en quedar activo)")
+    except Exception as e:
+        print(f"   ⚠️  No se pudo crear/actualizar el índice automáticamente: {e}")
+        print("   Créalo manualmente en MongoDB Atlas:")
+        print(f"   Collection: {partes.name}")
+        print("   Nombre: vector_index_repuestos")
+        print("   Campo: embedding_vector")
+        print("   Dimensiones: 384")
+        print("   Similitud: cosine")
+        print("   Campos de filtro: proveedor_tipos")
+
+    # 10. Registrar nueva versión del catálogo (invalida caches de respuestas derivadas del catálogo)
+    if args.rebuild:
+        print(f"\n🏷️  Versión del catálogo: {resultado['version']}")
+    elif hubo_cambios:
+        version = bump_catalog_version(db)
+        print(f"\n🏷️  Versión del catálogo: {version}")
+    else:
+        print("\n🏷️  Catálogo sin cambios: se conserva la versión actual")
+
+    print("\n" + "="*80)
+    print("✅ CARGA COMPLETADA EXITOSAMENTE")
+    print("="*80)
@@ -1,33 +1,47 @@
-import os
-from dotenv import load_dotenv
-from langchain_groq import ChatGroq
-from chains.chain_administrator import ChainAdministrator
-from db.mongo import MongoCollectionManager
-from graph import generate_graph
-from langchain_core.messages import AIMessage, HumanMessage
+import argparse
+import uuid
+from bootstrap import iniciar_warmup, inicializar_componentes, marcar, precargar_modelos, reportar
 
-if __name__ == "__main__":
-    load_dotenv()
+# Los módulos pesados (langgraph, langchain, sentence_transformers) se importan en el warm-up de fondo
+
+
+def ejecutar_turno(graph, entrada, config):
+    """
+    Ejecuta un turno del grafo mostrando el ranking token a token; retorna (resultado, si hubo streaming).
+    """
+    from nodes.human_in_the_loop_selection import ENCABEZADO_RANKING
+    from streaming import invoke_streaming
+
+    encabezado_mostrado = False
 
-    # Verificar que la API key está configurada
-    api_key = os.getenv("GROQ_API_KEY")
-    if not api_key:
-        raise ValueError("GROQ_API_KEY no encontrada en .env")
+    def mostrar_token(texto):
+        nonlocal encabezado_mostrado
+        if not encabezado_mostrado:
+            encabezado_mostrado = True
+            marcar("primera respuesta")
+            print(f"\n🤖 Agente: {ENCABEZADO_RANKING}", end="")
+        print(texto, end="", flush=True)
 
-    # Inicializar el LLM de Groq
-    llm = ChatGroq(
-        model="openai/gpt-oss-120b",
-        temperature=0.1,
-        api_key=api_key
+    result, transmitido = invoke_streaming(graph, entrada, config, mostrar_token)
+    if transmitido:
+        print()
+    return result, transmitido
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Agente de búsqueda de repuestos (CLI)")
+    parser.add_argument(
+        "--warmup-only", action="store_true",
+        help="Descarga los pesos del modelo de embeddings al cache local y termina (p. ej. al construir la imagen)"
     )
-    
-    chain_administrator = ChainAdministrator()
-    chain_administrator.generate(llm)
-    
-    mongo_db = MongoCollectionManager()
-    mongo_db.initialize()
-    
-    graph = generate_graph()
+    args = parser.parse_args()
+
+    if args.warmup_only:
+        precargar_modelos()
+        raise SystemExit(0)
+
+    # LLM, chains, backend de búsqueda, modelo de embeddings y grafo se preparan en paralelo mientras el usuario escribe
+    iniciar_warmup()
     
     print("="*60)
     print("🔧 SISTEMA DE BÚSQUEDA DE REPUESTOS")
@@ -37,9 +51,16 @@ if __name__ == "__main__":
     print("\nPuedes escribir 'salir' en cualquier momento para terminar.\n")
     print("-"*60)
     
-    config = {"configurable": {"thread_id": "1"}}
+    # Thread propio por ejecución (el checkpointer puede ser compartido entre procesos)
+    config = {"configurable": {"thread_id": str(uuid.uuid4())}}
         
+    marcar("prompt")
+    reportar("prompt")
     mensaje_usuario = input("\n👤 Tú: ")
+    marcar("primer mensaje")
+
+    from langchain_core.messages import AIMessage, HumanMessage
+    graph = inicializar_componentes()
 
     # Estado inicial con todos los campos
     estado_inicial = {
@@ -63,7 +84,9 @@ if __name__ == "__main__":
         "recomendaciones_llm": None
     }
     
-    result = graph.invoke(estado_inicial, config)
+    result, transmitido = ejecutar_turno(graph, estado_inicial, config)
+    # Si el primer turno no transmitió tokens, la respuesta se muestra completa al entrar al loop
+    marcar("primera respuesta")
     
     # Loop de conversación
     while True:
@@ -77,8 +100,10 @@ if __name__ == "__main__":
                 ultimo_mensaje_agente = msg.content
                 break
         
-        if ultimo_mensaje_agente:
+        # Si el turno se transmitió token a token ya está en pantalla
+        if ultimo_mensaje_agente and not transmitido:
             print(f"\n🤖 Agente: {ultimo_mensaje_agente}")
+        reportar("primera respuesta", desde="primer mensaje")
         
         # Verificar si hay un interrupt (Human in the Loop o Sin Stock)
         snapshot = graph.get_state(config)
@@ -102,7 +127,7 @@ if __name__ == "__main__":
             })
             
             # Continuar desde donde se pausó
-            result = graph.invoke(None, config)
+            result, transmitido = ejecutar_turno(graph, None, config)
             
             # Verificar si el usuario quiere reiniciar
             reiniciar = result.get("reiniciar_busqueda", False)
@@ -136,7 +161,7 @@ if __name__ == "__main__":
                     })
                     
                     # Continuar el flujo normal (irá a extract_products_info)
-                    result = graph.invoke(None, config)
+                    result, transmitido = ejecutar_turno(graph, None, config)
                     continue
                 else:
                     # El grafo no está en el estado esperado, continuar el loop
@@ -162,7 +187,7 @@ if __name__ == "__main__":
                 })
                 
                 # Continuar desde donde se pausó (None = continuar, no reiniciar)
-                result = graph.invoke(None, config)
+                result, transmitido = ejecutar_turno(graph, None, config)
                 
                 # Verificar si el usuario seleccionó productos válidos
                 repuestos_seleccionados = result.get("repuestos_seleccionados", False)
@@ -215,7 +240,7 @@ if __name__ == "__main__":
                 break
             
             # Para el caso de pedir más info, sí necesitamos pasar el mensaje
-            result = graph.invoke({
+            result, transmitido = ejecutar_turno(graph, {
                 "messages": [HumanMessage(content=nuevo_mensaje)]
             }, config)
             continue
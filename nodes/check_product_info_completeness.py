@@ -1,6 +1,22 @@
+import os
 from langchain_core.messages import AIMessage, BaseMessage
+from caches.ttl_lru_cache import TTLLRUCache
 from chains.chain_administrator import ChainAdministrator
 from schemas.state import AgentState
+from utils import normalize_text
+from verification.rule_classifier import ProductRuleClassifier
+
+# Máximo de verificaciones LLM simultáneas por turno
+VERIFY_CONCURRENCY = int(os.getenv("VERIFY_CONCURRENCY", "8"))
+
+# Cache entre sesiones de veredictos por descripción normalizada (LRU + TTL)
+VERIFY_CACHE_SIZE = int(os.getenv("VERIFY_CACHE_SIZE", "1024"))
+VERIFY_CACHE_TTL_S = float(os.getenv("VERIFY_CACHE_TTL_S", "86400"))
+
+# Pre-clasificador por reglas con el vocabulario del catálogo antes de llamar al LLM
+VERIFY_FAST_PATH = os.getenv("VERIFY_FAST_PATH", "true").lower() == "true"
+
+_verificaciones_cache = TTLLRUCache(max_entries=VERIFY_CACHE_SIZE, ttl_seconds=VERIFY_CACHE_TTL_S)
 
 def check_product_info_completeness(state: AgentState) -> AgentState:
     """
@@ -9,37 +25,144 @@ def check_product_info_completeness(state: AgentState) -> AgentState:
     product_requests = state.get('product_requests', [])
     
     if not product_requests:
-        return {
-            "info_completa": False,
-            "messages": [AIMessage(content="No se identificaron productos para buscar.")]
-        }
+        return _sin_productos()
+    
+    # Solo los productos nuevos o modificados llegan al LLM
+    verificaciones, memo, pendientes = _resolver_desde_cache(state, product_requests)
+    
+    if pendientes:
+        # Verificar los pendientes en paralelo; los errores quedan aislados por producto
+        try:
+            resultados = ChainAdministrator().get('verify_product_chain').batch(
+                [{"product_name": product_requests[i].get("name", "")} for i in pendientes],
+                config={"max_concurrency": VERIFY_CONCURRENCY},
+                return_exceptions=True
+            )
+        except Exception as e:
+            resultados = [e] * len(pendientes)
+        
+        _guardar_en_cache(product_requests, pendientes, resultados, verificaciones, memo)
+    
+    return _procesar_verificaciones(product_requests, verificaciones, memo)
+
+
+async def acheck_product_info_completeness(state: AgentState) -> AgentState:
+    """
+    Versión async de check_product_info_completeness (abatch con el mismo límite de concurrencia).
+    """
+    product_requests = state.get('product_requests', [])
+    
+    if not product_requests:
+        return _sin_productos()
+    
+    verificaciones, memo, pendientes = _resolver_desde_cache(state, product_requests)
+    
+    if pendientes:
+        try:
+            resultados = await ChainAdministrator().get('verify_product_chain').abatch(
+                [{"product_name": product_requests[i].get("name", "")} for i in pendientes],
+                config={"max_concurrency": VERIFY_CONCURRENCY},
+                return_exceptions=True
+            )
+        except Exception as e:
+            resultados = [e] * len(pendientes)
+        
+        _guardar_en_cache(product_requests, pendientes, resultados, verificaciones, memo)
     
+    return _procesar_verificaciones(product_requests, verificaciones, memo)
+
+
+def get_verification_cache_stats() -> dict:
+    """
+    Retorna las estadísticas del cache de verificaciones entre sesiones (hits = llamadas LLM evitadas).
+    """
+    return _verificaciones_cache.get_stats()
+
+
+def _clave_producto(product: dict) -> str:
+    """Identidad de un producto para el cache: su descripción normalizada."""
+    return normalize_text(product.get("name", ""))
+
+
+def _resolver_desde_cache(state: AgentState, product_requests: list):
+    """
+    Resuelve cada producto con el memo de la sesión, el cache global o el pre-clasificador por reglas.
+    Retorna (verificaciones por posición, memo de sesión, posiciones pendientes de verificar con LLM).
+    """
+    memo = dict(state.get('verificaciones_productos') or {})
+    verificaciones = [None] * len(product_requests)
+    pendientes = []
+    
+    for i, product in enumerate(product_requests):
+        clave = _clave_producto(product)
+        verificacion = memo.get(clave)
+        if verificacion is None:
+            verificacion = _verificaciones_cache.get(clave)
+        if verificacion is None and VERIFY_FAST_PATH:
+            verificacion = ProductRuleClassifier().classify(product.get("name", ""))
+        
+        if verificacion is None:
+            pendientes.append(i)
+        else:
+            verificaciones[i] = verificacion
+            memo[clave] = verificacion
+    
+    return verificaciones, memo, pendientes
+
+
+def _guardar_en_cache(product_requests: list, pendientes: list, resultados: list, verificaciones: list, memo: dict):
+    """
+    Ubica los resultados del LLM en su posición y memoiza los exitosos (los errores se reintentan el próximo turno).
+    """
+    for i, resultado in zip(pendientes, resultados):
+        if isinstance(resultado, Exception):
+            verificaciones[i] = resultado
+            continue
+        
+        verificacion = {
+            "completa": resultado.info_completa,
+            "razon": resultado.razon,
+            "faltante": resultado.info_faltante
+        }
+        clave = _clave_producto(product_requests[i])
+        memo[clave] = verificacion
+        _verificaciones_cache.set(clave, verificacion)
+        verificaciones[i] = verificacion
+
+
+def _sin_productos() -> AgentState:
+    """Respuesta cuando la extracción no identificó productos."""
+    return {
+        "info_completa": False,
+        "messages": [AIMessage(content="No se identificaron productos para buscar.")]
+    }
+
+
+def _procesar_verificaciones(product_requests: list, verificaciones: list, memo: dict) -> AgentState:
+    """
+    Aplica el resultado de cada verificación (o su excepción) a su producto y arma el mensaje del nodo.
+    """
     productos_incompletos = []
     productos_completos = []
     
-    # Verificar CADA producto con el LLM
-    for idx, product in enumerate(product_requests, 1):
+    for idx, (product, verificacion) in enumerate(zip(product_requests, verificaciones), 1):
         product_name = product.get("name", "")
         cantidad = product.get("cantidad", 1)
         
         try:
-            # Invocar LLM para verificar este producto
-            verificacion = ChainAdministrator().get('verify_product_chain').invoke({"product_name": product_name})
+            if isinstance(verificacion, Exception):
+                raise verificacion
             
             # Actualizar el product_request con el resultado
-            product["info_needed"] = not verificacion.info_completa
-            product["verificacion"] = {
-                "completa": verificacion.info_completa,
-                "razon": verificacion.razon,
-                "faltante": verificacion.info_faltante
-            }
+            product["info_needed"] = not verificacion["completa"]
+            product["verificacion"] = dict(verificacion)
             
-            if verificacion.info_completa:
+            if verificacion["completa"]:
                 productos_completos.append({
                     "idx": idx,
                     "nombre": product_name,
                     "cantidad": cantidad,
-                    "razon": verificacion.razon
+                    "razon": verificacion["razon"]
                 })
 
             else:
@@ -47,8 +170,8 @@ def check_product_info_completeness(state: AgentState) -> AgentState:
                     "idx": idx,
                     "nombre": product_name,
                     "cantidad": cantidad,
-                    "razon": verificacion.razon,
-                    "faltante": verificacion.info_faltante
+                    "razon": verificacion["razon"],
+                    "faltante": verificacion["faltante"]
                 })
                 
         except Exception as e:
@@ -83,6 +206,7 @@ def check_product_info_completeness(state: AgentState) -> AgentState:
         return {
             "info_completa": False,
             "product_requests": product_requests,  # Actualizado con flags
+            "verificaciones_productos": memo,
             "messages": [AIMessage(content=mensaje)]
         }
     else:        
@@ -94,5 +218,6 @@ def check_product_info_completeness(state: AgentState) -> AgentState:
         return {
             "info_completa": True,
             "product_requests": product_requests,
+            "verificaciones_productos": memo,
             "messages": [AIMessage(content=mensaje)]
         }
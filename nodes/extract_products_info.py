@@ -1,5 +1,6 @@
 from langchain_core.messages import AIMessage, BaseMessage
 from chains.chain_administrator import ChainAdministrator
+from history.message_window import window_messages
 from schemas.state import AgentState
 
 
@@ -13,7 +14,8 @@ def extract_products_info(state: AgentState) -> AgentState:
     # Solo invocamos con el último mensaje o la colección de mensajes
     try:
         # Usamos la cadena de extracción que retorna ProductList
-        product_list_obj = ChainAdministrator().get('extraction_chain').invoke({"messages": messages})
+        # Ventana de historial acotada: el prompt no crece con la conversación
+        product_list_obj = ChainAdministrator().get('extraction_chain').invoke({"messages": window_messages(messages)})
         
         # Convertir a la nueva estructura de seguimiento con cantidades
         new_product_requests = []
@@ -1,54 +1,172 @@
+import os
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.runnables.config import ensure_config, merge_configs
+from langgraph.constants import TAG_NOSTREAM
 from chains.chain_administrator import ChainAdministrator
+from ranking.engine import build_ranking_text
 from schemas.state import AgentState
+from streaming import emit_text
+
+# Modo de ranking: 'llm' (ranking_chain), 'engine' (motor de reglas) o 'hybrid' (orden del motor + comentario LLM)
+RANKING_MODE = os.getenv("RANKING_MODE", "llm").lower()
+
+# Serialización de opciones para ranking_chain: 'compact' (tabular con presupuesto de tokens) o 'verbose' (formato original)
+RANKING_PROMPT_FORMAT = os.getenv("RANKING_PROMPT_FORMAT", "compact").lower()
+RANKING_PROMPT_TOKEN_BUDGET = int(os.getenv("RANKING_PROMPT_TOKEN_BUDGET", "800"))  # por producto
+RANKING_PROMPT_REPORT = os.getenv("RANKING_PROMPT_REPORT", "false").lower() == "true"
+
+AVISO_REEMPLAZO = "\n\n⚠️ La respuesta se interrumpió; se reemplaza por el ranking del motor de reglas:\n\n"
+PREFIJO_COMENTARIO = "\n\n💬 "
+
+
+class _ContadorTokens(BaseCallbackHandler):
+    """Cuenta los tokens que el LLM ya transmitió (stream_mode='messages') durante una llamada."""
+
+    def __init__(self):
+        self.tokens = 0
+
+    def on_llm_new_token(self, token: str, **kwargs):
+        if token:
+            self.tokens += 1
+
+
+def _config_del_nodo(**extra):
+    """Config del nodo en curso (callbacks de streaming del grafo incluidos) con callbacks/tags adicionales."""
+    return merge_configs(ensure_config(), extra)
+
+
+LEYENDA_COMPACTA = (
+    "Formato: por cada código, una línea con descripción | categoría | marca | modelo y debajo una fila por oferta "
+    "(tipo INT=interno, EXT=externo; stock vacío = a pedido al proveedor).\n\n"
+)
 
 def generate_ranking(state: AgentState) -> AgentState:
     """
-    Genera ranking de opciones internas y externas usando LLM con criterios de precio, lead time y rating.
+    Genera ranking de opciones internas y externas con el LLM, el motor de reglas o ambos según RANKING_MODE.
+    """
+    productos = _opciones_por_producto(state)
+
+    if not productos:
+        return {
+            "recomendaciones_llm": "No hay opciones disponibles."
+        }
+
+    if RANKING_MODE == "engine":
+        ranking_texto = build_ranking_text(productos)
+        emit_text(ranking_texto)
+        return {"recomendaciones_llm": ranking_texto}
+
+    if RANKING_MODE == "hybrid":
+        return {"recomendaciones_llm": _ranking_hibrido(productos)}
+
+    return {"recomendaciones_llm": _ranking_llm(productos)}
+
+
+def _opciones_por_producto(state: AgentState) -> list:
+    """
+    Combina opciones internas y externas de cada producto solicitado: [{label, cantidad, opciones}].
     """
-    from utils import format_options_for_llm
-    
     product_requests = state.get("product_requests", [])
     resultados_internos = state.get("resultados_internos", {})
     resultados_externos = state.get("resultados_externos", {})
-    
-    # Preparar información para el LLM
-    opciones_para_llm = []
-    
+
+    productos = []
+
     for idx, product_req in enumerate(product_requests, 1):
         product_name = product_req.get("name", f"Producto {idx}")
         internos = resultados_internos.get(idx, [])
         externos = resultados_externos.get(idx, [])
-        
+
         # Combinar todas las opciones
         todas_opciones = []
-        
+
         for opcion in internos:
             todas_opciones.append({**opcion, "tipo": "INTERNO"})
         for opcion in externos:
             todas_opciones.append({**opcion, "tipo": "EXTERNO"})
-            
+
         if todas_opciones:
-            # Formatear para el LLM con nombre del producto solicitado
-            opciones_para_llm.append(
-                format_options_for_llm(f"PRODUCTO {idx}: {product_name}", todas_opciones)
-            )
-    
-    if not opciones_para_llm:
-        return {
-            "recomendaciones_llm": "No hay opciones disponibles."
-        }
-    
+            productos.append({
+                "label": f"PRODUCTO {idx}: {product_name}",
+                "cantidad": product_req.get("cantidad", 1),
+                "opciones": todas_opciones
+            })
+
+    return productos
+
+
+def _ranking_llm(productos: list) -> str:
+    """
+    Ranking completo generado por ranking_chain (sus tokens se transmiten con stream_mode='messages');
+    si el LLM falla se usa el motor de reglas, avisando al cliente si ya había recibido parte de la respuesta.
+    """
+    from utils import count_tokens, format_options_compact
+
     # Crear el texto completo para el LLM
-    opciones_texto = "\n\n".join(opciones_para_llm)
-    
+    if RANKING_PROMPT_FORMAT == "verbose":
+        opciones_texto = _texto_verbose(productos)
+    else:
+        opciones_texto = LEYENDA_COMPACTA + "\n".join(
+            format_options_compact(
+                producto["label"], producto["opciones"], producto["cantidad"], max_tokens=RANKING_PROMPT_TOKEN_BUDGET
+            )
+            for producto in productos
+        )
+
+        if RANKING_PROMPT_REPORT:
+            antes = count_tokens(_texto_verbose(productos))
+            despues = count_tokens(opciones_texto)
+            print(f"📉 Prompt de ranking: {antes} → {despues} tokens ({100 * (antes - despues) / max(antes, 1):.0f}% menos)")
+
+    contador = _ContadorTokens()
     try:
         # Invocar el LLM para que haga el ranking
-        recomendaciones = ChainAdministrator().get("ranking_chain").invoke({"opciones_texto": opciones_texto})
-        recomendaciones_texto = recomendaciones.content
-        
-    except Exception as e:
-        recomendaciones_texto = "Error al generar ranking automático."
-    
-    return {
-        "recomendaciones_llm": recomendaciones_texto
-    }
\ No newline at end of file
+        recomendaciones = ChainAdministrator().get("ranking_chain").invoke(
+            {"opciones_texto": opciones_texto}, config=_config_del_nodo(callbacks=[contador])
+        )
+        if not contador.tokens:
+            # Respuesta del cache: no hubo tokens, se envía completa
+            emit_text(recomendaciones.content)
+        return recomendaciones.content
+
+    except Exception:
+        ranking_texto = build_ranking_text(productos)
+        emit_text((AVISO_REEMPLAZO if contador.tokens else "") + ranking_texto)
+        return ranking_texto
+
+
+def _texto_verbose(productos: list) -> str:
+    """Serialización original (format_options_for_llm) de todas las opciones."""
+    from utils import format_options_for_llm
+
+    return "\n\n".join(
+        format_options_for_llm(producto["label"], producto["opciones"]) for producto in productos
+    )
+
+
+def _ranking_hibrido(productos: list) -> str:
+    """
+    Orden del motor de reglas más un comentario breve del LLM (si el comentario falla se omite).
+    """
+    ranking_texto = build_ranking_text(productos)
+    # El orden del motor se muestra de inmediato; el comentario llega después, token a token
+    emit_text(ranking_texto)
+
+    # Los tokens se reenvían desde acá (nostream los excluye de stream_mode='messages') para emitir el prefijo
+    # recién con el primer token: si la llamada falla antes, el cliente no recibe nada más
+    fragmentos = []
+    try:
+        for chunk in ChainAdministrator().get("ranking_commentary_chain").stream(
+            {"ranking_texto": ranking_texto}, config=_config_del_nodo(tags=[TAG_NOSTREAM])
+        ):
+            texto = chunk.content if isinstance(chunk.content, str) else ""
+            if not texto:
+                continue
+            emit_text((PREFIJO_COMENTARIO if not fragmentos else "") + texto)
+            fragmentos.append(texto)
+        return f"{ranking_texto}{PREFIJO_COMENTARIO}{''.join(fragmentos)}" if fragmentos else ranking_texto
+
+    except Exception:
+        if fragmentos:
+            emit_text("\n\n⚠️ Comentario interrumpido; se muestra solo el ranking.")
+        return ranking_texto
@@ -1,6 +1,9 @@
 from schemas.state import AgentState
 from langchain_core.messages import AIMessage
 
+# Encabezado del mensaje de ranking (los clientes con streaming lo muestran antes del primer token)
+ENCABEZADO_RANKING = "📋 **Resumen del ranking:**\n\n"
+
 def human_in_the_loop_selection(state: AgentState) -> AgentState:
     """
     Presenta el ranking generado por LLM al usuario y solicita su selección de productos.
@@ -8,7 +11,7 @@ def human_in_the_loop_selection(state: AgentState) -> AgentState:
     recomendaciones = state.get("recomendaciones_llm", "")
     
     # El LLM ya generó el ranking completo con la pregunta incluida
-    mensaje = "📋 **Resumen del ranking:**\n\n"
+    mensaje = ENCABEZADO_RANKING
     mensaje += recomendaciones
     
     return {
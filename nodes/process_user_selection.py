@@ -1,7 +1,101 @@
+import re
+import unicodedata
+from typing import Optional
 from schemas.state import AgentState
 from langchain_core.messages import AIMessage, HumanMessage
 from chains.chain_administrator import ChainAdministrator
-from schemas.structure_outputs import UserSelectionIntent
+from schemas.structure_outputs import ProductSelection, UserSelectionIntent
+
+# Patrón: captura cantidad (opcional) + código
+# Ejemplos: "3 R-0001", "R-0001 x5", "R-0001 (10)", "5 unidades de R-0001", "R-0001 por 10"
+PATRON_SELECCION = re.compile(
+    r'(?:(\d+)\s*(?:unidades?\s+(?:de|del)\s+|del\s+|x\s*)?)?([Rr]-\d{4})(?:\s*[x×]\s*(\d+)|\s*\((\d+)\)|(?:\s+por\s+(\d+)))?'
+)
+
+# Respuestas cortas completas (sin tildes ni relleno); solo un mensaje que sea exactamente una de estas frases
+# se resuelve sin LLM. Cualquier otra respuesta (mixta, con condiciones o dudosa) va al parser LLM.
+FRASES_CONFIRMAR = {
+    "si", "ok", "okay", "okey", "dale", "listo", "perfecto", "correcto", "adelante", "de acuerdo", "esta bien",
+    "confirmar", "confirmo", "confirmado", "acepto", "proceder", "procede", "si confirmo", "si dale", "ok dale",
+    "confirmar todo", "confirmo todo", "todos", "todo", "si todos", "si todo", "los quiero todos", "quiero todos",
+    "me llevo todos", "me los llevo", "me llevo todo", "si adelante", "si de acuerdo"
+}
+FRASES_CANCELAR = {
+    "no", "cancelar", "cancela", "cancelo", "cancelado", "ninguno", "ninguna", "nada", "rechazo", "rechazar",
+    "no quiero nada", "no quiero ninguno", "mejor no", "dejalo", "dejalo asi", "olvidalo",
+    "cancelar pedido", "cancela el pedido", "cancelar todo", "no confirmo"
+}
+# Palabras que se descartan antes de comparar con las frases
+PALABRAS_RELLENO = {"gracias", "por", "favor", "muchas", "entonces"}
+
+if FRASES_CONFIRMAR & FRASES_CANCELAR:
+    raise ValueError(f"Frases de confirmación y cancelación superpuestas: {sorted(FRASES_CONFIRMAR & FRASES_CANCELAR)}")
+
+# Únicas palabras que pueden acompañar a los códigos sin LLM (además de la puntuación); cualquier otra
+# (en vez de, cambia, saca, ni, o...) puede excluir o corregir algo y la respuesta se delega al LLM
+PALABRAS_RELLENO_CON_CODIGOS = {"y", "e", "el", "la", "los", "las", "de", "del", "quiero", "gracias"}
+FRASES_RELLENO_CON_CODIGOS = ("por favor",)
+
+
+def _normalizar(texto: str) -> str:
+    """Minúsculas sin tildes."""
+    texto = unicodedata.normalize("NFKD", texto.lower())
+    return "".join(c for c in texto if not unicodedata.combining(c))
+
+
+def interpretar_seleccion_determinista(user_message: str, estricto: bool = True) -> Optional[UserSelectionIntent]:
+    """
+    Interpreta códigos con cantidades y frases cortas de confirmación/cancelación sin LLM.
+    Retorna None si la respuesta es ambigua (con estricto=False acepta los códigos aunque sobre texto).
+    """
+    matches = list(PATRON_SELECCION.finditer(user_message))
+    
+    if matches:
+        productos_seleccionados = []
+        for match in matches:
+            cantidad_antes, codigo, cantidad_x, cantidad_paren, cantidad_por = match.groups()
+            
+            # Determinar cantidad de cualquier formato
+            cantidad = int(cantidad_antes or cantidad_x or cantidad_paren or cantidad_por or 1)
+            productos_seleccionados.append(ProductSelection(codigo=codigo.upper(), cantidad=max(1, cantidad)))
+        
+        if estricto:
+            # Lo que queda fuera de los códigos solo puede ser relleno: nada de números sueltos ni otras palabras
+            resto = _normalizar(PATRON_SELECCION.sub(" ", user_message))
+            for frase in FRASES_RELLENO_CON_CODIGOS:
+                resto = re.sub(rf"\b{frase}\b", " ", resto)
+            palabras = re.findall(r"[a-z0-9]+", resto)
+            if any(p not in PALABRAS_RELLENO_CON_CODIGOS for p in palabras):
+                return None
+        
+        return UserSelectionIntent(
+            accion="seleccionar_codigos",
+            productos_seleccionados=productos_seleccionados,
+            confianza=0.95 if estricto else 0.7,
+            razon="Parser determinista" if estricto else "Fallback a regex"
+        )
+    
+    if not estricto:
+        return None
+    
+    frase = " ".join(p for p in re.findall(r"[a-z0-9]+", _normalizar(user_message)) if p not in PALABRAS_RELLENO)
+    
+    if frase in FRASES_CANCELAR:
+        return UserSelectionIntent(
+            accion="cancelar",
+            productos_seleccionados=[],
+            confianza=0.95,
+            razon="Frase de cancelación"
+        )
+    if frase in FRASES_CONFIRMAR:
+        return UserSelectionIntent(
+            accion="confirmar_todo",
+            productos_seleccionados=[],
+            confianza=0.95,
+            razon="Frase de confirmación"
+        )
+    
+    return None
 
 def find_codigo_in_results(codigo: str, resultados_por_producto: dict) -> tuple:
     """
@@ -15,7 +109,7 @@ def find_codigo_in_results(codigo: str, resultados_por_producto: dict) -> tuple:
 
 def process_user_selection(state: AgentState) -> AgentState:
     """
-    Interpreta selección del usuario con LLM, valida códigos y determina tipo de orden (interno/externo/mixto).
+    Interpreta selección del usuario (parser determinista y LLM solo si es ambigua), valida códigos y determina tipo de orden (interno/externo/mixto).
     """
     messages = state.get("messages", [])
     codigos_disponibles = state.get("codigos_repuestos", [])
@@ -36,52 +130,20 @@ def process_user_selection(state: AgentState) -> AgentState:
         }
     
     
-    # Usar LLM para interpretar la intención del usuario
-    try:
-        interpretation = ChainAdministrator().get("selection_interpretation_chain").invoke({
-            "codigos_disponibles": ", ".join(codigos_disponibles),
-            "user_message": user_message
-        })
-        
-    except Exception as e:
-        # Fallback a regex simple con cantidades
-        import re
-        # Patrón: captura cantidad (opcional) + código
-        # Ejemplos: "3 R-0001", "R-0001 x5", "R-0001 (10)", "5 unidades de R-0001"
-        patron = r'(?:(\d+)\s*(?:unidades?\s+(?:de|del)\s+|del\s+|x\s*)?)?([Rr]-\d{4})(?:\s*[x×]\s*(\d+)|\s*\((\d+)\)|(?:\s+por\s+(\d+)))?'
-        matches = re.findall(patron, user_message)
-        
-        productos_seleccionados = []
-        for match in matches:
-            cantidad_antes, codigo, cantidad_x, cantidad_paren, cantidad_por = match
-            codigo = codigo.upper()
-            
-            # Determinar cantidad de cualquier formato
-            cantidad = 1
-            if cantidad_antes:
-                cantidad = int(cantidad_antes)
-            elif cantidad_x:
-                cantidad = int(cantidad_x)
-            elif cantidad_paren:
-                cantidad = int(cantidad_paren)
-            elif cantidad_por:
-                cantidad = int(cantidad_por)
-            
-            productos_seleccionados.append({
-                "codigo": codigo,
-                "cantidad": max(1, cantidad)  # Asegurar mínimo 1
+    # Parser determinista primero: códigos, cantidades y frases de confirmación/cancelación
+    interpretation = interpretar_seleccion_determinista(user_message)
+    
+    if interpretation is None:
+        # Solo la entrada ambigua llega al LLM
+        try:
+            interpretation = ChainAdministrator().get("selection_interpretation_chain").invoke({
+                "codigos_disponibles": ", ".join(codigos_disponibles),
+                "user_message": user_message
             })
-        
-        if productos_seleccionados:
-            from schemas.structure_outputs import ProductSelection
-            interpretation = UserSelectionIntent(
-                accion="seleccionar_codigos",
-                productos_seleccionados=[ProductSelection(**p) for p in productos_seleccionados],
-                confianza=0.7,
-                razon="Fallback a regex"
-            )
-        else:
-            interpretation = UserSelectionIntent(
+            
+        except Exception as e:
+            # Fallback: aceptar los códigos detectados aunque el mensaje tenga texto extra
+            interpretation = interpretar_seleccion_determinista(user_message, estricto=False) or UserSelectionIntent(
                 accion="no_entendido",
                 productos_seleccionados=[],
                 confianza=0.3,
@@ -101,7 +163,6 @@ def process_user_selection(state: AgentState) -> AgentState:
     
     elif interpretation.accion == "confirmar_todo":
         # Crear productos_seleccionados con cantidad = 1 para todos
-        from schemas.structure_outputs import ProductSelection
         productos_seleccionados = [
             ProductSelection(codigo=cod, cantidad=1) for cod in codigos_disponibles
         ]
@@ -1,8 +1,70 @@
-from sentence_transformers import SentenceTransformer
+import asyncio
+import os
+from typing import Dict, List
 from langchain_core.messages import AIMessage
-from db.mongo import MongoCollectionManager
+from embeddings.model_manager import EmbeddingModelManager, normalize_query
 from schemas.state import AgentState
 from schemas.repuesto import Repuesto
+from search.backend_manager import SearchBackendManager
+
+# Campos proyectados en cada tipo de búsqueda
+CAMPOS_INTERNOS = [
+    "id_repuesto", "repuesto_descripcion", "categoria", "marca", "modelo",
+    "proveedor_tipo", "proveedor_nombre", "proveedor_rating", "stock_disponible", "costo_unitario", "lead_time_dias"
+]
+CAMPOS_EXTERNOS = [
+    "id_repuesto", "repuesto_descripcion", "categoria", "marca", "modelo",
+    "proveedor_tipo", "proveedor_nombre", "proveedor_rating", "costo_unitario", "lead_time_dias"
+]
+
+# Modo de recuperación: 'staged' (interno y luego externo) o 'unified' (todo en un round trip)
+SEARCH_MODE = os.getenv("SEARCH_MODE", "staged").lower()
+
+# Máximo de consultas concurrentes por turno en los nodos async
+SEARCH_CONCURRENCY = int(os.getenv("SEARCH_CONCURRENCY", "8"))
+
+
+def _consultas_por_producto(product_requests: List[Dict], query_embeddings: Dict) -> Dict[int, List[float]]:
+    """
+    Asocia cada índice de producto (1-based) con el vector de su query; omite productos sin nombre.
+    """
+    return {
+        idx: query_embeddings[normalize_query(p.get("name", ""))]
+        for idx, p in enumerate(product_requests, 1) if p.get("name", "")
+    }
+
+
+def _separar_unificado(consultas: Dict[int, List[float]], respuesta: List[Dict]) -> tuple:
+    """
+    Separa la respuesta unificada en internos por producto y ofertas externas precargadas (prefetch).
+    """
+    resultados_unificados = {idx: r for idx, r in zip(consultas.keys(), respuesta)}
+
+    # Lo externo queda precargado para que semantic_search_external no vuelva a consultar
+    # (_id como str para que el estado sea serializable en el checkpoint)
+    sin_object_id = lambda docs: [{**d, "_id": str(d["_id"])} if "_id" in d else d for d in docs]
+    prefetch_externos = {"por_producto": {}, "por_codigo": {}}
+    for idx, r in resultados_unificados.items():
+        prefetch_externos["por_producto"][idx] = sin_object_id(r["externos"])
+        for codigo, ofertas in r["externos_por_codigo"].items():
+            prefetch_externos["por_codigo"][codigo] = sin_object_id(ofertas)
+
+    busquedas = {idx: r["internos"] for idx, r in resultados_unificados.items()}
+    return busquedas, prefetch_externos
+
+
+async def _gather_limitado(fabricas: List, limite: int = SEARCH_CONCURRENCY) -> List:
+    """
+    Ejecuta las corrutinas (creadas por cada fábrica) en paralelo con un semáforo; las excepciones se retornan.
+    """
+    semaforo = asyncio.Semaphore(max(1, limite))
+
+    async def ejecutar(fabrica):
+        async with semaforo:
+            return await fabrica()
+
+    return await asyncio.gather(*(ejecutar(f) for f in fabricas), return_exceptions=True)
+
 
 def semantic_search_internal(state: AgentState) -> AgentState:
     """
@@ -10,8 +72,82 @@ def semantic_search_internal(state: AgentState) -> AgentState:
     """    
     product_requests = state.get("product_requests", [])
     
-    model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
+    # Codificar TODAS las queries del turno en un solo batch (deduplicadas)
+    query_embeddings = EmbeddingModelManager().encode_queries(
+        [p.get("name", "") for p in product_requests]
+    )
+    consultas = _consultas_por_producto(product_requests, query_embeddings)
+    backend = SearchBackendManager().get_backend()
     
+    # MODO UNIFICADO: internos + externos de todos los productos en un solo round trip
+    busquedas = None
+    prefetch_externos = None
+    if SEARCH_MODE == "unified":
+        try:
+            respuesta = backend.unified_search(
+                list(consultas.values()), CAMPOS_INTERNOS, CAMPOS_EXTERNOS, limit=5, num_candidates=100
+            )
+            busquedas, prefetch_externos = _separar_unificado(consultas, respuesta)
+        except Exception as e:
+            print(f"   ⚠️  Búsqueda unificada falló, se usa búsqueda por etapas: {e}")
+    
+    if busquedas is None:
+        busquedas = {}
+        for idx, query_embedding in consultas.items():
+            try:
+                # Pre-filtro INTERNAL dentro de la búsqueda vectorial (página completa en un round trip)
+                busquedas[idx] = backend.vector_search(
+                    query_embedding, CAMPOS_INTERNOS, limit=5, num_candidates=100,
+                    proveedor_tipo="INTERNAL", min_score=0.5
+                )
+            except Exception as e:
+                busquedas[idx] = e
+    
+    return _procesar_busqueda_interna(product_requests, busquedas, prefetch_externos)
+
+
+async def asemantic_search_internal(state: AgentState) -> AgentState:
+    """
+    Versión async de semantic_search_internal: consultas por producto concurrentes (hasta SEARCH_CONCURRENCY).
+    """
+    product_requests = state.get("product_requests", [])
+    
+    # El encode es CPU-bound: se ejecuta en un hilo para no bloquear el event loop
+    query_embeddings = await asyncio.to_thread(
+        EmbeddingModelManager().encode_queries, [p.get("name", "") for p in product_requests]
+    )
+    consultas = _consultas_por_producto(product_requests, query_embeddings)
+    backend = SearchBackendManager().get_backend()
+    
+    busquedas = None
+    prefetch_externos = None
+    if SEARCH_MODE == "unified":
+        try:
+            respuesta = await backend.aunified_search(
+                list(consultas.values()), CAMPOS_INTERNOS, CAMPOS_EXTERNOS, limit=5, num_candidates=100
+            )
+            busquedas, prefetch_externos = _separar_unificado(consultas, respuesta)
+        except Exception as e:
+            print(f"   ⚠️  Búsqueda unificada falló, se usa búsqueda por etapas: {e}")
+    
+    if busquedas is None:
+        resultados = await _gather_limitado([
+            lambda v=query_embedding: backend.avector_search(
+                v, CAMPOS_INTERNOS, limit=5, num_candidates=100,
+                proveedor_tipo="INTERNAL", min_score=0.5
+            )
+            for query_embedding in consultas.values()
+        ])
+        busquedas = dict(zip(consultas.keys(), resultados))
+    
+    return _procesar_busqueda_interna(product_requests, busquedas, prefetch_externos)
+
+
+def _procesar_busqueda_interna(product_requests: List[Dict], busquedas: Dict, prefetch_externos) -> AgentState:
+    """
+    Clasifica los resultados internos por suficiencia de stock y arma el estado/mensaje del nodo.
+    `busquedas` mapea idx de producto -> resultados (o la excepción de su consulta).
+    """
     todos_repuestos = []
     codigos_unicos_global = set()
     codigos_encontrados_global = []
@@ -25,42 +161,11 @@ def semantic_search_internal(state: AgentState) -> AgentState:
         
         if not product_query:
             continue
-                
-        query_embedding = model.encode(product_query).tolist()
-        
-        # Pipeline con FILTRO INTERNO
-        pipeline = [
-            {
-                "$vectorSearch": {
-                    "index": "vector_index_repuestos",
-                    "path": "embedding_vector",
-                    "queryVector": query_embedding,
-                    "numCandidates": 100,
-                    "limit": 5
-                }
-            },
-            {
-                "$project": {
-                    "id_repuesto": 1,
-                    "repuesto_descripcion": 1,
-                    "categoria": 1,
-                    "marca": 1,
-                    "modelo": 1,
-                    "proveedor_tipo": 1,
-                    "proveedor_nombre": 1,
-                    "stock_disponible": 1,
-                    "costo_unitario": 1,
-                    "lead_time_dias": 1,
-                    "score": {"$meta": "vectorSearchScore"}
-                }
-            }
-        ]
         
         try:
-            resultados_raw = list(MongoCollectionManager().get_collection().aggregate(pipeline))
-            
-            # Filtrar por proveedor_tipo DESPUÉS de la búsqueda
-            resultados = [r for r in resultados_raw if r.get('proveedor_tipo') == 'INTERNAL']
+            resultados = busquedas.get(idx, [])
+            if isinstance(resultados, Exception):
+                raise resultados
                         
             if not resultados or len(resultados) == 0:
                 productos_sin_resultados.append({
@@ -226,6 +331,7 @@ def semantic_search_internal(state: AgentState) -> AgentState:
         "repuestos_encontrados": todos_repuestos,
         "productos_sin_match_interno": productos_sin_resultados,
         "resultados_internos": resultados_por_producto,  # Para el reranking - agrupado por producto
+        "prefetch_externos": prefetch_externos,  # Solo en modo unificado (None en modo por etapas)
         "info_completa": True
     }
     
@@ -239,8 +345,117 @@ def semantic_search_external(state: AgentState) -> AgentState:
     if not productos_sin_match:
         return {}
     
-    model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
+    # En modo unificado las ofertas externas ya vinieron en la búsqueda interna (sin nuevas consultas)
+    prefetch = state.get("prefetch_externos")
+    if prefetch:
+        return _procesar_busqueda_externa(state, productos_sin_match, *_externos_desde_prefetch(productos_sin_match, prefetch))
     
+    backend = SearchBackendManager().get_backend()
+    items_semanticos = [item for item in productos_sin_match if not item.get("codigos_sin_stock")]
+    
+    # Codificar en un solo batch solo las queries que irán por búsqueda semántica (sin códigos)
+    query_embeddings = EmbeddingModelManager().encode_queries([item.get("name", "") for item in items_semanticos])
+    
+    # CASO A en bloque: UNA sola consulta $in con todos los códigos sin stock del turno
+    todos_codigos_sin_stock = _codigos_sin_stock(productos_sin_match)
+    ofertas = []
+    if todos_codigos_sin_stock:
+        try:
+            ofertas = backend.find_by_codes(todos_codigos_sin_stock, CAMPOS_EXTERNOS, proveedor_tipo="EXTERNAL")
+        except Exception as e:
+            print(f"      ❌ Error buscando códigos {todos_codigos_sin_stock}: {e}")
+    
+    # CASO B: búsqueda semántica (pre-filtro EXTERNAL) para productos sin código
+    semanticos = {}
+    for item in items_semanticos:
+        try:
+            semanticos[item.get("idx", "")] = backend.vector_search(
+                query_embeddings.get(normalize_query(item.get("name", ""))), CAMPOS_EXTERNOS,
+                limit=5, num_candidates=100, proveedor_tipo="EXTERNAL", min_score=0.50
+            )
+        except Exception as e:
+            semanticos[item.get("idx", "")] = []
+    
+    return _procesar_busqueda_externa(state, productos_sin_match, _agrupar_por_codigo(ofertas), semanticos)
+
+
+async def asemantic_search_external(state: AgentState) -> AgentState:
+    """
+    Versión async de semantic_search_external: lookup por códigos y búsquedas semánticas concurrentes.
+    """
+    productos_sin_match = state.get("productos_sin_match_interno", [])
+    
+    if not productos_sin_match:
+        return {}
+    
+    prefetch = state.get("prefetch_externos")
+    if prefetch:
+        return _procesar_busqueda_externa(state, productos_sin_match, *_externos_desde_prefetch(productos_sin_match, prefetch))
+    
+    backend = SearchBackendManager().get_backend()
+    items_semanticos = [item for item in productos_sin_match if not item.get("codigos_sin_stock")]
+    
+    query_embeddings = await asyncio.to_thread(
+        EmbeddingModelManager().encode_queries, [item.get("name", "") for item in items_semanticos]
+    )
+    
+    todos_codigos_sin_stock = _codigos_sin_stock(productos_sin_match)
+    
+    async def buscar_codigos():
+        if not todos_codigos_sin_stock:
+            return []
+        return await backend.afind_by_codes(todos_codigos_sin_stock, CAMPOS_EXTERNOS, proveedor_tipo="EXTERNAL")
+    
+    # Lookup por códigos + una búsqueda semántica por producto, todas en paralelo
+    resultados = await _gather_limitado([buscar_codigos] + [
+        lambda item=item: backend.avector_search(
+            query_embeddings.get(normalize_query(item.get("name", ""))), CAMPOS_EXTERNOS,
+            limit=5, num_candidates=100, proveedor_tipo="EXTERNAL", min_score=0.50
+        )
+        for item in items_semanticos
+    ])
+    
+    ofertas = resultados[0]
+    if isinstance(ofertas, Exception):
+        print(f"      ❌ Error buscando códigos {todos_codigos_sin_stock}: {ofertas}")
+        ofertas = []
+    
+    semanticos = {
+        item.get("idx", ""): ([] if isinstance(r, Exception) else r)
+        for item, r in zip(items_semanticos, resultados[1:])
+    }
+    
+    return _procesar_busqueda_externa(state, productos_sin_match, _agrupar_por_codigo(ofertas), semanticos)
+
+
+def _codigos_sin_stock(productos_sin_match: List[Dict]) -> List[str]:
+    """Códigos sin stock de todos los productos del turno, sin duplicados y en orden."""
+    return list(dict.fromkeys(
+        codigo for item in productos_sin_match for codigo in item.get("codigos_sin_stock", [])
+    ))
+
+
+def _agrupar_por_codigo(ofertas: List[Dict]) -> Dict[str, List[Dict]]:
+    """Agrupa las ofertas de la consulta en bloque por id_repuesto."""
+    ofertas_por_codigo = {}
+    for r in ofertas:
+        ofertas_por_codigo.setdefault(r.get("id_repuesto"), []).append(r)
+    return ofertas_por_codigo
+
+
+def _externos_desde_prefetch(productos_sin_match: List[Dict], prefetch: Dict) -> tuple:
+    """Toma las ofertas externas precargadas en modo unificado (por código y semánticas por producto)."""
+    semanticos = {
+        item.get("idx", ""): [dict(r) for r in prefetch["por_producto"].get(item.get("idx", ""), [])]
+        for item in productos_sin_match if not item.get("codigos_sin_stock")
+    }
+    return prefetch["por_codigo"], semanticos
+
+
+def _procesar_busqueda_externa(state: AgentState, productos_sin_match: List[Dict], ofertas_por_codigo: Dict, semanticos: Dict) -> AgentState:
+    """
+    Arma el estado/mensaje del nodo externo a partir de las ofertas por código y los resultados semánticos.
+    """
     repuestos_externos = list(state.get("repuestos_encontrados", []))
     codigos_existentes = set(state.get("codigos_repuestos", []))
     codigos_externos = []
@@ -260,36 +475,10 @@ def semantic_search_external(state: AgentState) -> AgentState:
             # CASO A: BÚSQUEDA POR CÓDIGO (más precisa y rápida)
             # ═══════════════════════════════════════════════════════
             
-            resultados = []
-            for codigo in codigos_sin_stock:
-                pipeline = [
-                    {
-                        "$match": {
-                            "id_repuesto": codigo,
-                            "proveedor_tipo": "EXTERNAL"
-                        }
-                    },
-                    {
-                        "$project": {
-                            "id_repuesto": 1,
-                            "repuesto_descripcion": 1,
-                            "categoria": 1,
-                            "marca": 1,
-                            "modelo": 1,
-                            "proveedor_tipo": 1,
-                            "proveedor_nombre": 1,
-                            "costo_unitario": 1,
-                            "lead_time_dias": 1
-                        }
-                    }
-                ]
-                
-                try:
-                    resultados_codigo = list(MongoCollectionManager().get_collection().aggregate(pipeline))
-                    resultados.extend(resultados_codigo)
-
-                except Exception as e:
-                    print(f"      ❌ Error buscando {codigo}: {e}")
+            # Reagrupar por producto desde la consulta en bloque (copias: un código puede repetirse entre productos)
+            resultados = [
+                dict(r) for codigo in codigos_sin_stock for r in ofertas_por_codigo.get(codigo, [])
+            ]
             
             # Asignar score=1.0 para búsquedas por código (match exacto)
             for r in resultados:
@@ -300,42 +489,7 @@ def semantic_search_external(state: AgentState) -> AgentState:
             # CASO B: BÚSQUEDA SEMÁNTICA (fallback sin código)
             # ═══════════════════════════════════════════════════════
             
-            query_embedding = model.encode(product_query).tolist()
-            
-            # Pipeline con FILTRO EXTERNO
-            pipeline = [
-                {
-                    "$vectorSearch": {
-                        "index": "vector_index_repuestos",
-                        "path": "embedding_vector",
-                        "queryVector": query_embedding,
-                        "numCandidates": 100,
-                        "limit": 5
-                    }
-                },
-                {
-                    "$project": {
-                        "id_repuesto": 1,
-                        "repuesto_descripcion": 1,
-                        "categoria": 1,
-                        "marca": 1,
-                        "modelo": 1,
-                        "proveedor_tipo": 1,
-                        "proveedor_nombre": 1,
-                        "costo_unitario": 1,
-                        "lead_time_dias": 1,
-                        "score": {"$meta": "vectorSearchScore"}
-                    }
-                }
-            ]
-            
-            try:
-                resultados_raw = list(MongoCollectionManager().get_collection().aggregate(pipeline))
-                
-                # Filtrar por proveedor_tipo DESPUÉS de la búsqueda
-                resultados = [r for r in resultados_raw if r.get('proveedor_tipo') == 'EXTERNAL']
-            except Exception as e:
-                resultados = []
+            resultados = semanticos.get(idx, [])
         
         # ═══════════════════════════════════════════════════════
         # PROCESAMIENTO DE RESULTADOS (común para ambos casos)
@@ -403,5 +557,6 @@ def semantic_search_external(state: AgentState) -> AgentState:
         "messages": [AIMessage(content=mensaje)],
         "codigos_repuestos": todos_codigos,
         "repuestos_encontrados": repuestos_externos,
-        "resultados_externos": resultados_externos_por_producto  # Para el reranking - agrupado por producto
+        "resultados_externos": resultados_externos_por_producto,  # Para el reranking - agrupado por producto
+        "prefetch_externos": None
     }
\ No newline at end of file
@@ -1,11 +1,12 @@
 from schemas.state import AgentState
 from chains.chain_administrator import ChainAdministrator
+from history.message_window import window_messages
 
 def classify_request(state: AgentState) -> AgentState:
     """
     Clasifica con LLM si el mensaje es solicitud de repuestos o conversación general.
     """
-    messages = state['messages']
+    messages = window_messages(state['messages'])
     validation_result_object = ChainAdministrator().get('validation_chain').invoke({"messages": messages})
     
     return {"validation_result": validation_result_object}
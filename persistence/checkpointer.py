@@ -0,0 +1,44 @@
+import os
+
+from langgraph.checkpoint.base import BaseCheckpointSaver
+
+# Checkpointer del grafo: 'sqlite' (por defecto: archivo con retención acotada) o 'memory' (MemorySaver sin
+# límite, se pierde al reiniciar; solo para pruebas locales)
+CHECKPOINT_BACKEND = os.getenv("CHECKPOINT_BACKEND", "sqlite").lower()
+CHECKPOINT_DB_PATH = os.getenv("CHECKPOINT_DB_PATH", ".cache/checkpoints.sqlite")
+CHECKPOINT_KEEP_LAST = int(os.getenv("CHECKPOINT_KEEP_LAST", "20"))
+CHECKPOINT_THREAD_TTL_S = float(os.getenv("CHECKPOINT_THREAD_TTL_S", "86400"))
+CHECKPOINT_MAINTENANCE_INTERVAL_S = float(os.getenv("CHECKPOINT_MAINTENANCE_INTERVAL_S", "300"))
+
+# Serialización de checkpoints: 'zstd' (msgpack comprimido) o 'default' (msgpack sin comprimir de LangGraph)
+CHECKPOINT_SERDE = os.getenv("CHECKPOINT_SERDE", "zstd").lower()
+CHECKPOINT_ZSTD_LEVEL = int(os.getenv("CHECKPOINT_ZSTD_LEVEL", "3"))
+CHECKPOINT_SERDE_REPORT = os.getenv("CHECKPOINT_SERDE_REPORT", "false").lower() == "true"
+
+
+def create_checkpointer(backend_name: str = None) -> BaseCheckpointSaver:
+    """
+    Crea el checkpointer indicado (o CHECKPOINT_BACKEND del entorno).
+    """
+    from persistence.serializer import create_serializer
+
+    backend_name = (backend_name or CHECKPOINT_BACKEND).lower()
+    serde = create_serializer(CHECKPOINT_SERDE, level=CHECKPOINT_ZSTD_LEVEL, report=CHECKPOINT_SERDE_REPORT)
+
+    if backend_name == "memory":
+        from langgraph.checkpoint.memory import MemorySaver
+        return MemorySaver(serde=serde)
+
+    if backend_name == "sqlite":
+        from persistence.sqlite_checkpointer import SQLiteCheckpointSaver
+
+        print(f"💾 Checkpoints en SQLite: {CHECKPOINT_DB_PATH} (últimos {CHECKPOINT_KEEP_LAST} por thread)")
+        return SQLiteCheckpointSaver(
+            CHECKPOINT_DB_PATH,
+            max_checkpoints_per_thread=CHECKPOINT_KEEP_LAST,
+            thread_ttl_seconds=CHECKPOINT_THREAD_TTL_S or None,
+            maintenance_interval_seconds=CHECKPOINT_MAINTENANCE_INTERVAL_S,
+            serde=serde
+        )
+
+    raise ValueError(f"Checkpointer '{backend_name}' no soportado. Opciones: 'memory', 'sqlite'.")
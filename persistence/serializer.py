@@ -0,0 +1,105 @@
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import zstandard
+from langgraph.checkpoint.serde.base import SerializerProtocol
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+# Sufijo del tipo serializado que indica payload comprimido (p. ej. 'msgpack+zstd')
+SUFIJO_ZSTD = "+zstd"
+
+
+class ZstdMsgpackSerializer(SerializerProtocol):
+    """
+    Serializer de checkpoints: msgpack (JsonPlusSerializer, que soporta mensajes LangChain y modelos pydantic)
+    comprimido con zstd. Los payloads chicos se guardan sin comprimir y los datos previos sin sufijo se siguen leyendo.
+    Registra tamaños y tiempos de encode/decode.
+    """
+
+    def __init__(self, level: int = 3, min_size: int = 256, report: bool = False):
+        self.level = level
+        self.min_size = min_size
+        self.report = report
+        self._inner = JsonPlusSerializer()
+        # Los (de)compresores de zstandard no son thread-safe: uno por hilo
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stats = {
+            "encoded": 0, "decoded": 0, "raw_bytes": 0, "stored_bytes": 0, "encode_ms": 0.0, "decode_ms": 0.0
+        }
+
+    def _compressor(self) -> zstandard.ZstdCompressor:
+        if getattr(self._local, "compressor", None) is None:
+            self._local.compressor = zstandard.ZstdCompressor(level=self.level)
+        return self._local.compressor
+
+    def _decompressor(self) -> zstandard.ZstdDecompressor:
+        if getattr(self._local, "decompressor", None) is None:
+            self._local.decompressor = zstandard.ZstdDecompressor()
+        return self._local.decompressor
+
+    def dumps_typed(self, obj: Any) -> Tuple[str, bytes]:
+        """
+        Serializa con msgpack y comprime con zstd si el resultado supera min_size.
+        """
+        inicio = time.perf_counter()
+        tipo, datos = self._inner.dumps_typed(obj)
+        raw = len(datos)
+        if raw >= self.min_size and tipo not in ("null", "bytes", "bytearray"):
+            datos = self._compressor().compress(datos)
+            tipo += SUFIJO_ZSTD
+        ms = (time.perf_counter() - inicio) * 1000
+
+        with self._lock:
+            self._stats["encoded"] += 1
+            self._stats["raw_bytes"] += raw
+            self._stats["stored_bytes"] += len(datos)
+            self._stats["encode_ms"] += ms
+
+        # Solo se reportan checkpoints completos (no las escrituras pendientes de cada tarea)
+        if self.report and isinstance(obj, dict) and "channel_values" in obj:
+            print(f"💾 Checkpoint: {raw / 1024:.1f} KB → {len(datos) / 1024:.1f} KB ({ms:.2f} ms)")
+
+        return tipo, datos
+
+    def loads_typed(self, data: Tuple[str, bytes]) -> Any:
+        """
+        Descomprime si el tipo lleva el sufijo '+zstd' y deserializa con msgpack.
+        """
+        inicio = time.perf_counter()
+        tipo, datos = data
+        if tipo.endswith(SUFIJO_ZSTD):
+            tipo = tipo[:-len(SUFIJO_ZSTD)]
+            datos = self._decompressor().decompress(datos)
+        obj = self._inner.loads_typed((tipo, datos))
+        ms = (time.perf_counter() - inicio) * 1000
+
+        with self._lock:
+            self._stats["decoded"] += 1
+            self._stats["decode_ms"] += ms
+
+        return obj
+
+    def get_stats(self) -> Dict:
+        """
+        Retorna bytes antes/después de comprimir, ratio y tiempos promedio de encode/decode.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        stats["ratio"] = stats["raw_bytes"] / stats["stored_bytes"] if stats["stored_bytes"] else 0.0
+        stats["avg_encode_ms"] = stats["encode_ms"] / stats["encoded"] if stats["encoded"] else 0.0
+        stats["avg_decode_ms"] = stats["decode_ms"] / stats["decoded"] if stats["decoded"] else 0.0
+        return stats
+
+
+def create_serializer(name: str, level: int = 3, report: bool = False) -> Optional[SerializerProtocol]:
+    """
+    Serializer de checkpoints según nombre: 'zstd' (msgpack + zstd) o 'default' (None = el de LangGraph).
+    """
+    name = name.lower()
+    if name == "zstd":
+        return ZstdMsgpackSerializer(level=level, report=report)
+    if name == "default":
+        return None
+    raise ValueError(f"Serializer de checkpoints '{name}' no soportado. Opciones: 'zstd', 'default'.")
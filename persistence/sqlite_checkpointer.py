@@ -0,0 +1,413 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    SerializerProtocol,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    type TEXT,
+    checkpoint BLOB,
+    metadata_type TEXT,
+    metadata BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT,
+    value BLOB,
+    task_path TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+CREATE TABLE IF NOT EXISTS threads (
+    thread_id TEXT PRIMARY KEY,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS threads_last_access ON threads (last_access);
+CREATE TABLE IF NOT EXISTS maintenance (
+    key TEXT PRIMARY KEY,
+    value REAL NOT NULL
+);
+"""
+
+
+class SQLiteCheckpointSaver(BaseCheckpointSaver[int]):
+    """
+    Checkpointer de LangGraph en un archivo SQLite con retención acotada: conserva los últimos
+    `max_checkpoints_per_thread` checkpoints por thread, elimina threads inactivos más de `thread_ttl_seconds`
+    y compacta el archivo periódicamente. Usa WAL y transacciones IMMEDIATE para compartirse entre procesos.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        max_checkpoints_per_thread: int = 20,
+        thread_ttl_seconds: Optional[float] = 24 * 3600,
+        maintenance_interval_seconds: float = 300,
+        busy_timeout_ms: int = 30000,
+        serde: Optional[SerializerProtocol] = None
+    ):
+        super().__init__(serde=serde)
+        self.path = path
+        self.max_checkpoints_per_thread = max_checkpoints_per_thread
+        self.thread_ttl_seconds = thread_ttl_seconds
+        self.maintenance_interval_seconds = maintenance_interval_seconds
+        self.busy_timeout_ms = busy_timeout_ms
+        self._local = threading.local()
+        self._ultimo_mantenimiento = 0.0
+
+        directorio = os.path.dirname(path)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+
+        conn = self._connection()
+        # auto_vacuum solo aplica si se fija antes de crear tablas; en archivos existentes queda como estaba
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.executescript(SCHEMA)
+
+    # ───────────────────────────── Conexiones ─────────────────────────────
+
+    def _connection(self) -> sqlite3.Connection:
+        """Conexión propia de cada hilo y proceso (las conexiones SQLite no se comparten entre ellos)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout_ms / 1000, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA busy_timeout={self.busy_timeout_ms}")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Transacción de escritura que toma el lock al inicio (evita deadlocks de upgrade entre procesos)."""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    # ──────────────────────────── Lectura ────────────────────────────
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        """
+        Retorna el checkpoint indicado por `checkpoint_id` o el último del thread.
+        """
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = get_checkpoint_id(config)
+
+        conn = self._connection()
+        if checkpoint_id:
+            fila = conn.execute(
+                "SELECT checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata "
+                "FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                (thread_id, checkpoint_ns, checkpoint_id)
+            ).fetchone()
+        else:
+            fila = conn.execute(
+                "SELECT checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata "
+                "FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? ORDER BY checkpoint_id DESC LIMIT 1",
+                (thread_id, checkpoint_ns)
+            ).fetchone()
+
+        if fila is None:
+            return None
+        return self._tuple(conn, thread_id, checkpoint_ns, fila)
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None
+    ) -> Iterator[CheckpointTuple]:
+        """
+        Lista checkpoints del más nuevo al más viejo (del thread indicado o de todos).
+        """
+        condiciones, parametros = [], []
+        if config:
+            condiciones.append("thread_id = ?")
+            parametros.append(config["configurable"]["thread_id"])
+            checkpoint_ns = config["configurable"].get("checkpoint_ns")
+            if checkpoint_ns is not None:
+                condiciones.append("checkpoint_ns = ?")
+                parametros.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                condiciones.append("checkpoint_id = ?")
+                parametros.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            condiciones.append("checkpoint_id < ?")
+            parametros.append(before_id)
+
+        where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+        conn = self._connection()
+        filas = conn.execute(
+            "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata "
+            f"FROM checkpoints {where} ORDER BY checkpoint_id DESC",
+            parametros
+        ).fetchall()
+
+        for thread_id, checkpoint_ns, *fila in filas:
+            if limit is not None and limit <= 0:
+                break
+            tupla = self._tuple(conn, thread_id, checkpoint_ns, fila)
+            if filter and not all(tupla.metadata.get(k) == v for k, v in filter.items()):
+                continue
+            if limit is not None:
+                limit -= 1
+            yield tupla
+
+    def _tuple(self, conn: sqlite3.Connection, thread_id: str, checkpoint_ns: str, fila) -> CheckpointTuple:
+        """Arma el CheckpointTuple de una fila (checkpoint, metadata y writes pendientes)."""
+        checkpoint_id, parent_checkpoint_id, tipo, checkpoint, metadata_tipo, metadata = fila
+        writes = conn.execute(
+            "SELECT task_id, channel, type, value FROM writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id)
+        ).fetchall()
+
+        return CheckpointTuple(
+            config={"configurable": {
+                "thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id
+            }},
+            checkpoint=self.serde.loads_typed((tipo, checkpoint)),
+            metadata=self.serde.loads_typed((metadata_tipo, metadata)),
+            parent_config=(
+                {"configurable": {
+                    "thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": parent_checkpoint_id
+                }}
+                if parent_checkpoint_id else None
+            ),
+            pending_writes=[
+                (task_id, channel, self.serde.loads_typed((tipo_valor, valor)))
+                for task_id, channel, tipo_valor, valor in writes
+            ]
+        )
+
+    # ──────────────────────────── Escritura ────────────────────────────
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions
+    ) -> RunnableConfig:
+        """
+        Guarda el checkpoint completo y recorta el historial del thread a los últimos N.
+        """
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        tipo, datos = self.serde.dumps_typed(checkpoint)
+        metadata_tipo, metadata_datos = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO checkpoints "
+                "(thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    thread_id, checkpoint_ns, checkpoint["id"], config["configurable"].get("checkpoint_id"),
+                    tipo, datos, metadata_tipo, metadata_datos
+                )
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO threads (thread_id, last_access) VALUES (?, ?)", (thread_id, time.time())
+            )
+            self._retener(conn, thread_id, checkpoint_ns)
+
+        self._maybe_maintain()
+
+        return {"configurable": {
+            "thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint["id"]
+        }}
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = ""
+    ) -> None:
+        """
+        Guarda las escrituras pendientes de una tarea (las especiales reemplazan, las normales no se duplican).
+        """
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+
+        filas = []
+        for idx, (channel, valor) in enumerate(writes):
+            tipo, datos = self.serde.dumps_typed(valor)
+            filas.append((
+                thread_id, checkpoint_ns, checkpoint_id, task_id, WRITES_IDX_MAP.get(channel, idx),
+                channel, tipo, datos, task_path
+            ))
+
+        # Igual que InMemorySaver: las escrituras especiales (índice negativo) pisan, las normales se ignoran si existen
+        sentencia = "INSERT OR REPLACE" if all(w[0] in WRITES_IDX_MAP for w in writes) else "INSERT OR IGNORE"
+        with self._transaction() as conn:
+            conn.executemany(
+                f"{sentencia} INTO writes "
+                "(thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, type, value, task_path) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                filas
+            )
+
+    def delete_thread(self, thread_id: str) -> None:
+        """
+        Elimina todos los checkpoints y escrituras del thread.
+        """
+        with self._transaction() as conn:
+            self._borrar_threads(conn, [thread_id])
+
+    # ─────────────────────────── Retención ───────────────────────────
+
+    def _retener(self, conn: sqlite3.Connection, thread_id: str, checkpoint_ns: str):
+        """Borra los checkpoints (y sus escrituras) más viejos que los últimos N del thread."""
+        if not self.max_checkpoints_per_thread:
+            return
+
+        corte = conn.execute(
+            "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+            "ORDER BY checkpoint_id DESC LIMIT 1 OFFSET ?",
+            (thread_id, checkpoint_ns, self.max_checkpoints_per_thread - 1)
+        ).fetchone()
+        if corte is None:
+            return
+
+        for tabla in ("checkpoints", "writes"):
+            conn.execute(
+                f"DELETE FROM {tabla} WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id < ?",
+                (thread_id, checkpoint_ns, corte[0])
+            )
+
+    @staticmethod
+    def _borrar_threads(conn: sqlite3.Connection, thread_ids):
+        """Borra todo lo asociado a los threads indicados."""
+        filas = [(thread_id,) for thread_id in thread_ids]
+        for tabla in ("checkpoints", "writes", "threads"):
+            conn.executemany(f"DELETE FROM {tabla} WHERE thread_id = ?", filas)
+
+    def _maybe_maintain(self):
+        """
+        Como máximo una vez por intervalo (coordinado entre procesos vía la tabla maintenance):
+        expulsa threads inactivos, libera páginas y trunca el WAL.
+        """
+        ahora = time.time()
+        # Chequeo local barato antes de tomar el lock de escritura compartido
+        if ahora - self._ultimo_mantenimiento < self.maintenance_interval_seconds:
+            return
+        self._ultimo_mantenimiento = ahora
+
+        with self._transaction() as conn:
+            fila = conn.execute("SELECT value FROM maintenance WHERE key = 'last_run'").fetchone()
+            if fila is not None and ahora - fila[0] < self.maintenance_interval_seconds:
+                return
+            conn.execute("INSERT OR REPLACE INTO maintenance (key, value) VALUES ('last_run', ?)", (ahora,))
+
+            if self.thread_ttl_seconds:
+                inactivos = [t for (t,) in conn.execute(
+                    "SELECT thread_id FROM threads WHERE last_access < ?", (ahora - self.thread_ttl_seconds,)
+                ).fetchall()]
+                self._borrar_threads(conn, inactivos)
+
+        self.vacuum()
+
+    def vacuum(self):
+        """
+        Devuelve al sistema las páginas libres (incremental si el archivo lo soporta) y trunca el WAL.
+        """
+        conn = self._connection()
+        try:
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+                # executescript ejecuta el pragma hasta el final (execute solo libera la primera página)
+                conn.executescript("PRAGMA incremental_vacuum;")
+            else:
+                conn.execute("VACUUM")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        except sqlite3.OperationalError as e:
+            # Otro proceso tiene la base ocupada: se reintenta en el próximo ciclo
+            print(f"Compactación del checkpointer pospuesta: {e}")
+
+    def get_stats(self) -> Dict:
+        """
+        Retorna cantidad de threads, checkpoints, escrituras y tamaño del archivo.
+        """
+        conn = self._connection()
+        contar = lambda tabla: conn.execute(f"SELECT COUNT(*) FROM {tabla}").fetchone()[0]
+        return {
+            "threads": contar("threads"),
+            "checkpoints": contar("checkpoints"),
+            "writes": contar("writes"),
+            "file_mb": os.path.getsize(self.path) / (1024 * 1024) if os.path.exists(self.path) else 0.0
+        }
+
+    # ──────────────────────────── Async ────────────────────────────
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None
+    ) -> AsyncIterator[CheckpointTuple]:
+        tuplas = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for tupla in tuplas:
+            yield tupla
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = ""
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
@@ -0,0 +1,217 @@
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# Pesos por defecto de cada criterio dentro de un grupo (interno/externo); RANKING_WEIGHTS los sobreescribe
+DEFAULT_WEIGHTS: Dict[str, float] = {"stock": 0.35, "lead_time": 0.25, "rating": 0.20, "precio": 0.20}
+
+MEDALLAS = ["🥇", "🥈", "🥉"]
+MEDALLA_RESTO = "🏅"
+
+# Umbrales de alertas (mismos que pide reranking_prompt.txt)
+LEAD_TIME_ALERTA_DIAS = 7
+PRECIO_ALERTA_FACTOR = 1.5
+
+SEPARADOR = "─" * 60
+
+PREGUNTA_FINAL = (
+    "¿Cómo deseas proceder? Indica los códigos que quieres ordenar con su cantidad opcional "
+    "(ej. 'R-0001 x5' o '3 unidades del R-0002'), responde 'confirmar' para avanzar con todas las opciones "
+    "o 'cancelar' si no deseas hacer el pedido. Si no indicas cantidad se asume 1 unidad."
+)
+
+
+def parse_weights(texto: Optional[str]) -> Dict[str, float]:
+    """
+    Parsea pesos con formato 'stock=0.4,lead_time=0.3,...'; los criterios no indicados usan el valor por defecto.
+    """
+    pesos = dict(DEFAULT_WEIGHTS)
+    if not texto:
+        return pesos
+
+    for par in texto.split(","):
+        if "=" not in par:
+            continue
+        clave, valor = (p.strip() for p in par.split("=", 1))
+        if clave not in pesos:
+            raise ValueError(f"Criterio de ranking '{clave}' no soportado. Opciones: {list(DEFAULT_WEIGHTS)}")
+        pesos[clave] = float(valor)
+    return pesos
+
+
+RANKING_WEIGHTS = parse_weights(os.getenv("RANKING_WEIGHTS"))
+
+
+def _columna(opciones: List[Dict], campo: str) -> np.ndarray:
+    """Columna numérica float64 (NaN si el campo falta o no es numérico)."""
+    valores = []
+    for opcion in opciones:
+        try:
+            valores.append(float(opcion.get(campo)))
+        except (TypeError, ValueError):
+            valores.append(np.nan)
+    return np.array(valores, dtype=np.float64)
+
+
+def _inverso_min_max(valores: np.ndarray) -> np.ndarray:
+    """Escala a [0, 1] donde el menor valor vale 1 (todos iguales → 1, faltantes → 0)."""
+    if np.all(np.isnan(valores)):
+        return np.zeros_like(valores)
+    minimo, maximo = np.nanmin(valores), np.nanmax(valores)
+    if maximo == minimo:
+        escalado = np.ones_like(valores)
+    else:
+        escalado = (maximo - valores) / (maximo - minimo)
+    return np.nan_to_num(escalado, nan=0.0)
+
+
+def score_options(opciones: List[Dict], cantidad: int = 1, pesos: Optional[Dict[str, float]] = None) -> List[Dict]:
+    """
+    Puntúa y ordena las opciones de un producto: internas siempre primero y, dentro de cada grupo,
+    por stock, lead time, rating y precio ponderados. Retorna copias con 'puntaje' en orden de ranking.
+    """
+    if not opciones:
+        return []
+
+    pesos = pesos or RANKING_WEIGHTS
+    cantidad = max(1, int(cantidad or 1))
+
+    interno = np.array([o.get("tipo") == "INTERNO" for o in opciones])
+    stock = _columna(opciones, "stock_disponible")
+    lead_time = _columna(opciones, "lead_time_dias")
+    rating = _columna(opciones, "proveedor_rating")
+    precio = _columna(opciones, "costo_unitario")
+
+    # Cobertura del pedido; las ofertas externas no informan stock y se consideran disponibles a pedido
+    f_stock = np.where(np.isnan(stock), 1.0, np.clip(np.nan_to_num(stock) / cantidad, 0.0, 1.0))
+    f_rating = np.nan_to_num(rating / 5.0, nan=0.0)
+
+    # Lead time y precio se comparan dentro del mismo grupo (interno/externo)
+    f_lead_time = np.zeros(len(opciones))
+    f_precio = np.zeros(len(opciones))
+    for grupo in (interno, ~interno):
+        if grupo.any():
+            f_lead_time[grupo] = _inverso_min_max(lead_time[grupo])
+            f_precio[grupo] = _inverso_min_max(precio[grupo])
+
+    puntaje = (
+        pesos["stock"] * f_stock
+        + pesos["lead_time"] * f_lead_time
+        + pesos["rating"] * f_rating
+        + pesos["precio"] * f_precio
+    )
+    # Redondeo para que el orden no dependa de ruido de punto flotante
+    puntaje = np.round(puntaje, 6)
+
+    # Orden determinista: grupo, puntaje desc, precio asc, código y proveedor (lexsort usa la última clave como primaria)
+    orden = np.lexsort((
+        np.array([str(o.get("proveedor_nombre", "")) for o in opciones]),
+        np.array([str(o.get("id_repuesto", "")) for o in opciones]),
+        np.nan_to_num(precio, nan=np.inf),
+        -puntaje,
+        ~interno
+    ))
+
+    return [{**opciones[i], "puntaje": float(puntaje[i])} for i in orden]
+
+
+def _precio(valor) -> str:
+    """Precio con dos decimales (o tal cual si no es numérico)."""
+    try:
+        return f"${float(valor):.2f}"
+    except (TypeError, ValueError):
+        return f"${valor}"
+
+
+def _razon(opcion: Dict, cantidad: int, ranking: List[Dict]) -> str:
+    """Razón breve de la mejor opción a partir de los criterios donde destaca."""
+    partes = []
+    stock = opcion.get("stock_disponible")
+    if opcion.get("tipo") == "INTERNO":
+        if stock is not None and stock >= cantidad:
+            partes.append("stock interno suficiente")
+        else:
+            partes.append("disponible en almacén propio")
+    if opcion.get("lead_time_dias") is not None and opcion["lead_time_dias"] == min(
+        o.get("lead_time_dias", np.inf) for o in ranking
+    ):
+        partes.append(f"entrega más rápida ({opcion['lead_time_dias']} días)")
+    precios = [o["costo_unitario"] for o in ranking if o.get("costo_unitario") is not None]
+    if precios and opcion.get("costo_unitario") == min(precios):
+        partes.append("mejor precio")
+    if opcion.get("proveedor_rating") is not None and opcion["proveedor_rating"] >= 4:
+        partes.append(f"proveedor con rating {opcion['proveedor_rating']}/5")
+
+    return ", ".join(partes).capitalize() if partes else "Mejor balance entre disponibilidad y costo"
+
+
+def _alertas(ranking: List[Dict], cantidad: int) -> List[str]:
+    """Alertas de stock insuficiente, entrega larga o precio alto respecto de la opción más barata."""
+    alertas = []
+    precios = [o["costo_unitario"] for o in ranking if o.get("costo_unitario") is not None]
+    precio_minimo = min(precios) if precios else None
+
+    for opcion in ranking:
+        codigo = opcion.get("id_repuesto", "N/A")
+        proveedor = opcion.get("proveedor_nombre", "N/A")
+        stock = opcion.get("stock_disponible")
+        lead_time = opcion.get("lead_time_dias")
+        precio = opcion.get("costo_unitario")
+
+        if opcion.get("tipo") == "INTERNO" and stock is not None and stock < cantidad:
+            alertas.append(f"{codigo} ({proveedor}): stock insuficiente {stock}/{cantidad}")
+        if lead_time is not None and lead_time > LEAD_TIME_ALERTA_DIAS:
+            alertas.append(f"{codigo} ({proveedor}): entrega larga de {lead_time} días")
+        if precio_minimo and precio is not None and precio > precio_minimo * PRECIO_ALERTA_FACTOR:
+            alertas.append(f"{codigo} ({proveedor}): precio alto ({_precio(precio)} vs {_precio(precio_minimo)})")
+    return alertas
+
+
+def format_ranking(producto_label: str, ranking: List[Dict], cantidad: int = 1) -> str:
+    """
+    Formatea el ranking de un producto con el estilo de medallas de reranking_prompt.txt.
+    """
+    texto = f"**{producto_label}** (cantidad: {cantidad})\n\n"
+
+    for posicion, opcion in enumerate(ranking):
+        medalla = MEDALLAS[posicion] if posicion < len(MEDALLAS) else MEDALLA_RESTO
+        codigo = opcion.get("id_repuesto", "N/A")
+        descripcion = opcion.get("repuesto_descripcion", "N/A")
+        proveedor = opcion.get("proveedor_nombre", "N/A")
+        precio = _precio(opcion.get("costo_unitario", "N/A"))
+        lead_time = opcion.get("lead_time_dias", "N/A")
+        encabezado = f"{medalla} [{codigo}][{descripcion}][{proveedor}] ({opcion.get('tipo')})"
+
+        if posicion == 0:
+            stock = opcion.get("stock_disponible")
+            texto += f"{encabezado}\n"
+            texto += f"    • Precio: {precio} | Stock: {stock if stock is not None else 'a pedido'} | Entrega: {lead_time} días\n"
+            texto += f"    • ✅ {_razon(opcion, cantidad, ranking)}\n"
+        elif opcion.get("tipo") == "INTERNO":
+            texto += f"{encabezado} - {precio} - [Stock: {opcion.get('stock_disponible', 'N/A')}/Entrega: {lead_time} días]\n"
+        else:
+            texto += f"{encabezado} - {precio} - [Entrega: {lead_time} días]\n"
+
+    alertas = _alertas(ranking, cantidad)
+    if alertas:
+        texto += "\n⚠️ Alertas: " + "; ".join(alertas) + "\n"
+
+    texto += f"\n{SEPARADOR}\n"
+    return texto
+
+
+def build_ranking_text(productos: List[Dict], pesos: Optional[Dict[str, float]] = None) -> str:
+    """
+    Genera el ranking completo para una lista de {label, cantidad, opciones} más la pregunta final.
+    """
+    secciones = []
+    for producto in productos:
+        ranking = score_options(producto["opciones"], producto.get("cantidad", 1), pesos)
+        if ranking:
+            secciones.append(format_ranking(producto["label"], ranking, producto.get("cantidad", 1)))
+
+    if not secciones:
+        return "No hay opciones disponibles."
+
+    return "\n".join(secciones) + f"\n{PREGUNTA_FINAL}"
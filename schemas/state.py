@@ -14,6 +14,7 @@ class AgentState(TypedDict):
     repuestos_encontrados: Optional[List[Repuesto]]  # Lista de objetos Repuesto con todas las variantes
     productos_sin_match_interno: Optional[List[Dict]]  # Productos que no se encontraron internamente
     info_completa: bool  # Si tenemos toda la información necesaria
+    verificaciones_productos: Optional[Dict[str, Dict]]  # Memo de la sesión: {descripción normalizada: {completa, razon, faltante}}
 
     # Query optimizada para búsqueda semántica
     optimized_query: Optional[str]  # Query reformulada por el LLM
@@ -27,6 +28,9 @@ class AgentState(TypedDict):
     # Resultados de la búsqueda externa (agrupados por índice de producto solicitado)
     resultados_externos: Optional[Dict[int, List[Dict]]]
 
+    # Ofertas externas precargadas en modo de búsqueda unificado: {"por_producto": {idx: [...]}, "por_codigo": {codigo: [...]}}
+    prefetch_externos: Optional[Dict]
+
     # Análisis de disponibilidad por código
     disponibilidad: Optional[Dict[str, str]]  # {"R-0001": "full", "R-0002": "none"}
     codigos_para_externos: Optional[List[str]]
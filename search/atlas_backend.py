@@ -0,0 +1,412 @@
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+from pymongo.collection import Collection
+from pymongo.operations import SearchIndexModel
+
+from db.mongo import MongoCollectionManager, parts_collection_name
+from search.backend import SearchBackend
+
+VECTOR_INDEX_NAME = "vector_index_repuestos"
+VECTOR_PATH = "embedding_vector"
+EMBEDDING_DIMENSIONS = 384
+
+# $vectorSearch dentro de $unionWith (búsqueda unificada) requiere MongoDB/Atlas 8.0 o superior
+UNIFIED_MIN_SERVER_VERSION = (8, 0)
+
+# Tope de numCandidates al ensanchar la búsqueda (Atlas admite hasta 10000)
+MAX_NUM_CANDIDATES = int(os.getenv("VECTOR_SEARCH_MAX_CANDIDATES", "1000"))
+
+# Definición del índice vectorial sobre la collection de partes (un vector por hash de contenido):
+# proveedor_tipos (tipos de las ofertas de la parte) declarado como campo de filtro
+VECTOR_INDEX_DEFINITION = {
+    "fields": [
+        {
+            "type": "vector",
+            "path": VECTOR_PATH,
+            "numDimensions": EMBEDDING_DIMENSIONS,
+            "similarity": "cosine"
+        },
+        {"type": "filter", "path": "proveedor_tipos"}
+    ]
+}
+
+
+def ensure_vector_index(collection: Collection):
+    """
+    Crea el índice vectorial de la collection de partes con sus campos de filtro o actualiza su definición si ya existe.
+    """
+    existentes = {idx["name"]: idx for idx in collection.list_search_indexes()}
+
+    if VECTOR_INDEX_NAME not in existentes:
+        collection.create_search_index(
+            SearchIndexModel(definition=VECTOR_INDEX_DEFINITION, name=VECTOR_INDEX_NAME, type="vectorSearch")
+        )
+        print(f"Índice vectorial '{VECTOR_INDEX_NAME}' creado (filtro: proveedor_tipos).")
+    elif existentes[VECTOR_INDEX_NAME].get("latestDefinition") != VECTOR_INDEX_DEFINITION:
+        collection.update_search_index(VECTOR_INDEX_NAME, VECTOR_INDEX_DEFINITION)
+        print(f"Índice vectorial '{VECTOR_INDEX_NAME}' actualizado con campos de filtro.")
+
+
+def wait_for_vector_index(collection: Collection, timeout_s: float, intervalo_s: float = 5.0):
+    """
+    Espera a que el índice vectorial de la collection quede consultable (queryable); TimeoutError si no ocurre en timeout_s.
+    """
+    limite = time.monotonic() + timeout_s
+    while True:
+        indice = next(iter(collection.list_search_indexes(VECTOR_INDEX_NAME)), None)
+        if indice and indice.get("queryable") and indice.get("status", "READY") == "READY":
+            return
+        if time.monotonic() >= limite:
+            estado = indice.get("status") if indice else "inexistente"
+            raise TimeoutError(
+                f"El índice vectorial de '{collection.name}' no quedó listo en {timeout_s:.0f}s (estado: {estado})"
+            )
+        time.sleep(intervalo_s)
+
+
+class AtlasVectorSearchBackend(SearchBackend):
+    """
+    Backend sobre MongoDB Atlas: `$vectorSearch` en `vector_index_repuestos` sobre la collection de partes
+    (un vector por contenido único) unido con sus ofertas por embedding_hash, y `$match` por código sobre las ofertas.
+    Los métodos `a*` usan el AsyncMongoClient de MongoCollectionManager con los mismos pipelines.
+    """
+    name = "atlas"
+    # Si el servidor admite $vectorSearch dentro de $unionWith (se consulta una vez por proceso)
+    _union_vectorial: Optional[bool] = None
+
+    def catalog_version(self) -> str:
+        """Versión registrada en catalog_meta por el script de carga."""
+        return str(MongoCollectionManager().get_catalog_version())
+
+    def vector_search(
+        self,
+        query_vector: List[float],
+        campos: List[str],
+        limit: int = 5,
+        num_candidates: int = 100,
+        proveedor_tipo: Optional[str] = None,
+        stock_minimo: Optional[int] = None,
+        min_score: Optional[float] = None
+    ) -> List[Dict]:
+        """
+        Ejecuta `$vectorSearch` con pre-filtro en el índice. Si el filtro de ofertas (tipo/stock) deja menos de
+        `limit` resultados válidos (score >= min_score), duplica la cantidad de partes pedidas y numCandidates
+        hasta completarlos, agotar el conjunto filtrado, caer bajo min_score o alcanzar MAX_NUM_CANDIDATES.
+        """
+        ofertas = MongoCollectionManager().get_collection()
+        partes = ofertas.database[parts_collection_name(ofertas.name)]
+        limite_partes = limit
+        candidatos = max(num_candidates, limit)
+
+        while True:
+            pipeline = self._vector_search_pipeline(
+                query_vector, campos, limit, candidatos, proveedor_tipo, stock_minimo, ofertas.name,
+                limite_partes=limite_partes
+            )
+            resultados, ensanchar = self._recortar(list(partes.aggregate(pipeline)), limit, limite_partes, candidatos, min_score)
+
+            if not ensanchar:
+                return resultados
+            candidatos = min(candidatos * 2, MAX_NUM_CANDIDATES)
+            limite_partes = min(limite_partes * 2, candidatos)
+
+    async def avector_search(
+        self,
+        query_vector: List[float],
+        campos: List[str],
+        limit: int = 5,
+        num_candidates: int = 100,
+        proveedor_tipo: Optional[str] = None,
+        stock_minimo: Optional[int] = None,
+        min_score: Optional[float] = None
+    ) -> List[Dict]:
+        """
+        Versión async de vector_search (misma lógica de ensanchado) sobre el cliente async.
+        """
+        ofertas = await MongoCollectionManager().get_async_collection()
+        partes = ofertas.database[parts_collection_name(ofertas.name)]
+        limite_partes = limit
+        candidatos = max(num_candidates, limit)
+
+        while True:
+            pipeline = self._vector_search_pipeline(
+                query_vector, campos, limit, candidatos, proveedor_tipo, stock_minimo, ofertas.name,
+                limite_partes=limite_partes
+            )
+            cursor = await partes.aggregate(pipeline)
+            resultados, ensanchar = self._recortar(await cursor.to_list(None), limit, limite_partes, candidatos, min_score)
+
+            if not ensanchar:
+                return resultados
+            candidatos = min(candidatos * 2, MAX_NUM_CANDIDATES)
+            limite_partes = min(limite_partes * 2, candidatos)
+
+    def find_by_codes(
+        self,
+        codigos: List[str],
+        campos: List[str],
+        proveedor_tipo: Optional[str] = None
+    ) -> List[Dict]:
+        """
+        Busca todos los códigos en una sola consulta `$match` + `$in` (cubierta por el índice compuesto
+        (id_repuesto, proveedor_tipo) que asegura MongoCollectionManager).
+        """
+        pipeline = self._find_by_codes_pipeline(codigos, campos, proveedor_tipo)
+        return list(MongoCollectionManager().get_collection().aggregate(pipeline))
+
+    async def afind_by_codes(
+        self,
+        codigos: List[str],
+        campos: List[str],
+        proveedor_tipo: Optional[str] = None
+    ) -> List[Dict]:
+        """
+        Versión async de find_by_codes sobre el cliente async.
+        """
+        pipeline = self._find_by_codes_pipeline(codigos, campos, proveedor_tipo)
+        ofertas = await MongoCollectionManager().get_async_collection()
+        cursor = await ofertas.aggregate(pipeline)
+        return await cursor.to_list(None)
+
+    def unified_search(
+        self,
+        query_vectors: List[List[float]],
+        campos_internos: List[str],
+        campos_externos: List[str],
+        limit: int = 5,
+        num_candidates: int = 100
+    ) -> List[Dict]:
+        """
+        Resuelve internos, externos y ofertas externas por código de todas las queries en UN solo aggregate:
+        una rama `$vectorSearch` por (query, tipo) encadenada con `$unionWith`, y `$lookup` por id_repuesto
+        en las ramas internas. La separación por query/tipo se hace en el cliente. Con un servidor anterior a
+        MongoDB 8.0 (sin $vectorSearch en $unionWith) compone vector_search/find_by_codes por query.
+        """
+        if not query_vectors:
+            return []
+
+        ofertas = MongoCollectionManager().get_collection()
+        if self._union_vectorial is None:
+            self._registrar_version_servidor(ofertas.database.client.server_info())
+        if not self._union_vectorial:
+            return super().unified_search(query_vectors, campos_internos, campos_externos, limit, num_candidates)
+        partes = ofertas.database[parts_collection_name(ofertas.name)]
+        pipeline = self._unified_pipeline(
+            ofertas.name, partes.name, query_vectors, campos_internos, campos_externos, limit, num_candidates
+        )
+        return self._separar_unificado(partes.aggregate(pipeline), len(query_vectors))
+
+    async def aunified_search(
+        self,
+        query_vectors: List[List[float]],
+        campos_internos: List[str],
+        campos_externos: List[str],
+        limit: int = 5,
+        num_candidates: int = 100
+    ) -> List[Dict]:
+        """
+        Versión async de unified_search sobre el cliente async (misma verificación de versión del servidor).
+        """
+        if not query_vectors:
+            return []
+
+        ofertas = await MongoCollectionManager().get_async_collection()
+        if self._union_vectorial is None:
+            self._registrar_version_servidor(await ofertas.database.client.server_info())
+        if not self._union_vectorial:
+            return await super().aunified_search(query_vectors, campos_internos, campos_externos, limit, num_candidates)
+        partes = ofertas.database[parts_collection_name(ofertas.name)]
+        pipeline = self._unified_pipeline(
+            ofertas.name, partes.name, query_vectors, campos_internos, campos_externos, limit, num_candidates
+        )
+        cursor = await partes.aggregate(pipeline)
+        return self._separar_unificado(await cursor.to_list(None), len(query_vectors))
+
+    def _registrar_version_servidor(self, server_info: Dict):
+        """
+        Registra si la versión del servidor (buildInfo) admite $vectorSearch dentro de $unionWith.
+        """
+        version = tuple(server_info.get("versionArray", [0, 0])[:2])
+        self._union_vectorial = version >= UNIFIED_MIN_SERVER_VERSION
+        if not self._union_vectorial:
+            print(
+                f"⚠️  MongoDB {server_info.get('version', '?')} no admite $vectorSearch en $unionWith "
+                f"(requiere {'.'.join(map(str, UNIFIED_MIN_SERVER_VERSION))}+): la búsqueda unificada usa consultas por producto."
+            )
+
+    # ─────────────────────────── Construcción de pipelines ───────────────────────────
+
+    @staticmethod
+    def _vector_search_pipeline(
+        query_vector: List[float],
+        campos: List[str],
+        limit: int,
+        num_candidates: int,
+        proveedor_tipo: Optional[str],
+        stock_minimo: Optional[int],
+        ofertas_collection: str,
+        limite_partes: Optional[int] = None
+    ) -> List[Dict]:
+        """
+        Pipeline `$vectorSearch` sobre las partes (pre-filtro opcional por proveedor_tipo) que une cada parte con
+        sus ofertas (filtradas por tipo y stock) y retorna hasta `limit` ofertas con el score de su parte.
+        Con `limite_partes` pide esa cantidad de partes, no recorta a `limit` y conserva como fila {_parte, score}
+        (sin _id) cada parte sin ofertas que pasen el filtro: el llamador recorta y sabe si el conjunto se agotó.
+        """
+        filtro_ofertas = {}
+        if proveedor_tipo is not None:
+            filtro_ofertas["proveedor_tipo"] = proveedor_tipo
+        if stock_minimo is not None:
+            filtro_ofertas["stock_disponible"] = {"$gte": stock_minimo}
+
+        vector_search = {
+            "index": VECTOR_INDEX_NAME,
+            "path": VECTOR_PATH,
+            "queryVector": query_vector,
+            "numCandidates": num_candidates,
+            "limit": limite_partes or limit
+        }
+        if proveedor_tipo is not None:
+            vector_search["filter"] = {"proveedor_tipos": {"$eq": proveedor_tipo}}
+
+        etapas = [
+            {"$vectorSearch": vector_search},
+            {"$project": {"score": {"$meta": "vectorSearchScore"}}},
+            {
+                "$lookup": {
+                    "from": ofertas_collection,
+                    "localField": "_id",
+                    "foreignField": "embedding_hash",
+                    "pipeline": [
+                        {"$match": filtro_ofertas},
+                        {"$project": {campo: 1 for campo in campos}}
+                    ],
+                    "as": "_ofertas"
+                }
+            }
+        ]
+
+        if limite_partes is None:
+            # Una fila por oferta, en el orden de score de su parte
+            return etapas + [
+                {"$unwind": "$_ofertas"},
+                {"$replaceRoot": {"newRoot": {"$mergeObjects": ["$_ofertas", {"score": "$score"}]}}},
+                {"$limit": limit}
+            ]
+
+        return etapas + [
+            {"$unwind": {"path": "$_ofertas", "preserveNullAndEmptyArrays": True}},
+            {"$replaceRoot": {"newRoot": {"$mergeObjects": ["$_ofertas", {"score": "$score", "_parte": "$_id"}]}}}
+        ]
+
+    @staticmethod
+    def _recortar(
+        filas: List[Dict],
+        limit: int,
+        limite_partes: int,
+        candidatos: int,
+        min_score: Optional[float]
+    ) -> Tuple[List[Dict], bool]:
+        """
+        Recorta las filas de un pipeline con `limite_partes` a las primeras `limit` ofertas y decide si ensanchar:
+        solo si faltan ofertas válidas, Atlas devolvió todas las partes pedidas (el conjunto filtrado no se agotó),
+        la última parte aún supera min_score (más partes solo traen scores menores) y no se llegó al tope.
+        """
+        partes = set()
+        ofertas = []
+        for fila in filas:
+            partes.add(fila.pop("_parte"))
+            if "_id" in fila:
+                ofertas.append(fila)
+
+        validas = [r for r in ofertas if min_score is None or r.get("score", 0) >= min_score]
+        ultimo_score = filas[-1].get("score", 0) if filas else 0
+        ensanchar = (
+            len(validas) < limit
+            and len(partes) >= limite_partes
+            and (min_score is None or ultimo_score >= min_score)
+            and candidatos < MAX_NUM_CANDIDATES
+        )
+        return ofertas[:limit], ensanchar
+
+    @staticmethod
+    def _find_by_codes_pipeline(codigos: List[str], campos: List[str], proveedor_tipo: Optional[str]) -> List[Dict]:
+        """Pipeline `$match` + `$in` por código."""
+        filtro = {"id_repuesto": {"$in": list(codigos)}}
+        if proveedor_tipo is not None:
+            filtro["proveedor_tipo"] = proveedor_tipo
+
+        return [
+            {"$match": filtro},
+            {"$project": {campo: 1 for campo in campos}}
+        ]
+
+    @classmethod
+    def _unified_pipeline(
+        cls,
+        ofertas_collection: str,
+        partes_collection: str,
+        query_vectors: List[List[float]],
+        campos_internos: List[str],
+        campos_externos: List[str],
+        limit: int,
+        num_candidates: int
+    ) -> List[Dict]:
+        """
+        Una rama por (query, tipo) sobre las partes, etiquetada con `_consulta`/`_rama`, unidas con `$unionWith`.
+        """
+        def rama(i: int, query_vector: List[float], proveedor_tipo: str) -> List[Dict]:
+            campos = campos_internos if proveedor_tipo == "INTERNAL" else campos_externos
+            etapas = cls._vector_search_pipeline(
+                query_vector, campos, limit, max(num_candidates, limit), proveedor_tipo, None, ofertas_collection
+            )
+            etapas.append({"$addFields": {"_consulta": i, "_rama": proveedor_tipo}})
+            if proveedor_tipo == "INTERNAL":
+                etapas.append({
+                    "$lookup": {
+                        "from": ofertas_collection,
+                        "localField": "id_repuesto",
+                        "foreignField": "id_repuesto",
+                        "pipeline": [
+                            {"$match": {"proveedor_tipo": "EXTERNAL"}},
+                            {"$project": {campo: 1 for campo in campos_externos}}
+                        ],
+                        "as": "_ofertas_externas"
+                    }
+                })
+            return etapas
+
+        ramas = [
+            rama(i, query_vector, proveedor_tipo)
+            for i, query_vector in enumerate(query_vectors)
+            for proveedor_tipo in ("INTERNAL", "EXTERNAL")
+        ]
+        return ramas[0] + [
+            {"$unionWith": {"coll": partes_collection, "pipeline": etapas}} for etapas in ramas[1:]
+        ]
+
+    @staticmethod
+    def _separar_unificado(documentos, cantidad_consultas: int) -> List[Dict]:
+        """Reparte los documentos del aggregate unificado por query y tipo."""
+        resultados = [
+            {"internos": [], "externos": [], "externos_por_codigo": {}} for _ in range(cantidad_consultas)
+        ]
+        for documento in documentos:
+            consulta = resultados[documento.pop("_consulta")]
+            proveedor_tipo = documento.pop("_rama")
+            ofertas_externas = documento.pop("_ofertas_externas", [])
+
+            if proveedor_tipo == "INTERNAL":
+                consulta["internos"].append(documento)
+                consulta["externos_por_codigo"].setdefault(documento.get("id_repuesto"), ofertas_externas)
+            else:
+                consulta["externos"].append(documento)
+
+        # $unionWith no garantiza orden entre ramas: reordenar por score dentro de cada una
+        for consulta in resultados:
+            consulta["internos"].sort(key=lambda r: r.get("score", 0), reverse=True)
+            consulta["externos"].sort(key=lambda r: r.get("score", 0), reverse=True)
+
+        return resultados
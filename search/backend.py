@@ -0,0 +1,99 @@
+import asyncio
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+
+class SearchBackend(ABC):
+    """
+    Interfaz común de búsqueda sobre el catálogo de repuestos (vectorial y por código).
+    """
+    name: str = "base"
+
+    @abstractmethod
+    def vector_search(
+        self,
+        query_vector: List[float],
+        campos: List[str],
+        limit: int = 5,
+        num_candidates: int = 100,
+        proveedor_tipo: Optional[str] = None,
+        stock_minimo: Optional[int] = None,
+        min_score: Optional[float] = None
+    ) -> List[Dict]:
+        """
+        Retorna los `limit` documentos más similares que cumplen los filtros (pre-filtro, no post-filtro),
+        con `score` coseno en escala Atlas 0..1 y proyectados a `campos`. `min_score` indica qué resultados
+        cuentan como válidos al decidir si ensanchar la búsqueda.
+        """
+
+    @abstractmethod
+    def find_by_codes(
+        self,
+        codigos: List[str],
+        campos: List[str],
+        proveedor_tipo: Optional[str] = None
+    ) -> List[Dict]:
+        """
+        Retorna los documentos cuyo id_repuesto está en `codigos` (opcionalmente filtrados por proveedor_tipo).
+        """
+
+    def catalog_version(self) -> str:
+        """
+        Identificador de la versión del catálogo servido; cambia cuando el catálogo se recarga.
+        """
+        return "0"
+
+    def unified_search(
+        self,
+        query_vectors: List[List[float]],
+        campos_internos: List[str],
+        campos_externos: List[str],
+        limit: int = 5,
+        num_candidates: int = 100
+    ) -> List[Dict]:
+        """
+        Trae ofertas internas y externas de todos los productos del turno. Por cada query retorna
+        {"internos": [...], "externos": [...], "externos_por_codigo": {codigo: [...]}}, donde
+        externos_por_codigo son las ofertas EXTERNAL de los códigos hallados internamente.
+        Implementación por defecto: compone vector_search/find_by_codes (backends en proceso).
+        """
+        resultados = []
+        for query_vector in query_vectors:
+            internos = self.vector_search(
+                query_vector, campos_internos, limit=limit, num_candidates=num_candidates, proveedor_tipo="INTERNAL"
+            )
+            externos = self.vector_search(
+                query_vector, campos_externos, limit=limit, num_candidates=num_candidates, proveedor_tipo="EXTERNAL"
+            )
+
+            codigos = list(dict.fromkeys(r.get("id_repuesto") for r in internos))
+            externos_por_codigo = defaultdict(list)
+            for documento in self.find_by_codes(codigos, campos_externos, proveedor_tipo="EXTERNAL"):
+                externos_por_codigo[documento.get("id_repuesto")].append(documento)
+
+            resultados.append({
+                "internos": internos,
+                "externos": externos,
+                "externos_por_codigo": dict(externos_por_codigo)
+            })
+
+        return resultados
+
+    async def avector_search(self, *args, **kwargs) -> List[Dict]:
+        """
+        Versión async de vector_search; por defecto delega la llamada síncrona a un hilo.
+        """
+        return await asyncio.to_thread(self.vector_search, *args, **kwargs)
+
+    async def afind_by_codes(self, *args, **kwargs) -> List[Dict]:
+        """
+        Versión async de find_by_codes; por defecto delega la llamada síncrona a un hilo.
+        """
+        return await asyncio.to_thread(self.find_by_codes, *args, **kwargs)
+
+    async def aunified_search(self, *args, **kwargs) -> List[Dict]:
+        """
+        Versión async de unified_search; por defecto delega la llamada síncrona a un hilo.
+        """
+        return await asyncio.to_thread(self.unified_search, *args, **kwargs)
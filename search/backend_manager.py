@@ -0,0 +1,90 @@
+import os
+import threading
+import time
+from typing import Optional
+
+from search.backend import SearchBackend
+
+# Cada cuántos segundos se vuelve a consultar la versión del catálogo
+CATALOG_VERSION_CHECK_S = float(os.getenv("CATALOG_VERSION_CHECK_S", "30"))
+
+
+class SearchBackendManager:
+    """
+    Singleton que elige y retiene el backend de búsqueda ('atlas' o 'numpy') usado por los nodos de búsqueda.
+    """
+    _instance = None
+    _backend: Optional[SearchBackend] = None
+    _lock = threading.Lock()
+    _catalog_version: Optional[str] = None
+    _catalog_version_checked_at: float = 0.0
+
+    def __new__(cls, *args, **kwargs):
+        """Asegura que solo se cree una instancia de la clase."""
+        if cls._instance is None:
+            cls._instance = super(SearchBackendManager, cls).__new__(cls)
+        return cls._instance
+
+    def initialize(self, backend_name: Optional[str] = None):
+        """
+        Crea el backend indicado (o SEARCH_BACKEND del entorno, por defecto 'atlas'); solo en la primera llamada.
+        """
+        with self._lock:
+            if self._backend is not None:
+                print(f"Backend de búsqueda '{self._backend.name}' ya inicializado. Usando la instancia existente.")
+                return
+
+            backend_name = (backend_name or os.getenv("SEARCH_BACKEND", "atlas")).lower()
+            print(f"Inicializando backend de búsqueda '{backend_name}'...")
+
+            if backend_name == "atlas":
+                from db.mongo import MongoCollectionManager
+                from search.atlas_backend import AtlasVectorSearchBackend
+
+                MongoCollectionManager().initialize()
+                self._backend = AtlasVectorSearchBackend()
+
+            elif backend_name == "numpy":
+                from search.numpy_backend import NumpyVectorSearchBackend
+
+                # Fuente del catálogo: 'csv' (por defecto, no requiere Atlas) o 'mongo' (snapshot)
+                source = os.getenv("NUMPY_BACKEND_SOURCE", "csv").lower()
+                if source == "mongo":
+                    self._backend = NumpyVectorSearchBackend.from_mongo()
+                else:
+                    self._backend = NumpyVectorSearchBackend.from_csv(os.getenv("CATALOG_CSV", "repuestos.csv"))
+
+            else:
+                raise ValueError(f"Backend de búsqueda '{backend_name}' no soportado. Opciones: 'atlas', 'numpy'.")
+
+    def get_backend(self) -> SearchBackend:
+        """
+        Retorna el backend activo; lo inicializa con la configuración del entorno si aún no existe.
+        """
+        if self._backend is None:
+            self.initialize()
+
+        if self._backend is None:
+            raise RuntimeError("El backend de búsqueda no pudo ser inicializado. Revisa la configuración.")
+
+        return self._backend
+
+    def get_catalog_version(self) -> Optional[str]:
+        """
+        Retorna la versión del catálogo del backend activo (consultada como máximo cada CATALOG_VERSION_CHECK_S)
+        o None si aún no hay backend inicializado.
+        """
+        if self._backend is None:
+            return None
+
+        ahora = time.monotonic()
+        if self._catalog_version is None or ahora - self._catalog_version_checked_at > CATALOG_VERSION_CHECK_S:
+            try:
+                self._catalog_version = self._backend.catalog_version()
+            except Exception as e:
+                print(f"No se pudo leer la versión del catálogo: {e}")
+                if self._catalog_version is None:
+                    return None
+            self._catalog_version_checked_at = ahora
+
+        return self._catalog_version
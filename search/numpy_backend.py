@@ -0,0 +1,197 @@
+import hashlib
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from search.backend import SearchBackend
+
+
+class NumpyVectorSearchBackend(SearchBackend):
+    """
+    Motor vectorial exacto en proceso: una fila float32 normalizada por parte (contenido único) y top-k de ofertas
+    por producto matricial; cada oferta toma la similitud de su parte.
+    """
+    name = "numpy"
+
+    def __init__(self, documentos: List[Dict], embeddings, catalog_version: str = "0", parte_de_oferta=None):
+        """
+        `embeddings` tiene una fila por parte y `parte_de_oferta[i]` es la fila de la oferta i
+        (por defecto, una fila por oferta).
+        """
+        matriz = np.asarray(embeddings, dtype=np.float32)
+        if parte_de_oferta is None:
+            parte_de_oferta = np.arange(len(documentos))
+        self._parte_de_oferta = np.asarray(parte_de_oferta, dtype=np.int64)
+        if matriz.ndim != 2 or len(self._parte_de_oferta) != len(documentos) or (
+            len(documentos) and self._parte_de_oferta.max() >= matriz.shape[0]
+        ):
+            raise ValueError("La matriz de embeddings no coincide con la cantidad de documentos.")
+
+        # Normalizar filas: el producto punto pasa a ser similitud coseno
+        normas = np.linalg.norm(matriz, axis=1, keepdims=True)
+        normas[normas == 0] = 1.0
+        self._matrix = matriz / normas
+
+        self._documentos = documentos
+        self._catalog_version = catalog_version
+        self._tipos = np.array([d.get("proveedor_tipo") for d in documentos], dtype=object)
+        self._stock = np.array([d.get("stock_disponible", 0) or 0 for d in documentos], dtype=np.int64)
+
+        self._indices_por_codigo: Dict[str, List[int]] = defaultdict(list)
+        for i, d in enumerate(documentos):
+            self._indices_por_codigo[d.get("id_repuesto")].append(i)
+
+    @classmethod
+    def from_csv(cls, csv_path: str = "repuestos.csv", model_name: Optional[str] = None) -> "NumpyVectorSearchBackend":
+        """
+        Carga el catálogo desde el CSV y genera en batch un embedding por contenido distinto con el modelo compartido.
+        """
+        import pandas as pd
+        from embeddings.model_manager import DEFAULT_MODEL_NAME, EmbeddingModelManager
+        from utils import build_embedding_text, csv_row_to_document
+
+        inicio = time.perf_counter()
+        df = pd.read_csv(csv_path, on_bad_lines='warn', engine='python')
+        documentos = [csv_row_to_document(row) for _, row in df.iterrows()]
+
+        # Ofertas del mismo repuesto comparten el texto: se codifica una vez
+        textos: Dict[str, int] = {}
+        parte_de_oferta = [textos.setdefault(build_embedding_text(d), len(textos)) for d in documentos]
+
+        model = EmbeddingModelManager().get_model(model_name or DEFAULT_MODEL_NAME)
+        embeddings = model.encode(list(textos), batch_size=64, convert_to_numpy=True)
+
+        # Versión del catálogo: hash del contenido del CSV
+        with open(csv_path, "rb") as f:
+            version = f"csv-{hashlib.sha1(f.read()).hexdigest()[:12]}"
+
+        backend = cls(documentos, embeddings, catalog_version=version, parte_de_oferta=parte_de_oferta)
+        print(
+            f"Motor vectorial local cargado desde {csv_path}: {len(documentos)} documentos "
+            f"({len(textos)} partes) en {time.perf_counter() - inicio:.2f}s"
+        )
+        return backend
+
+    @classmethod
+    def from_mongo(cls, collection=None) -> "NumpyVectorSearchBackend":
+        """
+        Carga un snapshot del catálogo desde MongoDB: las partes (con los embeddings ya calculados) y sus ofertas.
+        """
+        from db.mongo import MongoCollectionManager, parts_collection_name
+
+        inicio = time.perf_counter()
+        manager = MongoCollectionManager()
+        collection = collection if collection is not None else manager.get_collection()
+
+        filas: Dict[str, int] = {}
+        embeddings = []
+        for parte in collection.database[parts_collection_name(collection.name)].find({}, {"embedding_vector": 1}):
+            filas[parte["_id"]] = len(embeddings)
+            embeddings.append(parte["embedding_vector"])
+
+        documentos = []
+        parte_de_oferta = []
+        for doc in collection.find({}, {"embedding_vector": 0}):
+            if doc.get("embedding_hash") in filas:
+                documentos.append(doc)
+                parte_de_oferta.append(filas[doc["embedding_hash"]])
+
+        backend = cls(
+            documentos, embeddings, catalog_version=str(manager.get_catalog_version()), parte_de_oferta=parte_de_oferta
+        )
+        print(
+            f"Motor vectorial local cargado desde MongoDB: {len(documentos)} documentos "
+            f"({len(embeddings)} partes) en {time.perf_counter() - inicio:.2f}s"
+        )
+        return backend
+
+    def catalog_version(self) -> str:
+        """Versión del snapshot cargado en memoria."""
+        return self._catalog_version
+
+    def vector_search(
+        self,
+        query_vector: List[float],
+        campos: List[str],
+        limit: int = 5,
+        num_candidates: int = 100,
+        proveedor_tipo: Optional[str] = None,
+        stock_minimo: Optional[int] = None,
+        min_score: Optional[float] = None
+    ) -> List[Dict]:
+        """
+        Top-k exacto por similitud coseno; los filtros se aplican como máscara antes de seleccionar el top-k
+        (al ser exacto no necesita ensanchar candidatos, por lo que `num_candidates` y `min_score` se ignoran).
+        """
+        if len(self._documentos) == 0 or limit <= 0:
+            return []
+
+        query = np.asarray(query_vector, dtype=np.float32)
+        norma = np.linalg.norm(query)
+        if norma > 0:
+            query = query / norma
+
+        # Producto matricial solo sobre las partes; cada oferta toma la similitud de la suya
+        similitudes = (self._matrix @ query)[self._parte_de_oferta]
+
+        mascara = np.ones(len(self._documentos), dtype=bool)
+        if proveedor_tipo is not None:
+            mascara &= self._tipos == proveedor_tipo
+        if stock_minimo is not None:
+            mascara &= self._stock >= stock_minimo
+
+        validos = int(mascara.sum())
+        if validos == 0:
+            return []
+
+        similitudes = np.where(mascara, similitudes, -np.inf)
+        k = min(limit, validos)
+
+        # argpartition O(n) + orden solo de los k elegidos
+        top = np.argpartition(-similitudes, k - 1)[:k]
+        top = top[np.argsort(-similitudes[top], kind="stable")]
+
+        resultados = []
+        for i in top:
+            resultado = self._project(self._documentos[i], campos)
+            # Misma escala que vectorSearchScore de Atlas para similitud coseno: (1 + cos) / 2
+            resultado["score"] = float((1.0 + similitudes[i]) / 2.0)
+            resultados.append(resultado)
+
+        return resultados
+
+    def find_by_codes(
+        self,
+        codigos: List[str],
+        campos: List[str],
+        proveedor_tipo: Optional[str] = None
+    ) -> List[Dict]:
+        """
+        Busca por código exacto con el índice en memoria id_repuesto -> filas.
+        """
+        resultados = []
+        for codigo in codigos:
+            for i in self._indices_por_codigo.get(codigo, []):
+                documento = self._documentos[i]
+                if proveedor_tipo is not None and documento.get("proveedor_tipo") != proveedor_tipo:
+                    continue
+                resultados.append(self._project(documento, campos))
+        return resultados
+
+    async def avector_search(self, *args, **kwargs) -> List[Dict]:
+        """Búsqueda en memoria de microsegundos: se ejecuta directo en el event loop (sin hilo)."""
+        return self.vector_search(*args, **kwargs)
+
+    async def afind_by_codes(self, *args, **kwargs) -> List[Dict]:
+        """Lookup en memoria: se ejecuta directo en el event loop (sin hilo)."""
+        return self.find_by_codes(*args, **kwargs)
+
+    @staticmethod
+    def _project(documento: Dict, campos: List[str]) -> Dict:
+        """Copia solo los campos pedidos (y `_id` si existe), igual que el `$project` de Mongo."""
+        proyectado = {campo: documento[campo] for campo in campos if campo in documento}
+        if "_id" in documento:
+            proyectado["_id"] = documento["_id"]
+        return proyectado
@@ -0,0 +1,143 @@
+import argparse
+import asyncio
+import json
+import os
+
+import tornado.web
+
+from service.session_manager import SesionNoEncontrada, SessionManager, SinCapacidad
+
+SERVICE_HOST = os.getenv("SERVICE_HOST", "0.0.0.0")
+SERVICE_PORT = int(os.getenv("SERVICE_PORT", "8000"))
+# Turnos del grafo ejecutándose a la vez en el proceso (el resto espera su turno)
+SERVICE_MAX_CONCURRENT_TURNS = int(os.getenv("SERVICE_MAX_CONCURRENT_TURNS", "8"))
+# Sesiones sin actividad durante más de SESSION_IDLE_TTL_S se expulsan (revisión cada SESSION_EVICTION_INTERVAL_S)
+SESSION_IDLE_TTL_S = float(os.getenv("SESSION_IDLE_TTL_S", "1800"))
+SESSION_EVICTION_INTERVAL_S = float(os.getenv("SESSION_EVICTION_INTERVAL_S", "60"))
+SESSION_MAX = int(os.getenv("SESSION_MAX", "1000"))
+
+
+class BaseHandler(tornado.web.RequestHandler):
+
+    @property
+    def sessions(self) -> SessionManager:
+        return self.application.settings["sessions"]
+
+    def write_error(self, status_code, **kwargs):
+        self.finish({"error": self._reason})
+
+    def json_body(self) -> dict:
+        try:
+            return json.loads(self.request.body or b"{}")
+        except json.JSONDecodeError:
+            raise tornado.web.HTTPError(400, reason="El cuerpo debe ser JSON")
+
+
+class HealthHandler(BaseHandler):
+
+    def get(self):
+        """GET /health: estado del servicio y de sus caches."""
+        from chains.chain_administrator import ChainAdministrator
+        from search.backend_manager import SearchBackendManager
+
+        self.write({
+            "status": "ok",
+            "catalog_version": SearchBackendManager().get_catalog_version(),
+            "sessions": self.sessions.get_stats(),
+            "response_cache": ChainAdministrator().get_cache_stats()
+        })
+
+
+class SessionsHandler(BaseHandler):
+
+    async def post(self):
+        """POST /sessions: crea una sesión y retorna su id (503 si se alcanzó SESSION_MAX y ninguna está libre)."""
+        try:
+            session_id = await self.sessions.create()
+        except SinCapacidad:
+            raise tornado.web.HTTPError(503, reason="Servicio sin capacidad para nuevas sesiones")
+        self.set_status(201)
+        self.write({"session_id": session_id})
+
+
+class SessionHandler(BaseHandler):
+
+    async def delete(self, session_id):
+        """DELETE /sessions/{id}: cierra la sesión."""
+        try:
+            await self.sessions.delete(session_id)
+        except SesionNoEncontrada:
+            raise tornado.web.HTTPError(404, reason="Sesión no encontrada")
+        self.set_status(204)
+
+
+class MessagesHandler(BaseHandler):
+
+    async def post(self, session_id):
+        """
+        POST /sessions/{id}/messages {"message": "..."}: ejecuta un turno.
+        Retorna {"response", "complete"} o, con ?stream=true, la respuesta en texto plano a medida que se genera.
+        """
+        mensaje = self.json_body().get("message")
+        if not isinstance(mensaje, str) or not mensaje.strip():
+            raise tornado.web.HTTPError(400, reason="Falta 'message'")
+
+        try:
+            sesion = self.sessions.get(session_id)
+        except SesionNoEncontrada:
+            raise tornado.web.HTTPError(404, reason="Sesión no encontrada")
+
+        stream = self.get_query_argument("stream", "false").lower() == "true"
+        if stream:
+            self.set_header("Content-Type", "text/plain; charset=utf-8")
+
+        fragmentos = []
+        async for fragmento in self.sessions.run_turn(session_id, mensaje):
+            if stream:
+                self.write(fragmento)
+                await self.flush()
+            else:
+                fragmentos.append(fragmento)
+
+        if not stream:
+            # Un turno que termina la conversación deja al agente listo para una nueva (first_message)
+            self.write({"response": "".join(fragmentos), "complete": sesion.agent.first_message})
+
+
+def make_app(sessions: SessionManager) -> tornado.web.Application:
+    return tornado.web.Application(
+        [
+            (r"/health", HealthHandler),
+            (r"/sessions", SessionsHandler),
+            (r"/sessions/([0-9a-f]+)", SessionHandler),
+            (r"/sessions/([0-9a-f]+)/messages", MessagesHandler),
+        ],
+        sessions=sessions
+    )
+
+
+async def main(host: str, port: int):
+    from bootstrap import inicializar_componentes
+
+    # La inicialización es bloqueante (carga de modelos): se ejecuta fuera del event loop
+    graph = await asyncio.to_thread(inicializar_componentes)
+
+    sessions = SessionManager(
+        graph,
+        max_concurrent_turns=SERVICE_MAX_CONCURRENT_TURNS,
+        idle_ttl_seconds=SESSION_IDLE_TTL_S,
+        max_sessions=SESSION_MAX
+    )
+    make_app(sessions).listen(port, address=host)
+    print(f"🚀 Servicio de repuestos escuchando en http://{host}:{port}")
+
+    await sessions.run_eviction_loop(SESSION_EVICTION_INTERVAL_S)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servicio HTTP/JSON multi-sesión del agente de repuestos")
+    parser.add_argument("--host", default=SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.host, args.port))
@@ -0,0 +1,153 @@
+import asyncio
+import time
+import uuid
+from typing import AsyncIterator, Dict
+
+from agent import RepuestosAgent
+
+
+class SesionNoEncontrada(KeyError):
+    """La sesión no existe o fue expulsada por inactividad."""
+
+
+class SinCapacidad(RuntimeError):
+    """Se alcanzó el tope de sesiones y todas tienen un turno en curso (ninguna se puede expulsar)."""
+
+
+class Sesion:
+    """
+    Conversación de un cliente: su RepuestosAgent (thread propio sobre el grafo compartido) y un lock
+    que serializa sus turnos.
+    """
+
+    def __init__(self, session_id: str, agent: RepuestosAgent):
+        self.session_id = session_id
+        self.agent = agent
+        self.lock = asyncio.Lock()
+        self.created_at = time.time()
+        self.last_access = self.created_at
+        self.turns = 0
+
+
+class SessionManager:
+    """
+    Registro de sesiones del servicio sobre un único grafo compilado. Limita los turnos concurrentes
+    del proceso y expulsa las sesiones inactivas (borrando sus threads del checkpointer).
+    Se usa desde un solo event loop.
+    """
+
+    def __init__(
+        self,
+        graph,
+        max_concurrent_turns: int = 8,
+        idle_ttl_seconds: float = 1800,
+        max_sessions: int = 1000
+    ):
+        self.graph = graph
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.max_sessions = max_sessions
+        self.max_concurrent_turns = max_concurrent_turns
+        self._turnos = asyncio.Semaphore(max_concurrent_turns)
+        self._sesiones: Dict[str, Sesion] = {}
+        self._turnos_activos = 0
+        self._stats = {"created": 0, "evicted": 0, "rejected": 0, "turns": 0}
+
+    async def create(self) -> str:
+        """
+        Crea una sesión con thread propio y retorna su id; si se alcanzó el tope expulsa la más inactiva.
+        Levanta SinCapacidad si todas las sesiones tienen un turno en curso.
+        """
+        if len(self._sesiones) >= self.max_sessions:
+            libres = [s for s in self._sesiones.values() if not s.lock.locked()]
+            if not libres:
+                self._stats["rejected"] += 1
+                raise SinCapacidad(f"Tope de {self.max_sessions} sesiones alcanzado y todas tienen un turno en curso")
+            await self._expulsar(min(libres, key=lambda s: s.last_access))
+
+        session_id = uuid.uuid4().hex
+        self._sesiones[session_id] = Sesion(session_id, RepuestosAgent(self.graph))
+        self._stats["created"] += 1
+        return session_id
+
+    def get(self, session_id: str) -> Sesion:
+        sesion = self._sesiones.get(session_id)
+        if sesion is None:
+            raise SesionNoEncontrada(session_id)
+        return sesion
+
+    async def delete(self, session_id: str):
+        """
+        Cierra la sesión (al terminar su turno en curso, si hay uno) y borra su thread del checkpointer.
+        """
+        sesion = self.get(session_id)
+        async with sesion.lock:
+            await self._expulsar(sesion)
+
+    async def run_turn(self, session_id: str, message: str) -> AsyncIterator[str]:
+        """
+        Ejecuta un turno de la sesión emitiendo la respuesta por fragmentos. Los turnos de una misma sesión
+        se ejecutan en orden y los del proceso quedan limitados por max_concurrent_turns.
+        """
+        sesion = self.get(session_id)
+
+        async with sesion.lock:
+            async with self._turnos:
+                self._turnos_activos += 1
+                thread_anterior = sesion.agent.thread_id
+                try:
+                    async for fragmento in sesion.agent.astream_next_message(message):
+                        yield fragmento
+                finally:
+                    self._turnos_activos -= 1
+                    sesion.turns += 1
+                    sesion.last_access = time.time()
+                    self._stats["turns"] += 1
+
+                # La conversación terminó y el agente pasó a un thread nuevo: el anterior ya no se usa
+                if sesion.agent.thread_id != thread_anterior:
+                    await self._borrar_thread(thread_anterior)
+
+    async def evict_idle(self) -> int:
+        """
+        Expulsa las sesiones sin actividad durante más de idle_ttl_seconds; retorna cuántas expulsó.
+        """
+        limite = time.time() - self.idle_ttl_seconds
+        inactivas = [s for s in self._sesiones.values() if s.last_access < limite and not s.lock.locked()]
+        for sesion in inactivas:
+            await self._expulsar(sesion)
+        return len(inactivas)
+
+    async def run_eviction_loop(self, interval_seconds: float = 60):
+        """
+        Tarea de fondo que expulsa sesiones inactivas cada interval_seconds.
+        """
+        while True:
+            await asyncio.sleep(interval_seconds)
+            expulsadas = await self.evict_idle()
+            if expulsadas:
+                print(f"🧹 {expulsadas} sesiones inactivas expulsadas ({len(self._sesiones)} activas)")
+
+    async def _expulsar(self, sesion: Sesion):
+        if self._sesiones.pop(sesion.session_id, None) is not None:
+            self._stats["evicted"] += 1
+            await self._borrar_thread(sesion.agent.thread_id)
+
+    async def _borrar_thread(self, thread_id: str):
+        """Borra los checkpoints del thread (el checkpointer no crece con conversaciones terminadas)."""
+        checkpointer = self.graph.checkpointer
+        if checkpointer:
+            try:
+                await checkpointer.adelete_thread(thread_id)
+            except NotImplementedError:
+                pass
+
+    def get_stats(self) -> Dict:
+        """
+        Retorna sesiones activas, turnos en curso y contadores acumulados.
+        """
+        return {
+            **self._stats,
+            "sessions": len(self._sesiones),
+            "active_turns": self._turnos_activos,
+            "max_concurrent_turns": self.max_concurrent_turns
+        }
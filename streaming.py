@@ -0,0 +1,94 @@
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, Optional, Tuple
+
+from langchain_core.messages import AIMessageChunk
+
+# Nombre con el que graph.py registra el nodo de ranking (generate_ranking)
+RANKING_NODE = "reranking"
+
+# Nodos cuyos tokens LLM se transmiten al usuario a medida que llegan (nombres de nodo del grafo)
+STREAMED_NODES = {RANKING_NODE}
+
+# Clave de los fragmentos de texto no-LLM que los nodos emiten con get_stream_writer()
+STREAM_TEXT_KEY = "texto_parcial"
+
+STREAM_MODES = ["messages", "custom", "values"]
+
+
+def emit_text(texto: str):
+    """
+    Emite un fragmento de texto por el modo de streaming 'custom' (no-op fuera de graph.stream o del grafo).
+    """
+    try:
+        from langgraph.config import get_stream_writer
+        get_stream_writer()({STREAM_TEXT_KEY: texto})
+    except RuntimeError:
+        # Nodo ejecutado fuera de un grafo (p. ej. invocado directamente)
+        pass
+
+
+def _fragmento(modo: str, chunk: Any) -> Optional[str]:
+    """Extrae el texto visible de un evento del stream (tokens de nodos transmitidos o texto custom)."""
+    if modo == "messages":
+        mensaje, metadata = chunk
+        if (
+            metadata.get("langgraph_node") in STREAMED_NODES
+            and isinstance(mensaje, AIMessageChunk)
+            and isinstance(mensaje.content, str)
+            and mensaje.content
+        ):
+            return mensaje.content
+
+    elif modo == "custom" and isinstance(chunk, dict):
+        return chunk.get(STREAM_TEXT_KEY) or None
+
+    return None
+
+
+def stream_graph(graph, inputs: Optional[Dict], config: Dict) -> Iterator[Tuple[str, Any]]:
+    """
+    Ejecuta un turno del grafo emitiendo ('token', texto) a medida que llegan y al final ('result', estado).
+    """
+    result = None
+    for modo, chunk in graph.stream(inputs, config, stream_mode=STREAM_MODES):
+        if modo == "values":
+            result = chunk
+            continue
+
+        texto = _fragmento(modo, chunk)
+        if texto:
+            yield "token", texto
+
+    yield "result", result
+
+
+async def astream_graph(graph, inputs: Optional[Dict], config: Dict) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Versión async de stream_graph (graph.astream).
+    """
+    result = None
+    async for modo, chunk in graph.astream(inputs, config, stream_mode=STREAM_MODES):
+        if modo == "values":
+            result = chunk
+            continue
+
+        texto = _fragmento(modo, chunk)
+        if texto:
+            yield "token", texto
+
+    yield "result", result
+
+
+def invoke_streaming(graph, inputs: Optional[Dict], config: Dict, on_token: Callable[[str], None]) -> Tuple[Dict, bool]:
+    """
+    Reemplazo de graph.invoke que llama a on_token con cada fragmento transmitido.
+    Retorna (estado final, True si se transmitió algún fragmento).
+    """
+    result = None
+    transmitido = False
+    for tipo, valor in stream_graph(graph, inputs, config):
+        if tipo == "token":
+            transmitido = True
+            on_token(valor)
+        else:
+            result = valor
+    return result, transmitido
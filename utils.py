@@ -1,4 +1,63 @@
-from typing import List, Dict
+from typing import List, Dict, Optional
+
+# Campos de la pieza compartidos por todas las ofertas de un mismo código
+CAMPOS_PIEZA = ["repuesto_descripcion", "categoria", "marca", "modelo"]
+
+# Columnas de cada oferta en el formato compacto: (campo, encabezado)
+COLUMNAS_OFERTA = [
+    ("tipo", "tipo"),
+    ("proveedor_nombre", "proveedor"),
+    ("proveedor_rating", "rating"),
+    ("costo_unitario", "precio"),
+    ("moneda", "moneda"),
+    ("stock_disponible", "stock"),
+    ("lead_time_dias", "entrega_dias"),
+    ("ubicacion_stock", "ubicacion"),
+    ("cantidad_minima_pedido", "min_pedido"),
+    ("nota", "nota")
+]
+
+_encoding = None
+
+
+def normalize_text(texto: str) -> str:
+    """
+    Normaliza un texto libre para usarlo como clave (minúsculas y espacios colapsados).
+    """
+    return " ".join(str(texto).lower().split())
+
+
+def build_embedding_text(documento: Dict) -> str:
+    """
+    Construye el texto a embeber de un repuesto (descripción + marca + modelo + categoría).
+    """
+    return f"{documento['repuesto_descripcion']} {documento['marca']} {documento['modelo']} {documento['categoria']}"
+
+
+def csv_row_to_document(row) -> Dict:
+    """
+    Convierte una fila del CSV de repuestos en el documento del catálogo (sin embedding) con tipos normalizados.
+    """
+    return {
+        "id_repuesto": row["id_repuesto"],
+        "repuesto_descripcion": row["repuesto_descripcion"],
+        "categoria": row["categoria"],
+        "marca": row["marca"],
+        "modelo": row["modelo"],
+        "proveedor_tipo": row["proveedor_tipo"],
+        "proveedor_id": row["proveedor_id"],
+        "proveedor_nombre": row["proveedor_nombre"],
+        "proveedor_rating": int(row["proveedor_rating"]),
+        "costo_unitario": float(row["costo_unitario"]),
+        "moneda": row["moneda"],
+        "stock_disponible": int(row["stock_disponible"]),
+        "lead_time_dias": int(row["lead_time_dias"]),
+        "ubicacion_stock": row["ubicacion_stock"],
+        "cantidad_minima_pedido": int(row["cantidad_minima_pedido"]),
+        "tiempo_vida_estimado_hrs": int(row["tiempo_vida_estimado_hrs"]),
+        "nota": row["nota"]
+    }
+
 
 def format_options_for_llm(producto_label: str, opciones: List[Dict]) -> str:
     """
@@ -40,4 +99,104 @@ def format_options_for_llm(producto_label: str, opciones: List[Dict]) -> str:
     
     texto += f"\n"
     
-    return texto
\ No newline at end of file
+    return texto
+
+
+def count_tokens(texto: str) -> int:
+    """
+    Cuenta tokens con tiktoken (o200k_base) si está instalado; si no, estima ~4 caracteres por token.
+    """
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("o200k_base")
+        except ImportError:
+            _encoding = False
+
+    if _encoding:
+        return len(_encoding.encode(texto))
+    return (len(texto) + 3) // 4
+
+
+def _valor_compacto(valor) -> str:
+    """Valor de celda sin decoración ('' si está vacío); los separadores se reemplazan para no romper la tabla."""
+    if valor is None or valor == "":
+        return ""
+    if isinstance(valor, float):
+        if valor != valor:  # NaN
+            return ""
+        return f"{valor:g}"
+    return str(valor).replace("|", "/").replace("\n", " ").strip()
+
+
+def _bloque_codigo(codigo: str, ofertas: List[Dict]) -> str:
+    """Bloque de un código: campos comunes una sola vez y una fila por oferta con las columnas no vacías."""
+    comunes = []
+    columnas = list(COLUMNAS_OFERTA)
+
+    for campo in CAMPOS_PIEZA:
+        valores = {_valor_compacto(o.get(campo)) for o in ofertas}
+        if len(valores) == 1:
+            valor = valores.pop()
+            if valor:
+                comunes.append(valor)
+        else:
+            # El campo varía entre ofertas (p. ej. marca genérica): pasa a ser columna
+            columnas.insert(1, (campo, campo))
+
+    columnas = [
+        (campo, encabezado) for campo, encabezado in columnas
+        if any(_valor_compacto(o.get(campo)) for o in ofertas)
+    ]
+
+    lineas = [" | ".join([codigo] + comunes)]
+    lineas.append("  " + "|".join(encabezado for _, encabezado in columnas))
+    for oferta in ofertas:
+        fila = []
+        for campo, _ in columnas:
+            valor = oferta.get(campo)
+            if campo == "tipo":
+                valor = "INT" if valor == "INTERNO" else "EXT"
+            fila.append(_valor_compacto(valor))
+        lineas.append("  " + "|".join(fila))
+    return "\n".join(lineas)
+
+
+def format_options_compact(
+    producto_label: str,
+    opciones: List[Dict],
+    cantidad: int = 1,
+    max_tokens: Optional[int] = None
+) -> str:
+    """
+    Serializa opciones en formato tabular compacto: agrupa por código (campos comunes una vez), omite campos
+    vacíos y, si se indica `max_tokens`, descarta las opciones de menor puntaje hasta respetar el presupuesto.
+    """
+    if not opciones:
+        return f"{producto_label}\nNo hay opciones disponibles.\n"
+
+    from ranking.engine import score_options
+
+    # Orden del motor de reglas: las últimas son las primeras en descartarse
+    ordenadas = score_options(opciones, cantidad)
+    encabezado = f"{producto_label} (cantidad: {cantidad})"
+
+    def serializar(seleccion: List[Dict]) -> str:
+        por_codigo: Dict[str, List[Dict]] = {}
+        for opcion in seleccion:
+            por_codigo.setdefault(opcion.get("id_repuesto", "N/A"), []).append(opcion)
+        bloques = [_bloque_codigo(codigo, ofertas) for codigo, ofertas in por_codigo.items()]
+        omitidas = len(ordenadas) - len(seleccion)
+        if omitidas:
+            bloques.append(f"(+{omitidas} opciones de menor puntaje omitidas)")
+        return encabezado + "\n" + "\n".join(bloques) + "\n"
+
+    seleccion = ordenadas
+    texto = serializar(seleccion)
+    # Siempre se conserva al menos la mejor opción
+    while max_tokens and len(seleccion) > 1 and count_tokens(texto) > max_tokens:
+        seleccion = seleccion[:-1]
+        texto = serializar(seleccion)
+
+    return texto
@@ -0,0 +1,195 @@
+import os
+import re
+import threading
+import unicodedata
+from typing import Dict, List, Optional, Set
+
+CATALOG_CSV = os.getenv("CATALOG_CSV", "repuestos.csv")
+
+# Léxico curado de tipos: tipo canónico -> formas en que lo escriben los usuarios (sin tildes).
+# Solo sustantivos que nombran un repuesto concreto; los genéricos (tubo, banda, medidor...) los decide el LLM
+SINONIMOS_TIPO: Dict[str, List[str]] = {
+    "rodamiento": ["ruleman", "rulemanes", "rodamientos", "cojinete", "cojinetes", "balero", "baleros", "bearing"],
+    "filtro": ["filtros", "cartucho filtrante", "elemento filtrante", "filter"],
+    "bomba": ["bombas", "electrobomba", "motobomba", "pump"],
+    "correa": ["correas", "correa dentada", "correa en v", "belt"],
+    "sensor": ["sensores", "sonda", "sondas", "transductor", "transmisor", "termocupla", "termocuplas", "pt100"],
+    "valvula": ["valvulas", "electrovalvula", "electrovalvulas", "llave esferica", "valve"],
+    "sello": ["sellos", "sello mecanico", "reten", "retenes", "junta", "juntas", "empaquetadura", "o-ring", "oring", "junta torica"],
+    "manometro": ["manometros", "medidor de presion", "presostato", "vacuometro"],
+    "motor": ["motores", "motorreductor", "reductor", "reductores"],
+    "rele": ["reles", "contactor", "contactores", "guardamotor", "relay"],
+    "interruptor": ["interruptores", "termomagnetica", "disyuntor", "breaker", "fin de carrera"],
+    "variador": ["variadores", "variador de frecuencia", "inverter", "vfd"],
+    "cable": ["cables", "cableado"],
+    "manguera": ["mangueras", "manguera hidraulica", "conector hidraulico"],
+    "acople": ["acoples", "acoplamiento", "coupling"],
+    "tornillo": ["tornillos", "bulon", "bulones", "perno", "pernos", "tuerca", "tuercas", "arandela"],
+    "actuador": ["actuadores", "cilindro neumatico", "piston neumatico"],
+    "bujia": ["bujias"],
+    "arrancador": ["arrancadores", "arrancador suave", "arranque suave"],
+    "bateria": ["baterias"],
+    "instrumento": [
+        "camara termografica", "termografica", "tacometro", "calibrador",
+        "endoscopio", "boroscopio", "multimetro", "pinza amperometrica", "micrometro", "termometro",
+        "higrometro", "luxometro", "osciloscopio", "phmetro", "megometro"
+    ],
+}
+
+# Palabras que por sí solas no identifican un tipo de repuesto
+TERMINOS_VAGOS: Set[str] = {
+    "repuesto", "repuestos", "pieza", "piezas", "parte", "partes", "cosa", "cosas", "algo", "componente",
+    "componentes", "elemento", "elementos", "producto", "productos", "articulo", "articulos", "material",
+    "materiales", "insumo", "insumos", "recambio", "recambios", "item", "items"
+}
+
+STOPWORDS: Set[str] = {
+    "para", "de", "del", "la", "el", "los", "las", "un", "una", "unos", "unas", "que", "con", "sin", "y", "o",
+    "mi", "mis", "su", "sus", "al", "en", "por", "necesito", "quiero", "busco", "me", "hace", "falta", "otro",
+    "otra", "nuevo", "nueva", "tipo", "marca", "modelo", "ese", "esa", "este", "esta"
+}
+
+# Número de parte: token con letras y dígitos (6204-2RS, WD940/25, M8x40) o dígitos con separadores
+_PATRON_NUMERO_PARTE = re.compile(r"^(?=.*\d)(?=.*[a-z])[a-z0-9][a-z0-9\-/.x]{2,}$|^\d{3,}[\-/.]\w+$")
+_PATRON_TOKEN = re.compile(r"[a-z0-9][a-z0-9\-/.]*")
+# Cantidades, no especificaciones: enteros cortos sueltos y tokens xN / Nx / N unidades (3, x2, 2x, 10u)
+_PATRON_CANTIDAD = re.compile(r"^(?:x\d+|\d+x|\d{1,3}(?:u|un|uds?|unidades?)?)$")
+# Especificación: medida con unidad (10mm, 2.2 kw, 3/4", 12 pulgadas) o fracción (3/4)
+_PATRON_ESPECIFICACION = re.compile(
+    r"(?<![a-z0-9])(\d+(?:[.,]\d+)?\s*(?:mm|cm|hp|cv|kw|bar|psi|rpm|vac|vdc|pulgadas?|pulg|\"|'')"
+    r"|\d+(?:[.,]\d+)?\s*(?:m|w|v)(?![a-z0-9])|\d+/\d+)"
+)
+
+
+def _sin_tildes(texto: str) -> str:
+    """Minúsculas sin tildes ni diacríticos para comparar contra el vocabulario."""
+    texto = unicodedata.normalize("NFKD", str(texto).lower())
+    return "".join(c for c in texto if not unicodedata.combining(c))
+
+
+def _alternancia(frases: Set[str]) -> Optional[re.Pattern]:
+    """Compila las frases en una única regex por palabra completa (las más largas primero)."""
+    frases = sorted((f for f in frases if f), key=len, reverse=True)
+    if not frases:
+        return None
+    return re.compile(r"(?<![a-z0-9])(" + "|".join(re.escape(f) for f in frases) + r")(?![a-z0-9])")
+
+
+class ProductRuleClassifier:
+    """
+    Singleton que pre-clasifica descripciones de productos con el vocabulario del catálogo (marcas y modelos)
+    más un léxico curado de tipos, evitando llamadas a verify_product_chain.
+    """
+    _instance = None
+    _lock = threading.Lock()
+    _initialized = False
+
+    def __new__(cls, *args, **kwargs):
+        """Asegura que solo se cree una instancia de la clase."""
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super(ProductRuleClassifier, cls).__new__(cls)
+        return cls._instance
+
+    def initialize(self, csv_path: str = CATALOG_CSV):
+        """
+        Construye el vocabulario: tipos del léxico curado y marcas/modelos del CSV del catálogo (si existe).
+        """
+        with self._lock:
+            if self._initialized:
+                return
+
+            tipos = {_sin_tildes(t) for t in SINONIMOS_TIPO}
+            tipos |= {_sin_tildes(s) for sinonimos in SINONIMOS_TIPO.values() for s in sinonimos}
+            marcas: Set[str] = set()
+            modelos: Set[str] = set()
+
+            if os.path.exists(csv_path):
+                import pandas as pd
+
+                df = pd.read_csv(csv_path, on_bad_lines='skip', engine='python')
+                marcas = {_sin_tildes(m) for m in df["marca"].dropna().unique()} - {"generico", "generica"}
+                modelos = {_sin_tildes(m) for m in df["modelo"].dropna().unique()}
+            else:
+                print(f"⚠️  Catálogo '{csv_path}' no encontrado: el pre-clasificador usa solo el léxico de tipos.")
+
+            self._tipos_regex = _alternancia(tipos)
+            self._marcas_regex = _alternancia(marcas)
+            self._modelos_regex = _alternancia(modelos)
+            self._stats = {"completos": 0, "incompletos": 0, "ambiguos": 0}
+            self._initialized = True
+
+    def classify(self, descripcion: str) -> Optional[Dict]:
+        """
+        Retorna el veredicto {completa, razon, faltante} si la descripción es claramente completa (modelo del
+        catálogo, o tipo más marca, número de parte o medida con unidad; las cantidades como "3" o "x2" no
+        cuentan) o claramente vaga; None si es ambigua y
+        debe decidirla el LLM (por ejemplo un tipo solo, como "filtro de aceite").
+        """
+        if not self._initialized:
+            self.initialize()
+
+        texto = _sin_tildes(descripcion).strip()
+        # El tipo se busca antes de "para": en "algo para motor" el motor es la aplicación, no el repuesto
+        cabeza = re.split(r"\bpara\b", texto, maxsplit=1)[0]
+
+        tipo = self._buscar(self._tipos_regex, cabeza)
+        marca = self._buscar(self._marcas_regex, texto)
+        modelo = self._buscar(self._modelos_regex, texto)
+
+        numero_parte = next(
+            (t for t in _PATRON_TOKEN.findall(texto) if _PATRON_NUMERO_PARTE.match(t) and not _PATRON_CANTIDAD.match(t)),
+            None
+        )
+        medida = _PATRON_ESPECIFICACION.search(texto)
+        especificacion = numero_parte or (medida.group(1).strip() if medida else None)
+
+        if modelo or (tipo and (marca or especificacion)):
+            detalle = ", ".join(
+                f"{nombre}: {valor}"
+                for nombre, valor in (("tipo", tipo), ("marca", marca), ("modelo", modelo), ("especificación", especificacion))
+                if valor and not (nombre == "especificación" and valor == modelo)
+            )
+            self._contar("completos")
+            return {
+                "completa": True,
+                "razon": f"Repuesto identificado por el catálogo ({detalle})",
+                "faltante": []
+            }
+
+        tokens_cabeza = [t for t in _PATRON_TOKEN.findall(cabeza) if t not in STOPWORDS]
+
+        if not marca and not numero_parte and all(t in TERMINOS_VAGOS for t in tokens_cabeza):
+            self._contar("incompletos")
+            return {
+                "completa": False,
+                "razon": "Descripción muy vaga, no se identifica el tipo de repuesto",
+                "faltante": ["tipo de repuesto", "marca", "modelo/número de parte"]
+            }
+
+        # Zona gris (tipo sin detalle, solo marca, número de parte suelto, términos desconocidos): decide el LLM
+        self._contar("ambiguos")
+        return None
+
+    def get_stats(self) -> Dict:
+        """
+        Retorna cuántas descripciones resolvió cada regla y las llamadas LLM evitadas.
+        """
+        if not self._initialized:
+            return {"completos": 0, "incompletos": 0, "ambiguos": 0, "llm_calls_avoided": 0}
+        with self._lock:
+            return {**self._stats, "llm_calls_avoided": self._stats["completos"] + self._stats["incompletos"]}
+
+    def _contar(self, clave: str):
+        """Incrementa un contador bajo lock (el clasificador se comparte entre sesiones)."""
+        with self._lock:
+            self._stats[clave] += 1
+
+    @staticmethod
+    def _buscar(regex: Optional[re.Pattern], texto: str) -> Optional[str]:
+        """Primera coincidencia de la regex en el texto o None."""
+        if regex is None:
+            return None
+        coincidencia = regex.search(texto)
+        return coincidencia.group(1) if coincidencia else None